@@ -0,0 +1,493 @@
+import argparse
+import base64
+import collections
+import hashlib
+import json
+import pathlib
+import re
+import select
+import struct
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from tc_send_code import HardwareController
+from protocol_manager import run_protocol, AdaptivePoller
+from protocol_loader import parse_protocol, ProtocolError, PLATE_RANGE, LID_RANGE
+from telemetry import TelemetryBuffer
+from estimator import estimate_run
+from device_discovery import thermocycler_ports
+import metrics
+
+RUN_LOG_DIR = pathlib.Path(__file__).parent / 'run_logs'
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class ApiError(Exception):
+    """A request the API refuses, reported to the client as {"error": message} with `status`."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Subscriber:
+    """
+    One telemetry client's outgoing queue. Holds at most `maxlen` messages; a
+    client that falls behind loses the oldest ones instead of slowing the device.
+    """
+    def __init__(self, maxlen=256):
+        self._queue = collections.deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+
+    def put(self, data):
+        with self._cond:
+            self._queue.append(data)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """The next message, or None after `timeout` seconds without one."""
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+
+class DeviceSession:
+    """
+    One thermocycler served by the API: its controller, loaded protocol, run, and
+    a single telemetry stream shared by every subscriber.
+
+    During a run the stream carries the run's own samples (this is the run's
+    TelemetryBuffer sink); otherwise it is fed by an idle monitor that polls
+    adaptively, and only while someone is subscribed. Each message is encoded
+    once however many clients receive it, so clients never add serial traffic.
+    """
+    def __init__(self, session_id, port_name, log_dir=RUN_LOG_DIR):
+        self.id = session_id
+        self.port_name = port_name
+        self.log_dir = log_dir
+        self.controller = HardwareController()
+        self.protocol = None  # LoadedProtocol
+        self.run_thread = None
+        self.run_title = None
+        self.stop_event = threading.Event()
+        self.step = None
+        self.latest = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # checking for and starting a run is one step
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+
+    def connect(self):
+        if not self.controller.connect(self.port_name):
+            return False
+        threading.Thread(target=self._monitor, daemon=True).start()
+        return True
+
+    def close(self):
+        """Stops any run, deactivates the device and disconnects."""
+        self._closed.set()
+        self.stop_event.set()
+        self._wake.set()
+        if self.controller.port:
+            try:
+                self.controller.deactivate_all()
+            except Exception as e:
+                print(f"Could not deactivate {self.port_name}: {e}")
+            self.controller.disconnect()
+        self.broadcast({'type': 'closed'})
+
+    @property
+    def running(self):
+        return self.run_thread is not None and self.run_thread.is_alive()
+
+    def status(self):
+        protocol = None
+        if self.protocol:
+            protocol = {'name': self.protocol.path.name, 'digest': self.protocol.digest,
+                        'total_steps': self.protocol.program.total_steps,
+                        'estimated_sec': estimate_run(self.protocol.program).total_sec}
+        return {'id': self.id, 'port': self.port_name, 'connected': self.controller.port is not None,
+                'state': 'running' if self.running else 'idle', 'title': self.run_title if self.running else None,
+                'protocol': protocol, 'step': self.step if self.running else None, 'latest': self.latest,
+                'subscribers': len(self._subscribers)}
+
+    # --- Commands ---
+
+    def load_protocol(self, name, data):
+        loaded = parse_protocol(name, data)
+        with self._run_lock:
+            if self.running:
+                raise ApiError(HTTPStatus.CONFLICT, "A protocol is running.")
+            self.protocol = loaded
+        return loaded
+
+    def start(self, title):
+        with self._run_lock:
+            if self.running:
+                raise ApiError(HTTPStatus.CONFLICT, "A protocol is already running.")
+            if not self.protocol:
+                raise ApiError(HTTPStatus.CONFLICT, "No protocol loaded.")
+            self.stop_event.clear()
+            self.run_title = title
+            self.step = None
+            self.run_thread = threading.Thread(target=self._run, args=(self.protocol, title), daemon=True)
+            self.run_thread.start()
+
+    def stop(self):
+        """Emergency stop: ends the run and deactivates the lid and plate."""
+        self.stop_event.set()
+        self.controller.deactivate_all()
+
+    def skip(self):
+        """Skips the current step, as the control window's Skip button does."""
+        if not self.running:
+            raise ApiError(HTTPStatus.CONFLICT, "No protocol is running.")
+        self.controller.deactivate_all()
+
+    def _run(self, protocol, title):
+        ignore = lambda text: None
+        telemetry = TelemetryBuffer(sink=self)
+        self.broadcast({'type': 'run_started', 'title': title, 'protocol': protocol.path.name})
+        try:
+            run_protocol(self.controller, protocol.program, ignore, ignore, ignore, ignore, self.stop_event, title,
+                         telemetry=telemetry, log_dir=self.log_dir, render_graph=False, on_step=self._step_started)
+        except Exception as e:
+            print(f"Protocol thread encountered an error: {e}")
+        finally:
+            self.broadcast({'type': 'run_ended', 'title': title, 'stopped': self.stop_event.is_set()})
+            self._wake.set()
+
+    def _step_started(self, step, program, seconds_left):
+        self.step = {'index': step.index, 'total': program.total_steps, 'stage': step.stage, 'cycle': step.cycle,
+                     'step': step.step, 'action': type(step.action).__name__, **step.action._asdict(),
+                     'eta': time.time() + seconds_left}
+        self.broadcast(dict(self.step, type='step'))
+
+    # --- Shared telemetry stream ---
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        subscriber.put(json.dumps(dict(self.status(), type='status')))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def broadcast(self, message):
+        data = json.dumps(message)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(data)
+
+    def append(self, minutes, lid, plate, setpoint, stage, cycle, step):
+        """TelemetryBuffer sink: forwards each run sample to the subscribers."""
+        self._sample(lid, plate, setpoint, minutes=round(minutes, 4), stage=stage, cycle=cycle, step=step)
+
+    def _sample(self, lid, plate, setpoint=None, **fields):
+        self.latest = {'t': time.time(), 'lid': float(lid), 'plate': float(plate),
+                       'setpoint': None if setpoint is None else float(setpoint)}
+        if self._subscribers:
+            self.broadcast(dict(self.latest, type='sample', **fields))
+
+    def _monitor(self):
+        """Idle telemetry: polls only while someone is subscribed and no run is feeding the stream."""
+        poller = AdaptivePoller(min_interval=0.5, max_interval=5.0)
+        while not self._closed.is_set():
+            if not self._subscribers or self.running:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            try:
+                lid, plate, _ = self.controller.get_status()
+            except Exception as e:
+                print(f"Monitor error on {self.port_name}: {e}")
+                self._closed.wait(2.0)
+                continue
+            self._sample(lid, plate)
+            self._wake.wait(poller.next_interval(lid, plate))
+            self._wake.clear()
+
+
+class ApiServer(ThreadingHTTPServer):
+    """HTTP server holding the open DeviceSessions (see ApiHandler for the endpoints)."""
+    daemon_threads = True
+
+    def __init__(self, address, log_dir=RUN_LOG_DIR):
+        super().__init__(address, ApiHandler)
+        self.log_dir = log_dir
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def open_device(self, port_name):
+        with self._lock:
+            if any(session.port_name == port_name for session in self.sessions.values()):
+                raise ApiError(HTTPStatus.CONFLICT, f"{port_name} is already open.")
+            session = DeviceSession(str(self._next_id), port_name, self.log_dir)
+            self._next_id += 1
+        if not session.connect():
+            raise ApiError(HTTPStatus.BAD_GATEWAY, f"Could not connect to {port_name}.")
+        with self._lock:
+            self.sessions[session.id] = session
+        return session
+
+    def close_device(self, session):
+        with self._lock:
+            self.sessions.pop(session.id, None)
+        session.close()
+
+    def close_all(self):
+        for session in list(self.sessions.values()):
+            self.close_device(session)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    REST endpoints (JSON in and out):
+        GET    /devices                      open devices, plus the ports available
+        POST   /devices          {"port"}    open (connect to) a device
+        GET    /devices/<id>                 status
+        DELETE /devices/<id>                 deactivate and disconnect
+        PUT    /devices/<id>/protocol?name=  upload a protocol file (CSV, JSON or YAML by name)
+        POST   /devices/<id>/start {"title"} run the uploaded protocol
+        POST   /devices/<id>/stop            emergency stop
+        POST   /devices/<id>/skip            skip the current step
+        POST   /devices/<id>/lid {"temp"}    set the lid temperature
+        POST   /devices/<id>/plate {"temp", "hold"}  set the plate temperature
+        POST   /devices/<id>/deactivate      deactivate lid and plate
+        GET    /devices/<id>/telemetry       WebSocket: status, step, sample and run events
+        GET    /metrics                      Prometheus metrics (text format)
+    """
+    protocol_version = 'HTTP/1.1'
+    ROUTES = [
+        ('GET', r'/devices', 'list_devices'),
+        ('POST', r'/devices', 'open_device'),
+        ('GET', r'/devices/(?P<id>[^/]+)', 'device_status'),
+        ('DELETE', r'/devices/(?P<id>[^/]+)', 'close_device'),
+        ('PUT', r'/devices/(?P<id>[^/]+)/protocol', 'upload_protocol'),
+        ('POST', r'/devices/(?P<id>[^/]+)/(?P<action>start|stop|skip|lid|plate|deactivate)', 'device_action'),
+        ('GET', r'/devices/(?P<id>[^/]+)/telemetry', 'telemetry'),
+        ('GET', r'/metrics', 'metrics_text'),
+    ]
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        pass  # One line per telemetry frame would drown the console
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        try:
+            for route_method, pattern, handler in self.ROUTES:
+                match = re.fullmatch(pattern, url.path.rstrip('/') or '/')
+                if match and route_method == method:
+                    getattr(self, handler)(**match.groupdict())
+                    return
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No such endpoint: {method} {url.path}")
+        except ApiError as e:
+            self._reply({'error': str(e)}, e.status)
+        except ProtocolError as e:
+            self._reply({'error': "Invalid protocol.", 'errors': e.errors}, HTTPStatus.BAD_REQUEST)
+        except Exception as e:
+            print(f"API error on {method} {url.path}: {e}")
+            self._reply({'error': str(e)}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _json_body(self):
+        body = self._body()
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Expected a JSON object.")
+        return data
+
+    def _number(self, data, name, required=True, bounds=None):
+        value = data.get(name)
+        if value is None and not required:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' must be a number.")
+        if bounds and not bounds[0] <= value <= bounds[1]:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' must be between {bounds[0]:g} and {bounds[1]:g}.")
+        return value
+
+    def _reply(self, data, status=HTTPStatus.OK):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _session(self, id):
+        session = self.server.sessions.get(id)
+        if session is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No open device {id}.")
+        return session
+
+    # --- Endpoints ---
+
+    def list_devices(self):
+        sessions = list(self.server.sessions.values())
+        open_ports = {session.port_name for session in sessions}
+        self._reply({'devices': [session.status() for session in sessions],
+                     'available_ports': [port for port in thermocycler_ports()
+                                         if port not in open_ports and port != "No Ports Found"]})
+
+    def open_device(self):
+        port = self._json_body().get('port')
+        if not isinstance(port, str) or not port:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "'port' is required.")
+        self._reply(self.server.open_device(port).status(), HTTPStatus.CREATED)
+
+    def device_status(self, id):
+        self._reply(self._session(id).status())
+
+    def close_device(self, id):
+        self.server.close_device(self._session(id))
+        self._reply({'closed': id})
+
+    def upload_protocol(self, id):
+        session = self._session(id)
+        name = self.query.get('name', ['protocol.csv'])[0]
+        loaded = session.load_protocol(pathlib.Path(name).name, self._body())
+        self._reply(dict(session.status()['protocol'], summary=loaded.summary))
+
+    def device_action(self, id, action):
+        session = self._session(id)
+        data = self._json_body()
+        if action == 'start':
+            title = data.get('title') or 'api'
+            session.start(str(title))
+        elif action == 'stop':
+            session.stop()
+        elif action == 'skip':
+            session.skip()
+        elif action == 'lid':
+            session.controller.set_lid_temperature(self._number(data, 'temp', bounds=LID_RANGE))
+        elif action == 'plate':
+            hold = self._number(data, 'hold', required=False)
+            if hold is not None and hold < 0:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "'hold' must not be negative.")
+            session.controller.set_plate_temperature(self._number(data, 'temp', bounds=PLATE_RANGE), hold)
+        elif action == 'deactivate':
+            session.controller.deactivate_all()
+        self._reply(session.status())
+
+    def metrics_text(self):
+        body = metrics.get_registry().render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def telemetry(self, id):
+        session = self._session(id)
+        key = self.headers.get('Sec-WebSocket-Key')
+        if self.headers.get('Upgrade', '').lower() != 'websocket' or not key:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Expected a WebSocket upgrade.")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.send_response(HTTPStatus.SWITCHING_PROTOCOLS)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+
+        subscriber = session.subscribe()
+        try:
+            while True:
+                data = subscriber.get(timeout=1.0)
+                if data is not None:
+                    self.wfile.write(websocket_frame(data.encode()))
+                    self.wfile.flush()
+                if select.select([self.connection], [], [], 0)[0] and not self._read_client_frame():
+                    break
+        except OSError:
+            pass  # Client went away
+        finally:
+            session.unsubscribe(subscriber)
+
+    def _read_client_frame(self):
+        """Handles one frame from the client; False once it closed the connection."""
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return False
+        opcode, length = header[0] & 0x0F, header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if header[1] & 0x80 else b'\0\0\0\0'
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(length)))
+        if opcode == 0x8:  # close
+            self.wfile.write(websocket_frame(payload[:2], opcode=0x8))
+            return False
+        if opcode == 0x9:  # ping
+            self.wfile.write(websocket_frame(payload, opcode=0xA))
+        return True  # Other client messages are ignored
+
+
+def websocket_frame(payload, opcode=0x1):
+    """An unmasked, unfragmented WebSocket frame (server to client); text by default."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="HTTP/WebSocket API for controlling thermocyclers without the GUI.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: this machine only)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--device', action='append', default=[], help="serial port or sim:// URL to open at startup")
+    parser.add_argument('--log-dir', type=pathlib.Path, default=RUN_LOG_DIR, help="run log directory")
+    parser.add_argument('--metrics-log-sec', type=float, help="print a metrics summary line this often")
+    args = parser.parse_args()
+    metrics.start(log_sec=args.metrics_log_sec)
+
+    server = ApiServer((args.host, args.port), args.log_dir)
+    for port_name in args.device:
+        try:
+            session = server.open_device(port_name)
+            print(f"Opened {port_name} as device {session.id}")
+        except ApiError as e:
+            print(f"Error: {e}")
+    print(f"Serving on http://{args.host}:{args.port}/devices")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.close_all()
@@ -0,0 +1,263 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import pathlib
+import threading
+import time
+from collections import namedtuple
+
+import serial
+import serial.tools.list_ports
+
+from tc_send_code import HardwareController
+
+# USB (vendor, product) IDs of the thermocycler's serial interface (GEN1, GEN2).
+# Add more as "vid:pid,vid:pid" (hex) in HELIXCYCLER_USB_IDS.
+THERMOCYCLER_USB_IDS = {(0x239A, 0x800C), (0x0483, 0xED8D)}
+PROBE_TIMEOUT = 0.5
+RETRY_SEC = 30.0  # how long a device that didn't answer is left alone
+MAX_PROBES = 16
+CACHE_PATH = pathlib.Path(__file__).parent / 'device_cache.json'
+
+# model/serial_number/firmware are None when the device could not be probed
+Device = namedtuple('Device', 'port model serial_number firmware usb_serial description')
+
+
+def usb_ids():
+    """THERMOCYCLER_USB_IDS plus any listed in the HELIXCYCLER_USB_IDS environment variable."""
+    ids = set(THERMOCYCLER_USB_IDS)
+    for item in os.environ.get('HELIXCYCLER_USB_IDS', '').split(','):
+        try:
+            vid, pid = item.split(':')
+            ids.add((int(vid, 16), int(pid, 16)))
+        except ValueError:
+            if item.strip():
+                print(f"Ignoring malformed USB ID {item!r} (expected vid:pid in hex).")
+    return ids
+
+def candidate_ports(all_ports=False):
+    """Serial ports with a thermocycler's USB IDs (every port with `all_ports`), sorted by name."""
+    ids = usb_ids()
+    ports = serial.tools.list_ports.comports()
+    return sorted((port for port in ports if all_ports or (port.vid, port.pid) in ids), key=lambda port: port.device)
+
+def thermocycler_ports():
+    """
+    Names of the ports with a thermocycler's USB IDs (no probing), like
+    HardwareController.get_available_ports(). Falls back to every port if none
+    match, so devices with unlisted IDs stay reachable.
+    """
+    ports = candidate_ports() or candidate_ports(all_ports=True)
+    return [port.device for port in ports] or ["No Ports Found"]
+
+def probe(port_name, timeout=PROBE_TIMEOUT):
+    """Connects to `port_name` and reads its M115 device info, or returns None if it doesn't answer."""
+    controller = HardwareController()
+    controller.REPLY_TIMEOUT = timeout
+    if not controller.connect(port_name):
+        return None
+    try:
+        return controller.get_device_info()
+    except serial.SerialException:
+        return None
+    finally:
+        controller.disconnect()
+
+
+def _cache_key(port):
+    # The USB serial number follows a device between ports; without one, fall back
+    # to the hardware ID, which includes the USB location
+    return port.serial_number or port.hwid
+
+class DeviceCache:
+    """
+    Device identities (M115 info) keyed by USB serial number, so a known device is
+    recognised on any port without being probed again. Saved as JSON at `path`
+    (kept in memory only if None). Devices that didn't answer are remembered in
+    memory for RETRY_SEC, so repeated refreshes don't wait on them either.
+    """
+    def __init__(self, path=CACHE_PATH):
+        self.path = pathlib.Path(path) if path else None
+        self._lock = threading.Lock()
+        self._identities = {}
+        self._unanswered = {}  # key -> time.monotonic() of the failed probe
+        if self.path:
+            try:
+                self._identities = json.loads(self.path.read_text(encoding='utf-8'))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable device cache {self.path}: {e}")
+
+    def get(self, key):
+        with self._lock:
+            return self._identities.get(key)
+
+    def recently_failed(self, key):
+        with self._lock:
+            failed_at = self._unanswered.get(key)
+        return failed_at is not None and time.monotonic() - failed_at < RETRY_SEC
+
+    def put_failed(self, key):
+        with self._lock:
+            self._unanswered[key] = time.monotonic()
+
+    def put(self, key, info):
+        with self._lock:
+            self._unanswered.pop(key, None)
+            if self._identities.get(key) == info:
+                return
+            self._identities[key] = info
+            data = json.dumps(self._identities, indent=1)
+        if self.path:
+            try:
+                temp_path = self.path.with_name(self.path.name + '.tmp')
+                temp_path.write_text(data, encoding='utf-8')
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Could not save device cache {self.path}: {e}")
+
+    def forget(self, key=None):
+        """Drops one identity (all with no key), e.g. after re-flashing a device."""
+        with self._lock:
+            if key is None:
+                self._identities.clear()
+                self._unanswered.clear()
+            else:
+                self._identities.pop(key, None)
+                self._unanswered.pop(key, None)
+
+
+_cache = None
+
+def get_device_cache():
+    """The process-wide DeviceCache."""
+    global _cache
+    if _cache is None:
+        _cache = DeviceCache()
+    return _cache
+
+def discover(all_ports=False, busy=(), refresh=False, retry_failed=False, timeout=PROBE_TIMEOUT, cache=None):
+    """
+    Finds thermocyclers: filters the serial ports by USB ID (see candidate_ports),
+    identifies each from the cache or, if unknown (or `refresh`), by probing it
+    with M115. Probes run concurrently, so the whole scan takes about one
+    `timeout` however many devices there are. Ports in `busy` (open in a control
+    window) are never probed, nor (unless `retry_failed`) are those that recently
+    failed to answer.
+    With `all_ports`, ports without a thermocycler's USB IDs are listed but not
+    probed. Returns a list of Device sorted by port.
+    """
+    cache = cache or get_device_cache()
+    ids = usb_ids()
+    ports = candidate_ports(all_ports)
+    identities = {}
+    to_probe = []
+    for port in ports:
+        info = None if refresh else cache.get(_cache_key(port))
+        if info is not None:
+            identities[port.device] = info
+        elif port.device in busy or (port.vid, port.pid) not in ids:
+            continue
+        elif refresh or retry_failed or not cache.recently_failed(_cache_key(port)):
+            to_probe.append(port)
+    if to_probe:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_PROBES, len(to_probe))) as pool:
+            results = pool.map(lambda port: probe(port.device, timeout), to_probe)
+            for port, info in zip(to_probe, results):
+                if info is not None:
+                    identities[port.device] = info
+                    cache.put(_cache_key(port), info)
+                else:
+                    cache.put_failed(_cache_key(port))
+    devices = []
+    for port in ports:
+        info = identities.get(port.device, {})
+        devices.append(Device(port.device, info.get('HW'), info.get('SerialNo'), info.get('FW'),
+                              port.serial_number, port.description))
+    return devices
+
+class PortWatcher:
+    """
+    Calls on_change(added, removed), two sets of port names, from a background
+    thread whenever serial ports appear or disappear. Listens for udev events on
+    Linux when pyudev is installed; otherwise re-lists the ports every `interval`
+    seconds, which costs about a millisecond.
+    """
+    def __init__(self, on_change, interval=0.5):
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _ports(self):
+        return {port.device for port in serial.tools.list_ports.comports()}
+
+    def _run(self):
+        known = self._ports()
+        wait = self._udev_waiter() or self._stop.wait
+        while not self._stop.is_set():
+            wait(self.interval)
+            try:
+                current = self._ports()
+            except OSError as e:
+                print(f"Port watcher could not list ports: {e}")
+                continue
+            if current != known and not self._stop.is_set():
+                added, removed, known = current - known, known - current, current
+                try:
+                    self.on_change(added, removed)
+                except Exception as e:
+                    print(f"Port watcher callback failed: {e}")
+
+    def _udev_waiter(self):
+        """A wait(timeout) that returns early on tty add/remove events, or None without pyudev."""
+        try:
+            import pyudev
+        except ImportError:
+            return None
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by(subsystem='tty')
+            monitor.start()
+        except (OSError, ValueError) as e:
+            print(f"udev unavailable, polling for ports instead: {e}")
+            return None
+
+        def wait(timeout):
+            # Block until an event (then drain the burst of events one plug-in causes)
+            if monitor.poll(timeout=max(timeout, 1.0)) is not None:
+                while monitor.poll(timeout=0.1) is not None:
+                    pass
+        return wait
+
+
+def describe(device):
+    """One-line description of a Device, e.g. for the launcher's port list."""
+    if device.model:
+        return f"{device.port}  -  {device.model}  SN {device.serial_number}"
+    return f"{device.port}  -  {device.description}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="List the connected thermocyclers.")
+    parser.add_argument('--all', action='store_true', help="also list serial ports without a thermocycler's USB IDs")
+    parser.add_argument('--refresh', action='store_true', help="probe every device again instead of using the cache")
+    parser.add_argument('--timeout', type=float, default=PROBE_TIMEOUT, help="seconds to wait for each device")
+    args = parser.parse_args()
+    devices = discover(args.all, refresh=args.refresh, timeout=args.timeout)
+    for device in devices:
+        print(describe(device))
+    if not devices:
+        print("No thermocyclers found." + ("" if args.all else " Try --all."))
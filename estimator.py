@@ -0,0 +1,172 @@
+import argparse
+import json
+import pathlib
+
+import numpy as np
+
+from telemetry import read_run_log
+
+
+class RampModel:
+    """
+    How long the plate takes to reach a new setpoint: `lag + |delta| / rate`, with
+    separate rates (°C/s) and lags (s, dead time and settling) for heating and
+    cooling. Defaults are nominal figures for the OT thermocycler; fit() learns
+    them from recorded runs.
+    """
+    def __init__(self, heat_rate=4.0, cool_rate=2.0, heat_lag=2.0, cool_lag=2.0, ambient=23.0, samples=0):
+        self.heat_rate = heat_rate
+        self.cool_rate = cool_rate
+        self.heat_lag = heat_lag
+        self.cool_lag = cool_lag
+        self.ambient = ambient
+        self.samples = samples  # ramps the model was fitted from (0 = defaults)
+
+    def ramp_sec(self, start, target):
+        delta = target - start
+        if abs(delta) < 0.5:
+            return 0.0
+        if delta > 0:
+            return self.heat_lag + delta / self.heat_rate
+        return self.cool_lag - delta / self.cool_rate
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def fit(cls, runs, tolerance=0.5, min_delta=2.0):
+        """
+        Fits a model from recorded runs: each a mapping or structured array with
+        time (minutes), plate, setpoint, stage, cycle and step fields, such as
+        TelemetryBuffer.columns() or read_run_log() records. For every step that
+        changed the setpoint by at least `min_delta`, the time until the plate first
+        came within `tolerance` is regressed on the size of the change. Directions
+        with too little data keep the default rate and lag.
+        """
+        ramps = {'heat': [], 'cool': []}
+        for run in runs:
+            for delta, seconds in _ramps(run, tolerance, min_delta):
+                ramps['heat' if delta > 0 else 'cool'].append((abs(delta), seconds))
+        model = cls()
+        for direction, pairs in ramps.items():
+            if not pairs:
+                continue
+            deltas, seconds = np.array(pairs).T
+            if len(pairs) >= 3 and np.ptp(deltas) >= min_delta:
+                slope, lag = np.polyfit(deltas, seconds, 1)
+                if slope <= 0:
+                    continue
+                rate, lag = 1.0 / slope, max(0.0, lag)
+            else:
+                rate, lag = float(np.median(deltas / seconds)), 0.0
+            setattr(model, f'{direction}_rate', float(rate))
+            setattr(model, f'{direction}_lag', float(lag))
+            model.samples += len(pairs)
+        return model
+
+    @classmethod
+    def for_device(cls, port, log_dir, max_runs=20):
+        """Fits a model from the newest `max_runs` run logs recorded on `port`."""
+        runs = []
+        for path in sorted(pathlib.Path(log_dir).glob('*.hxlog'), reverse=True):
+            try:
+                header, records = read_run_log(path)
+            except (OSError, ValueError) as e:
+                print(f"Skipping run log {path}: {e}")
+                continue
+            if header.get('port') == port and len(records):
+                runs.append(records)
+            if len(runs) >= max_runs:
+                break
+        return cls.fit(runs)
+
+
+def _ramps(run, tolerance, min_delta):
+    """Yields (setpoint change, seconds to reach it) for each step of one recorded run."""
+    minutes, plate, setpoint = (np.asarray(run[name], np.float64) for name in ('time', 'plate', 'setpoint'))
+    if len(minutes) < 2:
+        return
+    position = np.stack([np.asarray(run[name]) for name in ('stage', 'cycle', 'step')])
+    starts = np.concatenate(([0], np.flatnonzero((position[:, 1:] != position[:, :-1]).any(axis=0)) + 1))
+    ends = np.append(starts[1:], len(minutes))
+    for start, end in zip(starts, ends):
+        target = setpoint[start]
+        delta = target - plate[start]
+        if np.isnan(target) or abs(delta) < min_delta:
+            continue
+        reached = np.flatnonzero(np.abs(plate[start:end] - target) <= tolerance)
+        if not len(reached):
+            continue  # skipped or stopped before reaching the setpoint
+        seconds = (minutes[start + reached[0]] - minutes[start]) * 60
+        if seconds > 0:
+            yield delta, seconds
+
+
+class RunEstimate:
+    """
+    Predicted duration of every step of a Program, indexed like ProgramStep.index.
+    Open-ended steps (holds without a time, END&GRAPH) count only their ramp.
+    """
+    def __init__(self, step_sec, open_ended=False):
+        self.step_sec = np.asarray(step_sec, dtype=np.float64)
+        # _remaining[k] = seconds from the start of step k to the end of the run
+        self._remaining = np.append(np.cumsum(self.step_sec[::-1])[::-1], 0.0)
+        self.total_sec = float(self._remaining[0])
+        self.open_ended = open_ended
+
+    def remaining_sec(self, index, elapsed_in_step=0.0):
+        """Seconds left from `elapsed_in_step` seconds into step `index`."""
+        if index >= len(self.step_sec):
+            return 0.0
+        return float(self._remaining[index] - min(elapsed_in_step, self.step_sec[index]))
+
+
+def estimate_run(program, model=None, start_plate=None):
+    """Predicts the duration of each step of a compiled Program (see compile_protocol)."""
+    from protocol_manager import Incubate, EndGraph
+
+    model = model or RampModel()
+    plate = model.ambient if start_plate is None else start_plate
+    step_sec = np.zeros(program.total_steps)
+    open_ended = False
+    for step in program:
+        action = step.action
+        if isinstance(action, Incubate):
+            step_sec[step.index] = model.ramp_sec(plate, action.plate_temp) + (action.hold_sec or 0.0)
+            plate = action.plate_temp
+            open_ended = open_ended or action.hold_sec is None
+        elif isinstance(action, EndGraph):
+            open_ended = True
+    return RunEstimate(step_sec, open_ended)
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+
+if __name__ == '__main__':
+    from protocol_loader import load_protocol
+
+    parser = argparse.ArgumentParser(description="Estimate how long a protocol will take.")
+    parser.add_argument('protocol', help="protocol file (CSV, JSON or YAML)")
+    parser.add_argument('--port', help="fit the ramp model from this device's run logs")
+    parser.add_argument('--logs', default=pathlib.Path(__file__).parent / 'run_logs', help="run log directory")
+    parser.add_argument('--json', action='store_true', help="print per-step predictions as JSON")
+    args = parser.parse_args()
+
+    program = load_protocol(args.protocol).program
+    model = RampModel.for_device(args.port, args.logs) if args.port else RampModel()
+    estimate = estimate_run(program, model)
+    if args.json:
+        print(json.dumps({'total_sec': estimate.total_sec, 'open_ended': estimate.open_ended,
+                          'model': model.to_dict(), 'step_sec': estimate.step_sec.tolist()}))
+    else:
+        print(f"Ramp model: {model.to_dict()}")
+        print(f"Estimated run time: {format_duration(estimate.total_sec)}"
+              + (" (plus open-ended holds)" if estimate.open_ended else ""))
+        print(f"Nominal hold time: {format_duration(program.nominal_hold_sec)}")
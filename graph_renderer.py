@@ -0,0 +1,121 @@
+import argparse
+import datetime
+import os
+import pathlib
+import re
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from telemetry import minmax_indices, read_run_log
+
+
+def plot_line(ax, x, y, line_name, width_px):
+    """Plots one series, downsampled to about two points per pixel column."""
+    keep = minmax_indices(x, y, max(1, int(width_px)))
+    ax.plot(x[keep], y[keep], label=line_name)
+
+def draw_graph(fig, time, lid, plate, title):
+    """Draws the run's lid and plate temperatures onto `fig`."""
+    ax = fig.gca()
+    width_px = fig.get_figwidth() * fig.dpi
+    plot_line(ax, time, plate, 'Block_temp', width_px)
+    plot_line(ax, time, lid, 'Lid_temp', width_px)
+    ax.set_title(title + f' - {datetime.datetime.now().replace(second=0, microsecond=0)}')
+    ax.set_ylabel('Temperature - °C')
+    ax.set_xlabel('Time - minutes')
+    ax.set_ylim(-20, 120)
+    ax.legend()
+
+def render_graph(time, lid, plate, title, out_path):
+    """
+    Renders the graph to an image file (format from the suffix, e.g. .png or .svg)
+    on a standalone Agg figure, leaving pyplot's state alone.
+    """
+    # Imported lazily so render_graph_async() can hand off a graph without loading matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6), dpi=100)
+    FigureCanvasAgg(fig)
+    draw_graph(fig, time, lid, plate, title)
+    fig.savefig(out_path)
+    return pathlib.Path(out_path)
+
+def open_viewer(path):
+    """Opens an image in the platform's default viewer without waiting for it."""
+    try:
+        if sys.platform.startswith('win'):
+            os.startfile(path)
+        elif sys.platform == 'darwin':
+            subprocess.Popen(['open', str(path)])
+        else:
+            subprocess.Popen(['xdg-open', str(path)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        print(f"Could not open graph viewer: {e}")
+
+def graph_path(title, run_log=None, suffix='.png'):
+    """Where to save a run's graph: next to its run log, else in the temp directory."""
+    if run_log is not None:
+        return run_log.path.with_suffix(suffix)
+    safe_title = re.sub(r'[^\w-]+', '_', title).strip('_') or 'run'
+    return pathlib.Path(tempfile.gettempdir()) / f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{safe_title}{suffix}"
+
+def render_graph_async(graph, title, out_path, show=True):
+    """
+    Renders a snapshot of a TelemetryBuffer in a separate process, then optionally
+    opens it in a viewer. matplotlib is not thread-safe and the control window draws
+    its live chart on the main thread, so the graph is not drawn in this process.
+    Returns the Popen (None on failure); the caller never waits on matplotlib.
+    """
+    try:
+        fd, snapshot = tempfile.mkstemp(prefix='helixcycler-graph-', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **{name: graph.column(name) for name in ('time', 'lid', 'plate')})
+    except OSError as e:
+        print(f"Error: Could not render graph to {out_path}: {e}")
+        return None
+    command = [sys.executable, str(pathlib.Path(__file__).resolve()),
+               '--snapshot', snapshot, '--title', title, '--output', str(out_path)]
+    if show:
+        command.append('--show')
+    try:
+        return subprocess.Popen(command)
+    except OSError as e:
+        print(f"Error: Could not render graph to {out_path}: {e}")
+        os.remove(snapshot)
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render the temperature graph of a HelixCycler run log.")
+    parser.add_argument('run_log', nargs='?', help="path to a .hxlog file")
+    parser.add_argument('-o', '--output', help="image to write (default: next to the log, .png)")
+    parser.add_argument('--title', help="graph title (default: the log's experiment title)")
+    parser.add_argument('--show', action='store_true', help="open the image when done")
+    # Columns saved by render_graph_async(), deleted once read
+    parser.add_argument('--snapshot', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.snapshot:
+        if not args.output:
+            parser.error("--snapshot needs --output")
+        with np.load(args.snapshot) as records:
+            records = {name: records[name] for name in ('time', 'lid', 'plate')}
+        os.remove(args.snapshot)
+        title, out_path = args.title or '', args.output
+    elif args.run_log:
+        header, records = read_run_log(args.run_log)
+        title = args.title or header.get('experiment_title', '')
+        out_path = args.output or pathlib.Path(args.run_log).with_suffix('.png')
+    else:
+        parser.error("a run log is required")
+    try:
+        path = render_graph(records['time'], records['lid'], records['plate'], title, out_path)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not render graph to {out_path}: {e}")
+        sys.exit(1)
+    print(f"Graph saved to {path}")
+    if args.show:
+        open_viewer(path)
@@ -0,0 +1,190 @@
+import argparse
+import contextlib
+import json
+import pathlib
+import signal
+import sys
+import threading
+import time
+
+from tc_send_code import HardwareController
+from protocol_manager import protocol_dict, run_protocol, EndGraph
+from protocol_loader import ProtocolError
+from telemetry import TelemetryBuffer
+from estimator import format_duration
+import metrics
+
+# Never import tkinter, customtkinter or matplotlib at module level here: this
+# runner has to work over SSH on machines without a display (see --graph).
+
+RUN_LOG_DIR = pathlib.Path(__file__).parent / 'run_logs'
+EXIT_OK, EXIT_ERROR, EXIT_STOPPED = 0, 1, 130
+
+
+class ProgressPrinter:
+    """
+    Reports a run's progress on stdout, as readable lines or (with `json_lines`)
+    one JSON object per line: 'start', 'step', 'sample' and 'end' events.
+    Readable status lines are limited to one every `status_sec` seconds.
+    Also a TelemetryBuffer sink, so it sees every sample as it is recorded.
+    """
+    def __init__(self, out, json_lines=False, status_sec=10.0):
+        self.out = out
+        self.json_lines = json_lines
+        self.status_sec = status_sec
+        self._lock = threading.Lock()
+        self._last_status = None
+
+    def emit(self, event, text, **fields):
+        with self._lock:
+            if self.json_lines:
+                self.out.write(json.dumps(dict(event=event, **fields)) + '\n')
+            else:
+                self.out.write(text + '\n')
+            self.out.flush()
+
+    def step(self, step, program, seconds_left):
+        self.emit('step', f"Step {step.index + 1}/{program.total_steps}: stage {step.stage}, cycle {step.cycle}, "
+                          f"step {step.step} - {_describe(step.action)} (~{format_duration(seconds_left)} left)",
+                  index=step.index, total=program.total_steps, stage=step.stage, cycle=step.cycle, step=step.step,
+                  action=type(step.action).__name__, **step.action._asdict(), seconds_left=round(seconds_left, 1))
+
+    def append(self, minutes, lid, plate, setpoint, stage, cycle, step):
+        if not self.json_lines:
+            now = time.monotonic()
+            if self._last_status is not None and now - self._last_status < self.status_sec:
+                return
+            self._last_status = now
+        self.emit('sample', f"  {minutes:7.2f} min   lid {lid:6.2f} °C   plate {plate:6.2f} °C"
+                            + (f"   (target {setpoint:g} °C)" if setpoint is not None else ""),
+                  minutes=round(minutes, 4), lid=lid, plate=plate, setpoint=setpoint,
+                  stage=stage, cycle=cycle, step=step)
+
+
+def _describe(action):
+    if isinstance(action, EndGraph):
+        return "end, holding at the current plate temperature"
+    if not hasattr(action, 'plate_temp'):
+        return "deactivate all"
+    text = f"plate {action.plate_temp:g} °C " + (f"for {action.hold_sec:g} s" if action.hold_sec is not None else "(hold)")
+    return text + (f", lid {action.lid_temp:g} °C" if action.lid_temp is not None else "")
+
+
+def run(args, printer):
+    """Connects, runs the protocol until it ends or is interrupted, and returns the exit code."""
+    try:
+        prot_dict = protocol_dict(args.protocol)
+    except ProtocolError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    except OSError as e:
+        print(f"Error: Could not read {args.protocol}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    controller = HardwareController()
+    controller.trace_dir = args.trace
+    if not controller.connect(args.port):
+        return EXIT_ERROR
+
+    stop_event = threading.Event()
+    telemetry = TelemetryBuffer(ring=args.ring, sink=printer)
+    finished = threading.Event()
+    reached = {'end': False}
+    ignore = lambda text: None
+
+    def on_step(step, program, seconds_left):
+        printer.step(step, program, seconds_left)
+        if isinstance(step.action, EndGraph):
+            reached['end'] = True
+            if not args.hold:
+                stop_event.set()
+
+    def worker():
+        try:
+            run_protocol(controller, prot_dict, ignore, ignore, ignore, ignore, stop_event, args.title,
+                         update_sec=args.update_sec, max_update_sec=args.max_update_sec,
+                         telemetry=telemetry, log_dir=args.log_dir, render_graph=False, on_step=on_step)
+        except Exception as e:
+            print(f"Protocol thread encountered an error: {e}", file=sys.stderr)
+            reached['error'] = True
+        finally:
+            finished.set()
+
+    printer.emit('start', f"Running {args.protocol} on {args.port} as '{args.title}'"
+                          + (" - press Ctrl-C to stop" if sys.stdin.isatty() else ""),
+                 protocol=str(args.protocol), port=args.port, title=args.title)
+    thread = threading.Thread(target=worker, daemon=True)
+    start = time.monotonic()
+    thread.start()
+    try:
+        # Wait on an Event rather than Thread.join(), which Ctrl-C can leave in a bad state
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        print("Stopping...", file=sys.stderr)
+        stop_event.set()
+        finished.wait(controller.REPLY_TIMEOUT * 3)
+    finally:
+        # Leave the device safe whether the run finished, was stopped or failed
+        try:
+            controller.deactivate_all()
+        except Exception as e:
+            print(f"Error: Could not deactivate the device: {e}", file=sys.stderr)
+        controller.disconnect()
+
+    if reached.get('error'):
+        code, outcome = EXIT_ERROR, 'error'
+    elif stop_event.is_set() and not reached['end']:
+        code, outcome = EXIT_STOPPED, 'stopped'
+    else:
+        code, outcome = EXIT_OK, 'done'
+    elapsed = time.monotonic() - start
+    printer.emit('end', f"Run {outcome} after {format_duration(elapsed)}, {len(telemetry)} samples",
+                 outcome=outcome, elapsed_sec=round(elapsed, 1), samples=len(telemetry))
+    if args.graph and len(telemetry):
+        from graph_renderer import render_graph, graph_path
+        columns = telemetry.columns()
+        path = render_graph(columns['time'], columns['lid'], columns['plate'], args.title, graph_path(args.title))
+        printer.emit('graph', f"Graph saved to {path}", path=str(path))
+    return code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='helixcycler run', description="Run a protocol without the GUI.")
+    parser.add_argument('protocol', help="protocol file (CSV, JSON or YAML)")
+    parser.add_argument('--port', required=True, help="serial port, pyserial URL or sim://")
+    parser.add_argument('--title', default='headless', help="experiment title, used to name the run log")
+    parser.add_argument('--json', action='store_true', help="print JSON lines instead of text")
+    parser.add_argument('--log-dir', type=pathlib.Path, default=RUN_LOG_DIR, help="run log directory")
+    parser.add_argument('--hold', action='store_true',
+                        help="at END&GRAPH, hold the final temperature until Ctrl-C instead of finishing")
+    parser.add_argument('--graph', action='store_true', help="save a PNG of the run when it ends (needs matplotlib)")
+    parser.add_argument('--status-sec', type=float, default=10.0, help="seconds between status lines (text output)")
+    parser.add_argument('--update-sec', type=float, default=0.1, help="fastest poll interval")
+    parser.add_argument('--max-update-sec', type=float, default=2.0, help="slowest poll interval")
+    parser.add_argument('--ring', action='store_true', help="keep only recent samples in memory (very long runs)")
+    parser.add_argument('--trace', type=pathlib.Path, metavar='DIR',
+                        help="record all serial traffic to a trace file in DIR (see serial_trace.py)")
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics at http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-log-sec', type=float, help="print a metrics summary line this often")
+    args = parser.parse_args(argv)
+
+    # SIGTERM (e.g. from a service manager or a dropped SSH session) stops the run like Ctrl-C
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, interrupt)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, interrupt)
+
+    printer = ProgressPrinter(sys.stdout, json_lines=args.json, status_sec=args.status_sec)
+    if args.json:
+        # Keep stdout for JSON lines; the runner's own messages go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            metrics.start(args.metrics_port, args.metrics_log_sec)
+            return run(args, printer)
+    metrics.start(args.metrics_port, args.metrics_log_sec)
+    return run(args, printer)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
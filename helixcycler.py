@@ -1,82 +1,82 @@
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+if __name__ == "__main__" and sys.argv[1:2] == ["run"]:
+    # Headless run (python -m helixcycler run ...): never load the GUI toolkits
+    from headless import main
+    sys.exit(main(sys.argv[2:]))
+
 import tkinter as tk
 from tkinter import filedialog as fd
-from tkinter import PhotoImage
 import customtkinter
 from tc_send_code import HardwareController
-from protocol_manager import run_protocol, protocol_dict
-import csv
+from device_discovery import thermocycler_ports
+from view_model import ViewModel
+from startup_timing import report_when_painted
+from status_channel import publisher_for
+import importlib
+import os
 import threading
 import pathlib
-import sys
 import platform
 
+# protocol_manager, protocol_loader, estimator, telemetry, protocol_library and
+# live_chart (numpy, asyncio, matplotlib) are imported where first used, and
+# preloaded in the background once the window is up (see preload_modules).
+IMPORTS_DONE = time.perf_counter()
+
 # --- Setup base directory for assets ---
 BASE_DIR = pathlib.Path(__file__).parent
-IMAGE_PATH = BASE_DIR / 'HelixCycler.png'
+RUN_LOG_DIR = BASE_DIR / 'run_logs'
+PROTOCOL_INDEX_PATH = BASE_DIR / 'protocol_index.json'
 
 customtkinter.set_appearance_mode("Dark")
 customtkinter.set_default_color_theme('blue')
 
 
-class App(customtkinter.CTk):
-    WIDTH = 1200
-    HEIGHT = 720
+class ControlView(customtkinter.CTkFrame):
+    """
+    Control panel for one thermocycler: connection, presets, live temperatures
+    and protocol runs. Hosted one per window by App, or several per process by
+    DeviceTabs.
+    """
+    def __init__(self, master, port=None, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
 
-    def __init__(self):
-        super().__init__()
+        # --- Serial port this view was opened for, if any ---
+        self.auto_connect_port = port
 
-        # --- Check for command-line argument (serial port) ---
-        self.auto_connect_port = None
-        if len(sys.argv) > 1:
-            self.auto_connect_port = sys.argv[1]
-            print(f"Launched for port: {self.auto_connect_port}")
-
-        # --- Update title if launched for a specific port ---
         window_title = "HelixCycler"
         if self.auto_connect_port:
             window_title = f"HelixCycler - {self.auto_connect_port}"
-        self.title(window_title)
-
-        # Platform-specific maximizing
-        os_name = platform.system()
-        if os_name == "Darwin": # Darwin is the system name for macOS
-            try:
-                self.state('zoomed')
-            except tk.TclError:
-                print("Could not set window to zoomed state on macOS.")
-        elif os_name == "Linux" or os_name == "Windows":
-            try:
-                # Try the attributes method first (works on Windows, some Linux)
-                self.attributes('-zoomed', True)
-            except tk.TclError:
-                try:
-                    # Fallback for older Tkinter versions or other Linux environments
-                    self.wm_attributes('-zoomed', True)
-                except tk.TclError:
-                    # If both fail, just proceed without maximizing initially
-                    print(f"Could not set window to zoomed state on {os_name}.")
-        else:
-             # Optional: Handle other OS or just skip maximizing
-             print(f"Unsupported OS ({os_name}) for zoomed state.")
-
-        try:
-            self.bg = PhotoImage(file=IMAGE_PATH)
-        except Exception as e:
-            print(f"Could not load background image: {e}")
-            self.bg = None
-
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         # --- App state ---
         self.controller = HardwareController()
         self.protocol_thread = None
         self.emergency_stop_event = threading.Event()
-        self.tc_protocol = {}
+        self.tc_protocol = None  # compiled Program
+        self.ramp_model = None  # fitted from this device's run logs, see _fit_ramp_model
         self.param_frame_left = None
+        self.live_chart = None
 
         self.monitor_thread = None
         self.monitor_stop_event = threading.Event()
 
+        # --- Status reported to the launcher's dashboard, if started from one ---
+        self.status = publisher_for(f"{os.getpid()}-{id(self)}")
+
+        # --- Display values published by the monitor and protocol threads ---
+        self.view_model = ViewModel(self, max_fps=10)
+        self.view_model.bind('idle_lid', lambda: self.fr_lid_value_label)
+        self.view_model.bind('idle_plate', lambda: self.fr_plate_value_label)
+        self.view_model.bind('step', lambda: getattr(self, 'running_label', None), font=("Roboto Medium", -18))
+        self.view_model.bind('lid', lambda: getattr(self, 'current_lid_value_label', None))
+        self.view_model.bind('plate', lambda: getattr(self, 'current_plate_value_label', None))
+        self.view_model.bind('time', lambda: getattr(self, 'step_time_value_label', None))
+        self.view_model.start()
+
         # ============ create frames ============
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
@@ -110,7 +110,10 @@ class App(customtkinter.CTk):
         self.port_label.grid(row=0, column=2, sticky="e", padx=(10,0))
 
         # --- Populate ports, select auto_connect_port if provided ---
-        available_ports = self.controller.get_available_ports()
+        available_ports = thermocycler_ports()
+        if self.auto_connect_port and self.auto_connect_port not in available_ports:
+            # e.g. a simulator pty or sim:// URL, which comports() does not list
+            available_ports = [self.auto_connect_port] + [p for p in available_ports if p != "No Ports Found"]
         self.port_menu = customtkinter.CTkOptionMenu(master=self.title_frame, values=available_ports)
         if self.auto_connect_port and self.auto_connect_port in available_ports:
              self.port_menu.set(self.auto_connect_port)
@@ -134,7 +137,6 @@ class App(customtkinter.CTk):
 
 
         # ============ Preset Row ============
-        # ... (rest of UI layout is unchanged) ...
         self.preset_frame.grid_columnconfigure(0, weight=4)
         self.preset_frame.grid_columnconfigure(1, weight=3)
         self.preset_frame.grid_rowconfigure(0, weight=1)
@@ -206,7 +208,9 @@ class App(customtkinter.CTk):
 
 
     def show_setup_frame(self):
-        # ... (this function is unchanged) ...
+        if self.live_chart:
+            self.live_chart.stop()
+            self.live_chart = None
         if self.param_frame_left:
              self.param_frame_left.destroy()
         self.cancel_dialog()
@@ -222,12 +226,15 @@ class App(customtkinter.CTk):
         self.experiment_name_label.grid(row=1, column=0, columnspan=1, sticky="ew", padx=5, pady=10)
         self.experiment_name_label.bind("<KeyRelease>", self.run_ready_check)
         self.import_button = customtkinter.CTkButton(master=self.param_frame_left, text="Import", font=("Roboto Medium", -20), text_color='White', width=150, command=self.select_file)
-        self.import_button.grid(row=2, column=0, columnspan=2, sticky="n", padx=5, pady=5)
+        self.import_button.grid(row=2, column=0, sticky="ne", padx=5, pady=5)
+        self.library_button = customtkinter.CTkButton(master=self.param_frame_left, text="Library", font=("Roboto Medium", -20), text_color='White', width=150, command=self.open_library)
+        self.library_button.grid(row=2, column=1, sticky="nw", padx=5, pady=5)
         self.run_button = customtkinter.CTkButton(master=self.param_frame_left, text="Run Protocol", font=("Roboto Medium", -20), fg_color='grey', text_color='White', width=250, height=50, state='disabled', command=self.start_run_thread)
         self.run_button.grid(row=3, column=0, columnspan=2, sticky="n", padx=5, pady=5)
         self.run_ready_check()
         state = "normal" if self.controller.port else "disabled"
         self.import_button.configure(state=state)
+        self.library_button.configure(state=state)
 
 
     # --- Connection Methods ---
@@ -236,7 +243,7 @@ class App(customtkinter.CTk):
         # --- Don't allow refresh if launched for specific port ---
         if self.auto_connect_port:
             return
-        self.port_menu.configure(values=self.controller.get_available_ports())
+        self.port_menu.configure(values=thermocycler_ports())
 
     # --- UPDATED FUNCTION ---
     def toggle_connection(self):
@@ -253,8 +260,8 @@ class App(customtkinter.CTk):
                  self.refresh_ports_button.configure(state="normal")
                  
             self.set_controls_state("disabled")
-            self.fr_lid_value_label.configure(text='°C')
-            self.fr_plate_value_label.configure(text='°C')
+            self.view_model.publish(idle_lid='°C', idle_plate='°C')
+            self.publish_status(state='disconnected', lid=None, plate=None)
         else:
             # --- Connect ---
             port_name = self.port_menu.get()
@@ -263,18 +270,19 @@ class App(customtkinter.CTk):
                 return
 
             if self.controller.connect(port_name):
+                threading.Thread(target=self._fit_ramp_model, args=(port_name,), daemon=True).start()
                 self.connection_status_label.configure(text="Connected", text_color="light green")
                 self.connect_button.configure(text="Disconnect", fg_color="dark red")
                 self.port_menu.configure(state="disabled") # Always disable menu when connected
                 self.refresh_ports_button.configure(state="disabled") # Always disable refresh when connected
                 self.set_controls_state("normal")
+                self.publish_status(state='idle', port=port_name)
             else:
                 self.connection_status_label.configure(text="Failed", text_color="red")
                 # Ensure controls are disabled on failed connect
                 self.set_controls_state("disabled")
 
     def set_controls_state(self, state):
-        # ... (this function is unchanged) ...
         self.open_lid_button.configure(state=state)
         self.close_lid_button.configure(state=state)
         self.plate_button.configure(state=state)
@@ -296,35 +304,39 @@ class App(customtkinter.CTk):
             self.run_ready_check()
         if hasattr(self, 'import_button') and self.import_button:
             self.import_button.configure(state=state)
+            self.library_button.configure(state=state)
 
 
     def _monitor_temperatures(self, stop_event):
-        # ... (this function is unchanged) ...
+        from protocol_manager import AdaptivePoller
+
         print("Starting temperature monitor thread.")
-        def safe_configure(widget, text):
-            try:
-                if widget and widget.winfo_exists():
-                    widget.configure(text=text)
-            except Exception as e:
-                print(f"Safe configure error in monitor: {e}")
+        poller = AdaptivePoller(min_interval=0.5, max_interval=5.0)
         while not stop_event.is_set():
             try:
                 if not self.controller or not self.controller.port: break
-                lid_temp = self.controller.get_lid_temperature()
-                plate_temp, _ = self.controller.get_plate_info()
-                self.after(0, lambda t=f"{lid_temp:.1f} °C": safe_configure(self.fr_lid_value_label, t))
-                self.after(0, lambda t=f"{plate_temp:.1f} °C": safe_configure(self.fr_plate_value_label, t))
-                stop_event.wait(2.0)
+                lid_temp, plate_temp, _ = self.controller.get_status()
+                self.view_model.publish(idle_lid=f"{lid_temp:.1f} °C", idle_plate=f"{plate_temp:.1f} °C")
+                self.publish_status(lid=round(lid_temp, 1), plate=round(plate_temp, 1))
+                stop_event.wait(poller.next_interval(lid_temp, plate_temp))
             except Exception as e:
                 print(f"Monitor thread error (device likely disconnected): {e}")
                 break
         print("Stopping temperature monitor thread.")
 
 
+    def _fit_ramp_model(self, port_name):
+        from estimator import RampModel
+
+        try:
+            self.ramp_model = RampModel.for_device(port_name, RUN_LOG_DIR)
+        except Exception as e:
+            print(f"Could not fit ramp model for {port_name}: {e}")
+
+
     # --- Protocol Run Methods ---
 
     def start_run_thread(self):
-        # ... (this function is unchanged) ...
         experiment_title = self.experiment_name_label.get()
         self.set_controls_state("disabled")
         if self.param_frame_left: self.param_frame_left.destroy()
@@ -351,45 +363,63 @@ class App(customtkinter.CTk):
         self.skip_step_button.grid(row=3, column=0, columnspan=2, sticky="e", padx=10, pady=5)
         self.emergency_stop_button = customtkinter.CTkButton(master=self.param_frame_left, width=200, height=35, text='Emergency Stop', fg_color='dark red', command=self.emergency_stop_are_you_sure)
         self.emergency_stop_button.grid(row=3, column=2, columnspan=2, sticky="w", padx=10, pady=5)
-        self.protocol_thread = threading.Thread(target=self._run_protocol_wrapper, args=(experiment_title,), daemon=True)
+        self.view_model.publish(step='', lid='', plate='', time='')
+        self.view_model.forget('step', 'lid', 'plate', 'time')
+        from telemetry import TelemetryBuffer
+        from live_chart import LiveChart
+
+        telemetry = TelemetryBuffer(sink=self.status)
+        self.publish_status(state='running', title=experiment_title, protocol=pathlib.Path(self.path_label.cget('text')).name)
+        self.live_chart = LiveChart(self.param_frame_left, telemetry)
+        self.live_chart.widget.grid(row=4, column=0, columnspan=4, rowspan=2, sticky="nswe", padx=10, pady=5)
+        self.live_chart.start()
+        self.protocol_thread = threading.Thread(target=self._run_protocol_wrapper, args=(experiment_title, telemetry), daemon=True)
         self.protocol_thread.start()
 
 
-    def _run_protocol_wrapper(self, experiment_title):
-        # ... (this function is unchanged) ...
-        def safe_configure(widget, **kwargs):
-            try:
-                if widget and widget.winfo_exists(): widget.configure(**kwargs)
-            except Exception as e: print(f"Safe configure error: {e}")
-        def update_step_label(text): self.after(0, lambda t=text: safe_configure(self.running_label, text=t, font=("Roboto Medium", -18)))
-        def update_lid_label(text): self.after(0, lambda t=text: safe_configure(self.current_lid_value_label, text=t))
-        def update_plate_label(text): self.after(0, lambda t=text: safe_configure(self.current_plate_value_label, text=t))
-        def update_time_label(text): self.after(0, lambda t=text: safe_configure(self.step_time_value_label, text=t))
+    def _run_protocol_wrapper(self, experiment_title, telemetry=None):
+        from protocol_manager import run_protocol
+
+        def update_step_label(text): self.view_model.publish(step=text)
+        def update_lid_label(text): self.view_model.publish(lid=text)
+        def update_plate_label(text): self.view_model.publish(plate=text)
+        def update_time_label(text): self.view_model.publish(time=text)
         try:
-            run_protocol(self.controller, self.tc_protocol, update_step_label, update_lid_label, update_plate_label, update_time_label, self.emergency_stop_event, experiment_title)
+            run_protocol(self.controller, self.tc_protocol, update_step_label, update_lid_label, update_plate_label, update_time_label, self.emergency_stop_event, experiment_title, telemetry=telemetry, log_dir=RUN_LOG_DIR, ramp_model=self.ramp_model, on_step=self._step_started)
         except Exception as e: print(f"Protocol thread encountered an error: {e}")
         finally:
             print("Protocol thread finished. Scheduling UI reset.")
             self.after(100, self._reset_ui_after_run)
 
 
+    def _step_started(self, step, program, seconds_left):
+        self.publish_status(index=step.index, total=program.total_steps, stage=step.stage, cycle=step.cycle,
+                            step=step.step, eta=time.time() + seconds_left)
+
+    def publish_status(self, **fields):
+        """Updates the status shown in the launcher's dashboard (no-op without a launcher); any thread."""
+        if self.status:
+            self.status.update(**fields)
+
+    def _run_ended(self):
+        self.publish_status(state='idle' if self.controller.port else 'disconnected',
+                            title=None, protocol=None, index=None, eta=None)
+
     def _reset_ui_after_run(self):
-        # ... (this function is unchanged) ...
         if self.protocol_thread is None: print("UI reset skipped; already handled by emergency_stop."); return
         self.protocol_thread = None
         self.emergency_stop_event.clear()
-        self.fr_plate_value_label.configure(text='°C')
-        self.fr_lid_value_label.configure(text='°C')
+        self.view_model.publish(idle_lid='°C', idle_plate='°C')
+        self._run_ended()
         self.show_setup_frame()
         self.set_controls_state("normal")
         print("UI has been reset after normal run.")
 
 
     def run_ready_check(self, event=None):
-        # ... (this function is unchanged) ...
         if not (hasattr(self, 'run_button') and self.run_button): return
         is_connected = self.controller.port is not None
-        has_protocol = len(self.tc_protocol) > 0
+        has_protocol = bool(self.tc_protocol)
         has_name = len(self.experiment_name_label.get()) > 5
         is_running = self.protocol_thread and self.protocol_thread.is_alive()
         if is_connected and has_protocol and has_name and not is_running: self.run_button.configure(state='normal', fg_color='dark red')
@@ -397,31 +427,40 @@ class App(customtkinter.CTk):
 
 
     def select_file(self):
-        # ... (this function is unchanged) ...
-        self.wm_attributes('-topmost', 1)
+        self.winfo_toplevel().wm_attributes('-topmost', 1)
         try:
-            file = fd.askopenfile(parent=self, initialdir='')
-            if not file: self.wm_attributes('-topmost', 0); return
-            txt_name = file.name
-            self.wm_attributes('-topmost', 0)
-            self.path_label.configure(text=txt_name)
-            self.tc_protocol = protocol_dict(txt_name)
-            self.run_ready_check()
-            string = ""
-            with open(txt_name, 'r') as read_file:
-                csv_read = csv.reader(read_file, delimiter=',')
-                step_count, stage_count = 1, 1
-                for line in csv_read:
-                    if line[0] == 'CYCLES': string += f'\n\n\t\tStage - {stage_count}\nCycles - {line[1]}\nStep    Plate_temp    Time(seconds)    Set Lid Target\n'; step_count, stage_count = 1, stage_count + 1
-                    elif line[0] == 'STEP': time_val = line[3] if line[3] else 'Hold'; string += f'  {step_count}                {line[2]}                        {time_val}                                  {line[4]}\n'; step_count += 1
-                    elif line[0] == 'DEACTIVATE_ALL': string += f'  {step_count}                                 Deactivate All\n'; step_count += 1
-                    elif line[0] == 'END&GRAPH': string += f'  {step_count}                                  End Protocol\n'
-                self.protocol_label.configure(text=string, font=("Roboto Medium", -12), text_color='white', justify='left')
+            file_name = fd.askopenfilename(parent=self, initialdir='', filetypes=[("Protocols", "*.csv *.json *.yaml *.yml"), ("All files", "*")])
+        finally:
+            self.winfo_toplevel().wm_attributes('-topmost', 0)
+        if file_name:
+            self.load_protocol_file(file_name)
+
+
+    def open_library(self):
+        ProtocolLibraryWindow(self, on_select=self.load_protocol_file)
+
+
+    def load_protocol_file(self, file_name):
+        """Loads a protocol (parsed once, cached) and shows its summary or every error found."""
+        from protocol_loader import load_protocol, ProtocolError
+        from estimator import estimate_run, format_duration
+
+        self.path_label.configure(text=file_name)
+        try:
+            loaded = load_protocol(file_name)
+            self.tc_protocol = loaded.program
+            estimate = estimate_run(self.tc_protocol, self.ramp_model)
+            string = loaded.summary + f'\n\nEstimated run time: {format_duration(estimate.total_sec)}'
+            if estimate.open_ended: string += ' (plus open-ended holds)'
+            self.protocol_label.configure(text=string, font=("Roboto Medium", -12), text_color='white', justify='left')
+        except ProtocolError as e:
+            shown = e.errors[:12] + ([f'... and {len(e.errors) - 12} more'] if len(e.errors) > 12 else [])
+            self.protocol_label.configure(text='Protocol Errors:\n\n' + '\n'.join(shown), font=("Roboto Medium", -14), text_color='yellow', justify='left')
+            self.tc_protocol = None
         except Exception as e:
-            self.wm_attributes('-topmost', 0)
             self.path_label.configure(text='File Error', font=("Roboto Medium", -16))
             self.protocol_label.configure(text=f'Input File Error: {e}\n\nCheck CSV format.\nMust start with CYCLES.', font=("Roboto Medium", -16), text_color='yellow')
-            self.tc_protocol = {}
+            self.tc_protocol = None
         self.run_ready_check()
 
 
@@ -464,11 +503,11 @@ class App(customtkinter.CTk):
 
 
     def emergency_stop(self):
-        # ... (this function is unchanged) ...
         print("EMERGENCY STOP button pressed.")
         self.protocol_thread = None
         self.emergency_stop_event.set()
         if self.controller: self.controller.deactivate_all()
+        self._run_ended()
         self.show_setup_frame()
         self.set_controls_state("normal")
         self.cancel_dialog()
@@ -501,14 +540,298 @@ class App(customtkinter.CTk):
         if self.controller: self.controller.close_lid()
 
 
-    def on_closing(self, event=0):
-        # ... (this function is unchanged) ...
+    def shutdown(self):
+        """Stops any run, deactivates the device and disconnects."""
         self.emergency_stop_event.set()
         self.monitor_stop_event.set()
+        self.view_model.stop()
+        if self.status: self.status.close()
         if self.controller: self.controller.deactivate_all(); self.controller.disconnect()
+
+
+_library = None
+
+def get_protocol_library():
+    """The process-wide ProtocolLibrary, shared by every control view."""
+    global _library
+    if _library is None:
+        from protocol_library import ProtocolLibrary
+        _library = ProtocolLibrary(PROTOCOL_INDEX_PATH)
+    return _library
+
+
+class ProtocolLibraryWindow(customtkinter.CTkToplevel):
+    """
+    Searchable list of the protocols in the indexed folders. Shows the saved
+    index at once, then rescans (changed files only) in the background and keeps
+    watching the folders while open. Double-click or "Load Selected" loads one.
+    """
+    def __init__(self, master, on_select):
+        super().__init__(master)
+        self.title("Protocol Library")
+        self.geometry("760x480")
+        self.on_select = on_select
+        self.library = get_protocol_library()
+        self.results = []
+        self.selected_line_num = None
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.search_frame = customtkinter.CTkFrame(self)
+        self.search_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 5))
+        self.search_frame.grid_columnconfigure(0, weight=1)
+        self.search_entry = customtkinter.CTkEntry(self.search_frame, placeholder_text='Search protocols (name or folder)')
+        self.search_entry.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
+        self.search_entry.bind("<KeyRelease>", lambda event: self.refresh_results())
+        self.add_folder_button = customtkinter.CTkButton(self.search_frame, text="Add Folder...", width=110, command=self.add_folder)
+        self.add_folder_button.grid(row=0, column=1, padx=5, pady=5)
+        self.rescan_button = customtkinter.CTkButton(self.search_frame, text="Rescan", width=90, command=self.rescan)
+        self.rescan_button.grid(row=0, column=2, padx=5, pady=5)
+
+        self.results_box = customtkinter.CTkTextbox(self, activate_scrollbars=True, wrap="none")
+        self.results_box.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
+        self.results_box.bind("<Button-1>", self.on_click)
+        self.results_box.bind("<Double-Button-1>", lambda event: self.load_selected())
+        self.results_box.tag_config("selected", background="#303F9F")
+        self.results_box.configure(state="disabled")
+
+        self.bottom_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        self.bottom_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=(5, 10))
+        self.bottom_frame.grid_columnconfigure(0, weight=1)
+        self.status_label = customtkinter.CTkLabel(self.bottom_frame, text="", text_color='grey')
+        self.status_label.grid(row=0, column=0, sticky="w")
+        self.load_button = customtkinter.CTkButton(self.bottom_frame, text="Load Selected", state="disabled", command=self.load_selected)
+        self.load_button.grid(row=0, column=1, sticky="e")
+
+        self.refresh_results()
+        # Also tells the background scans the window is gone (see _from_background)
+        self.watch_stop_event = self.library.watch(on_change=lambda: self._from_background(self.refresh_results))
+        self.rescan()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def add_folder(self):
+        folder = fd.askdirectory(parent=self, title="Add Protocol Folder")
+        if folder:
+            self.rescan(folder)
+
+    def rescan(self, folder=None):
+        if not folder and not self.library.roots:
+            self.status_label.configure(text="No folders indexed yet - use Add Folder...")
+            return
+        self.status_label.configure(text="Scanning...")
+        threading.Thread(target=self._scan, args=(folder,), daemon=True).start()
+
+    def _scan(self, folder):
+        try:
+            added, updated, removed = self.library.scan(folder)
+            status = f"Scan done: {added} added, {updated} updated, {removed} removed."
+        except OSError as e:
+            status = f"Scan failed: {e}"
+        self._from_background(lambda: self._scan_done(status))
+
+    def _scan_done(self, status):
+        self.refresh_results()
+        self.status_label.configure(text=status)
+
+    def _from_background(self, callback):
+        """Runs callback on the Tk thread, unless the window has been closed by then."""
+        def run():
+            try:
+                if self.winfo_exists():
+                    callback()
+            except tk.TclError:
+                pass
+        if self.watch_stop_event.is_set():
+            return
+        try:
+            self.after(0, run)
+        except (tk.TclError, RuntimeError):
+            # Closed between the check and the call, or the main loop has ended
+            pass
+
+    def refresh_results(self):
+        from protocol_library import describe
+
+        self.results = self.library.search(self.search_entry.get())
+        self.selected_line_num = None
+        self.load_button.configure(state="disabled")
+        self.results_box.configure(state="normal")
+        self.results_box.delete("1.0", "end")
+        self.results_box.insert("1.0", "\n".join(describe(entry) for entry in self.results) or "No protocols found")
+        self.results_box.configure(state="disabled")
+        self.status_label.configure(text=f"{len(self.results)} of {len(self.library.entries)} protocols")
+
+    def on_click(self, event):
+        line_num = int(self.results_box.index(f"@{event.x},{event.y}").split('.')[0])
+        self.results_box.tag_remove("selected", "1.0", "end")
+        if line_num > len(self.results) or self.results[line_num - 1]['error']:
+            self.selected_line_num = None
+            self.load_button.configure(state="disabled")
+            return
+        self.selected_line_num = line_num
+        self.results_box.tag_add("selected", f"{line_num}.0", f"{line_num}.end+1c")
+        self.load_button.configure(state="normal")
+
+    def load_selected(self):
+        if self.selected_line_num is None:
+            return
+        path = self.results[self.selected_line_num - 1]['path']
+        self.on_closing()
+        self.on_select(path)
+
+    def on_closing(self, event=0):
+        self.watch_stop_event.set()
         self.destroy()
 
 
+class DeviceTabs(customtkinter.CTkTabview):
+    """
+    Hosts one ControlView per serial port in tabs, sharing the process, imports
+    and Tk mainloop between devices.
+    """
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.views = {}
+
+    def add_device(self, port):
+        if port in self.views:
+            self.set(port)
+            return self.views[port]
+        tab = self.add(port)
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(0, weight=1)
+        view = ControlView(tab, port=port)
+        view.grid(row=0, column=0, sticky="nsew")
+        self.views[port] = view
+        self.set(port)
+        return view
+
+    def remove_device(self, port):
+        view = self.views.pop(port, None)
+        if view:
+            view.shutdown()
+            self.delete(port)
+
+    def shutdown(self):
+        for port in list(self.views):
+            self.remove_device(port)
+
+
+class DeviceHostWindow(customtkinter.CTkToplevel):
+    """
+    Secondary window holding DeviceTabs, used by the launcher to open devices in its
+    own process. `on_change` is called after a device is added or removed.
+    """
+    def __init__(self, master, on_change=None):
+        super().__init__(master)
+        self.title("HelixCycler")
+        self.geometry(f"{App.WIDTH}x{App.HEIGHT}")
+        self.on_change = on_change
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.devices = DeviceTabs(self)
+        self.devices.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.close_device_button = customtkinter.CTkButton(master=self, text="Close Current Device", command=self.close_current_device)
+        self.close_device_button.grid(row=1, column=0, sticky="e", padx=10, pady=(0, 10))
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def add_device(self, port):
+        view = self.devices.add_device(port)
+        self._changed()
+        return view
+
+    def close_current_device(self):
+        port = self.devices.get()
+        if port:
+            self.devices.remove_device(port)
+            self._changed()
+        if not self.devices.views:
+            self.on_closing()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def on_closing(self, event=0):
+        self.devices.shutdown()
+        self.destroy()
+        self._changed()
+
+
+class App(customtkinter.CTk):
+    WIDTH = 1200
+    HEIGHT = 720
+
+    def __init__(self, ports=None):
+        super().__init__()
+
+        # --- Check for command-line arguments (serial ports) ---
+        if ports is None:
+            ports = sys.argv[1:]
+        for port in ports:
+            print(f"Launched for port: {port}")
+
+        # --- Update title if launched for a specific port ---
+        window_title = "HelixCycler"
+        if len(ports) == 1:
+            window_title = f"HelixCycler - {ports[0]}"
+        self.title(window_title)
+
+        # Platform-specific maximizing
+        os_name = platform.system()
+        if os_name == "Darwin": # Darwin is the system name for macOS
+            try:
+                self.state('zoomed')
+            except tk.TclError:
+                print("Could not set window to zoomed state on macOS.")
+        elif os_name == "Linux" or os_name == "Windows":
+            try:
+                # Try the attributes method first (works on Windows, some Linux)
+                self.attributes('-zoomed', True)
+            except tk.TclError:
+                try:
+                    # Fallback for older Tkinter versions or other Linux environments
+                    self.wm_attributes('-zoomed', True)
+                except tk.TclError:
+                    # If both fail, just proceed without maximizing initially
+                    print(f"Could not set window to zoomed state on {os_name}.")
+        else:
+             # Optional: Handle other OS or just skip maximizing
+             print(f"Unsupported OS ({os_name}) for zoomed state.")
+
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # --- One device per window, or tabs when several ports are given ---
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        if len(ports) > 1:
+            self.devices = DeviceTabs(self)
+            for port in ports:
+                self.devices.add_device(port)
+        else:
+            self.devices = ControlView(self, port=ports[0] if ports else None)
+        self.devices.grid(row=0, column=0, sticky="nsew")
+
+        report_when_painted(self, STARTED, IMPORTS_DONE)
+        self.after(1000, lambda: threading.Thread(target=preload_modules, daemon=True).start())
+
+    def on_closing(self, event=0):
+        self.devices.shutdown()
+        self.destroy()
+
+
+def preload_modules():
+    """Imports the modules deferred at startup, so the first protocol load or run doesn't wait for them."""
+    for name in ('protocol_loader', 'estimator', 'protocol_library', 'live_chart'):
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Could not preload {name}: {e}")
+
+
 if __name__ == "__main__":
+    import metrics
+    metrics.start()  # Only if HELIXCYCLER_METRICS_PORT / _LOG_SEC are set
     app = App()
     app.mainloop()
\ No newline at end of file
@@ -1,17 +1,25 @@
+import time
+
+STARTED = time.perf_counter()
+
+import bisect
 import customtkinter
+import os
 import subprocess
 import sys
 import threading
-import time
+from startup_timing import report_when_painted
 try:
-    from tc_send_code import HardwareController
+    from device_discovery import discover, describe, PortWatcher
+    from status_channel import StatusListener, STATUS_ADDR_ENV, describe as describe_status
 except ImportError as e:
-    print(f"Error importing HardwareController: {e}")
-    print("Make sure 'tc_send_code.py' is in the same directory as 'launcher.py'.")
+    print(f"Error importing device discovery: {e}")
+    print("Make sure 'device_discovery.py' and 'tc_send_code.py' are in the same directory as 'launcher.py'.")
     sys.exit(1)
 except Exception as e:
     print(f"An unexpected error occurred during import: {e}")
     sys.exit(1)
+IMPORTS_DONE = time.perf_counter()
 
 
 customtkinter.set_appearance_mode("Dark")
@@ -21,14 +29,16 @@ customtkinter.set_default_color_theme("blue")
 SELECTED_BG_COLOR = "#303F9F" # A darker blue
 
 class LauncherApp(customtkinter.CTk):
+    DASHBOARD_MS = 500
+
     def __init__(self):
         super().__init__()
 
         self.title("HelixCycler Launcher")
-        self.geometry("500x350") # Slightly taller for clarity
+        self.geometry("640x560") # Room for the fleet status below the port list
 
         self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(1, weight=1)
+        self.grid_rowconfigure((1, 4), weight=1)
 
         # --- Title ---
         self.title_label = customtkinter.CTkLabel(self, text="Select Thermocycler Port", font=("Roboto Medium", -18))
@@ -52,64 +62,168 @@ class LauncherApp(customtkinter.CTk):
         self.button_frame = customtkinter.CTkFrame(self)
         self.button_frame.grid(row=2, column=0, columnspan=2, pady=10)
 
-        self.refresh_button = customtkinter.CTkButton(self.button_frame, text="Refresh Ports", command=self.refresh_ports)
+        self.refresh_button = customtkinter.CTkButton(self.button_frame, text="Refresh Ports", command=lambda: self.refresh_ports(retry_failed=True))
         self.refresh_button.grid(row=0, column=0, padx=10)
 
         self.launch_button = customtkinter.CTkButton(self.button_frame, text="Launch Control Window", state="disabled", command=self.launch_control_window)
         self.launch_button.grid(row=0, column=1, padx=10)
 
+        # --- Open devices as tabs in this process instead of one process per port ---
+        self.single_process_var = customtkinter.BooleanVar(value="--single-process" in sys.argv)
+        self.single_process_checkbox = customtkinter.CTkCheckBox(self.button_frame, text="Open in shared window (single process)", variable=self.single_process_var)
+        self.single_process_checkbox.grid(row=1, column=0, columnspan=2, pady=(10, 0))
+
+        # --- Fleet status: one line per open control view, reported over a local socket ---
+        self.status_label = customtkinter.CTkLabel(self, text="Fleet Status", font=("Roboto Medium", -16))
+        self.status_label.grid(row=3, column=0, columnspan=2, pady=(5, 0))
+        self.status_box = customtkinter.CTkTextbox(self, activate_scrollbars=True, wrap="none", height=120)
+        self.status_box.grid(row=4, column=0, columnspan=2, sticky="nsew", padx=20, pady=(5, 15))
+        self.status_box.insert("1.0", "No control windows open")
+        self.status_box.configure(state="disabled")
+        self.status_lines = ["No control windows open"]
+
+        # Control views started from here (child processes inherit the environment) report to this listener
+        self.status_listener = StatusListener()
+        self.status_listener.start()
+        os.environ[STATUS_ADDR_ENV] = self.status_listener.address
+        self.after(self.DASHBOARD_MS, self._refresh_dashboard)
+
         # --- State Tracking ---
         self.launched_windows = {}
+        self.host_window = None # DeviceHostWindow for in-process devices
         self.selected_port = None
         self.selected_line_num = None # Store the highlighted line number
+        self.listed_ports = [] # port on each line of the listbox, in order
+        self.devices = {} # port -> Device shown for it
+        self.showing_message = False # listbox holds a message instead of ports
+        self.scanning = False
+        self.rescan_pending = None # retry_failed for a refresh requested during a scan
 
         # --- Initial Refresh ---
         self.refresh_ports()
 
-        # --- Start Thread to Check for Closed Windows ---
-        self.check_processes_thread = threading.Thread(target=self._check_launched_processes, daemon=True)
-        self.check_processes_thread.start()
+        # --- Watch for devices being plugged in or removed ---
+        self.port_watcher = PortWatcher(self._ports_changed)
+        self.port_watcher.start()
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        report_when_painted(self, STARTED, IMPORTS_DONE)
 
     # --- UPDATED FUNCTION ---
-    def refresh_ports(self):
-        """Scans for available serial ports and updates the listbox."""
+    def refresh_ports(self, retry_failed=False):
+        """Rescans for thermocyclers on a background thread; _show_devices() updates the listbox."""
+        if self.scanning:
+            self.rescan_pending = bool(self.rescan_pending) or retry_failed
+            return
         print("Refreshing ports...")
+        self.scanning = True
+        # Ports open in a control window are listed from the cache, never probed
+        busy = {port for port in self.launched_windows if self._running(port)}
+        if self.host_window is not None and self.host_window.winfo_exists():
+            busy.update(self.host_window.devices.views)
+        threading.Thread(target=self._scan_ports, args=(busy, retry_failed), daemon=True).start()
+
+    def _scan_ports(self, busy, retry_failed):
+        try:
+            # Every port if none has a thermocycler's USB IDs, so unlisted models still show up
+            devices = (discover(busy=busy, retry_failed=retry_failed)
+                       or discover(all_ports=True, busy=busy, retry_failed=retry_failed))
+            error = None
+        except Exception as e:
+            devices, error = [], e
+        try:
+            self.after(0, self._show_devices, devices, error)
+        except RuntimeError:
+            pass # Launcher already closed
+
+    def _ports_changed(self, added, removed):
+        # PortWatcher thread: a device was plugged in or removed. New devices may
+        # still be booting, so those that failed to answer before are probed again.
+        print(f"Ports changed: added {sorted(added)}, removed {sorted(removed)}")
+        self.after(0, self.refresh_ports, True)
+
+    def _show_devices(self, devices, error=None):
+        """Updates the listbox in place, touching only the lines that changed."""
+        self.scanning = False
+        if self.rescan_pending is not None:
+            retry_failed, self.rescan_pending = self.rescan_pending, None
+            self.refresh_ports(retry_failed)
+            return
+        if error is not None:
+            print(f"Error getting available ports: {error}")
+            self._show_message(f"Error scanning ports: {error}")
+            return
+        print(f"Found ports: {[device.port for device in devices]}")
+        found = {device.port: device for device in devices}
         self.port_listbox.configure(state="normal")
-        # Remove previous selection highlight
-        if self.selected_line_num is not None:
-             self.port_listbox.tag_remove("selected", f"{self.selected_line_num}.0", f"{self.selected_line_num}.end")
-        self.selected_line_num = None
+        if self.showing_message:
+            self.port_listbox.delete("1.0", "end")
+            self.showing_message = False
+        # Lines of ports that are gone, bottom up so the line numbers above stay valid
+        for index in reversed(range(len(self.listed_ports))):
+            if self.listed_ports[index] not in found:
+                self.port_listbox.delete(f"{index + 1}.0", f"{index + 2}.0")
+                del self.listed_ports[index]
+        old_devices, self.devices = self.devices, found
+        for port in sorted(found):
+            if port not in self.listed_ports:
+                index = bisect.bisect(self.listed_ports, port)
+                self.port_listbox.insert(f"{index + 1}.0", self._line_text(port) + "\n")
+                self.listed_ports.insert(index, port)
+            elif found[port] != old_devices.get(port):
+                self._update_line(port)
+        self.port_listbox.configure(state="disabled")
+        if not self.listed_ports:
+            self._show_message("No Ports Found")
+        self._restore_selection()
+        print("Port refresh finished.")
 
+    def _show_message(self, text):
+        self.port_listbox.configure(state="normal")
         self.port_listbox.delete("1.0", "end")
-        self.selected_port = None
-        self.launch_button.configure(state="disabled")
+        self.port_listbox.insert("1.0", text)
+        self.port_listbox.configure(state="disabled")
+        self.listed_ports, self.devices = [], {}
+        self.showing_message = True
+        self._restore_selection()
 
-        try:
-            ports = HardwareController.get_available_ports()
-            print(f"Found ports: {ports}")
-            if ports == ["No Ports Found"]:
-                self.port_listbox.insert("1.0", "No Ports Found")
-            else:
-                line_index = 1 # Keep track of line numbers
-                for port in ports:
-                    status = ""
-                    if port in self.launched_windows:
-                        if self.launched_windows[port] and self.launched_windows[port].poll() is None:
-                            status = " (Running)"
-                        else:
-                            del self.launched_windows[port]
-                    # Insert text *and* add a newline tag for easier targeting
-                    self.port_listbox.insert(f"{line_index}.0", f"{port}{status}\n", f"line_{line_index}")
-                    line_index += 1
+    def _running(self, port):
+        process = self.launched_windows.get(port)
+        return self._hosted(port) or (process is not None and process.poll() is None)
 
-        except Exception as e:
-            print(f"Error getting available ports: {e}")
-            self.port_listbox.insert("1.0", f"Error scanning ports: {e}")
+    def _line_text(self, port):
+        return describe(self.devices[port]) + (" (Running)" if self._running(port) else "")
 
+    def _update_line(self, port):
+        """Rewrites one port's line if its text (identity or running status) changed."""
+        if port not in self.listed_ports:
+            return
+        line_num = self.listed_ports.index(port) + 1
+        text = self._line_text(port)
+        if self.port_listbox.get(f"{line_num}.0", f"{line_num}.end") == text:
+            return
+        self.port_listbox.configure(state="normal")
+        self.port_listbox.delete(f"{line_num}.0", f"{line_num}.end")
+        self.port_listbox.insert(f"{line_num}.0", text)
         self.port_listbox.configure(state="disabled")
-        print("Port refresh finished.")
+        if port == self.selected_port:
+            self._restore_selection()
+
+    def _update_statuses(self):
+        for port in list(self.listed_ports):
+            self._update_line(port)
+
+    def _restore_selection(self):
+        """Re-applies the highlight to the selected port's (possibly moved) line."""
+        self.port_listbox.tag_remove("selected", "1.0", "end")
+        if self.selected_port not in self.listed_ports:
+            self.selected_port = None
+            self.selected_line_num = None
+            self.launch_button.configure(state="disabled")
+            return
+        self.selected_line_num = self.listed_ports.index(self.selected_port) + 1
+        self.port_listbox.tag_add("selected", f"{self.selected_line_num}.0", f"{self.selected_line_num}.end+1c")
+        self.launch_button.configure(state="disabled" if self._running(self.selected_port) else "normal")
 
     # --- UPDATED FUNCTION ---
     def on_listbox_click(self, event):
@@ -122,8 +236,8 @@ class LauncherApp(customtkinter.CTk):
             # Get the text of the clicked line
             line_text = self.port_listbox.get(f"{line_num}.0", f"{line_num}.end").strip()
 
-            # Extract port name (remove status if present)
-            port_name = line_text.split(" (Running)")[0]
+            # Port shown on this line (the text also has its identity and status)
+            port_name = self.listed_ports[line_num - 1] if 0 < line_num <= len(self.listed_ports) else None
 
             # Basic validation
             if not port_name or port_name == "No Ports Found" or line_text.startswith("Error"):
@@ -168,6 +282,10 @@ class LauncherApp(customtkinter.CTk):
         if not self.selected_port:
             return
 
+        if self._hosted(self.selected_port):
+            print(f"Control view for {self.selected_port} is already open.")
+            return
+
         # Double-check if already launched and running (should be prevented by button state, but good practice)
         if self.selected_port in self.launched_windows:
             process = self.launched_windows[self.selected_port]
@@ -177,45 +295,95 @@ class LauncherApp(customtkinter.CTk):
             else:
                 del self.launched_windows[self.selected_port]
 
+        if self.single_process_var.get():
+            self.launch_in_process(self.selected_port)
+            return
+
         print(f"Launching control window for {self.selected_port}...")
         try:
             command = [sys.executable, "helixcycler.py", self.selected_port]
             process = subprocess.Popen(command)
             self.launched_windows[self.selected_port] = process
             print(f"Launched PID: {process.pid}")
+            threading.Thread(target=self._supervise, args=(self.selected_port, process), daemon=True).start()
 
         except Exception as e:
             print(f"Error launching process for {self.selected_port}: {e}")
             if self.selected_port in self.launched_windows: del self.launched_windows[self.selected_port]
 
-        # Refresh list immediately after attempting launch
-        self.refresh_ports()
-        # Ensure button is disabled and selection cleared after launch attempt
-        self.launch_button.configure(state="disabled")
+        # Update its line and clear the selection
+        port = self.selected_port
         self.selected_port = None
-        self.selected_line_num = None
-
-
-    def _check_launched_processes(self):
-        # ... (unchanged) ...
-        while True:
-            try:
-                ports_to_remove = []
-                for port in list(self.launched_windows.keys()):
-                    process = self.launched_windows.get(port)
-                    if process and process.poll() is not None:
-                        print(f"Detected control window for {port} closed.")
-                        ports_to_remove.append(port)
-                if ports_to_remove:
-                    for port in ports_to_remove: del self.launched_windows[port]
-                    self.after(0, self.refresh_ports)
-            except Exception as e: print(f"Error in process check thread: {e}")
-            time.sleep(5)
+        self._update_line(port)
+        self._restore_selection()
 
 
+    def launch_in_process(self, port):
+        """Opens the device as a tab in a shared window in this process (no new interpreter)."""
+        print(f"Opening control view for {port} in this process...")
+        try:
+            # Deferred so the launcher itself starts without the GUI/plotting imports
+            from helixcycler import DeviceHostWindow
+            if self.host_window is None or not self.host_window.winfo_exists():
+                self.host_window = DeviceHostWindow(self, on_change=self._host_changed)
+            self.host_window.add_device(port)
+            self.host_window.lift()
+        except Exception as e:
+            print(f"Error opening control view for {port}: {e}")
+
+        self.selected_port = None
+        self._update_line(port)
+        self._restore_selection()
+
+    def _hosted(self, port):
+        return (self.host_window is not None and self.host_window.winfo_exists()
+                and port in self.host_window.devices.views)
+
+    def _host_changed(self):
+        # Deferred: may be called while the host window is being destroyed
+        self.after(0, self._update_statuses)
+
+    def _supervise(self, port, process):
+        """Blocks until a control window process exits, then updates its line (no polling)."""
+        process.wait()
+        print(f"Detected control window for {port} closed.")
+        try:
+            self.after(0, self._child_exited, port, process)
+        except RuntimeError:
+            pass # Launcher already closed
+
+    def _child_exited(self, port, process):
+        if self.launched_windows.get(port) is process:
+            del self.launched_windows[port]
+        self.status_listener.forget(process.pid)
+        self._update_line(port)
+
+
+    def _refresh_dashboard(self):
+        """Shows the latest status of every control view, rewriting only the lines that changed."""
+        statuses = sorted(self.status_listener.snapshot(), key=lambda status: (status.get('port') or '', status['key']))
+        lines = [describe_status(status) for status in statuses] or ["No control windows open"]
+        if lines != self.status_lines:
+            self.status_box.configure(state="normal")
+            if len(lines) != len(self.status_lines):
+                self.status_box.delete("1.0", "end")
+                self.status_box.insert("1.0", "\n".join(lines))
+            else:
+                for line_num, (old, new) in enumerate(zip(self.status_lines, lines), 1):
+                    if old != new:
+                        self.status_box.delete(f"{line_num}.0", f"{line_num}.end")
+                        self.status_box.insert(f"{line_num}.0", new)
+            self.status_box.configure(state="disabled")
+            self.status_lines = lines
+        self.after(self.DASHBOARD_MS, self._refresh_dashboard)
+
     def on_closing(self):
-        # ... (unchanged) ...
         print("Launcher closing. Subprocesses will continue running.")
+        self.port_watcher.stop()
+        self.status_listener.stop()
+        if self.host_window is not None and self.host_window.winfo_exists():
+            # In-process devices live in this interpreter, so they stop with it
+            self.host_window.devices.shutdown()
         self.destroy()
 
 if __name__ == "__main__":
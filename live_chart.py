@@ -0,0 +1,105 @@
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from telemetry import minmax_indices
+
+
+class LiveChart:
+    """
+    Live lid/plate temperature chart for a Tk frame, fed from a run's TelemetryBuffer.
+
+    Updates are throttled to one frame every FRAME_MS and only pull the samples added
+    since the last frame. The lines are drawn with blitting over a cached background,
+    and the plotted points are thinned back to MAX_POINTS / 2 (min/max per bucket)
+    whenever they exceed MAX_POINTS, so a frame costs the same at any run length.
+    A full redraw only happens when the time axis has to be extended.
+    """
+    FRAME_MS = 250
+    MAX_POINTS = 2000
+    COLORS = {'lid': 'orange', 'plate': 'lightblue'}
+
+    def __init__(self, master, telemetry):
+        self.telemetry = telemetry
+        self.figure = Figure(figsize=(6, 2.4), dpi=100, facecolor='#2b2b2b')
+        self.ax = self.figure.add_subplot()
+        self.ax.set_facecolor('#2b2b2b')
+        self.ax.tick_params(colors='grey', labelsize=8)
+        for spine in self.ax.spines.values():
+            spine.set_color('grey')
+        self.ax.set_xlabel('Time - minutes', color='grey', fontsize=8)
+        self.ax.set_ylabel('°C', color='grey', fontsize=8)
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(-20, 120)
+        self.figure.tight_layout()
+
+        self._x = np.empty(0)
+        self._y = {name: np.empty(0, np.float32) for name in self.COLORS}
+        self._lines = {name: self.ax.plot([], [], color=color, animated=True, linewidth=1.2)[0]
+                       for name, color in self.COLORS.items()}
+        self._seen = 0
+        self._background = None
+        self._job = None
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.configure(bg='#2b2b2b', highlightthickness=0)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def start(self):
+        if self._job is None:
+            self._job = self.widget.after(self.FRAME_MS, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            try:
+                self.widget.after_cancel(self._job)
+            except Exception:
+                pass  # Widget already destroyed
+            self._job = None
+
+    def _tick(self):
+        self._job = None
+        if not self.widget.winfo_exists():
+            return
+        self._update()
+        self._job = self.widget.after(self.FRAME_MS, self._tick)
+
+    def _update(self):
+        count = len(self.telemetry)
+        if count <= self._seen:
+            return
+        self._x = np.concatenate((self._x, self.telemetry.column('time')[self._seen:count]))
+        for name in self._y:
+            self._y[name] = np.concatenate((self._y[name], self.telemetry.column(name)[self._seen:count]))
+        self._seen = count
+        if len(self._x) > self.MAX_POINTS:
+            self._thin()
+        for name, line in self._lines.items():
+            line.set_data(self._x, self._y[name])
+
+        right = self.ax.get_xlim()[1]
+        if self._x[-1] > right or self._background is None:
+            while self._x[-1] > right:
+                right *= 2
+            self.ax.set_xlim(0, right)
+            self.canvas.draw_idle()  # Full redraw; _on_draw re-captures the background
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_lines()
+        self.canvas.blit(self.ax.bbox)
+
+    def _thin(self):
+        buckets = self.MAX_POINTS // 8
+        keep = np.union1d(*(minmax_indices(self._x, y, buckets) for y in self._y.values()))
+        self._x = self._x[keep]
+        for name in self._y:
+            self._y[name] = self._y[name][keep]
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self._lines.values():
+            self.ax.draw_artist(line)
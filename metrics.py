@@ -0,0 +1,263 @@
+import bisect
+import os
+import threading
+
+# Set to a port number to serve /metrics from any HelixCycler process (GUI, headless
+# runner); set the log interval to print a metrics summary line that often.
+METRICS_PORT_ENV = 'HELIXCYCLER_METRICS_PORT'
+METRICS_LOG_ENV = 'HELIXCYCLER_METRICS_LOG_SEC'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+INTERVAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class _Metric:
+    """
+    A metric family: one value per combination of label values (in `labels` order).
+    Updates take the value first and the labels by name, e.g. inc(len(data), port=name).
+    """
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        """The label values, in `labels` order, of keyword labels such as port='COM3'."""
+        if len(labels) != len(self.labels) or not all(label in labels for label in self.labels):
+            raise ValueError(f"{self.name} takes the labels ({', '.join(self.labels)}), got ({', '.join(labels)}).")
+        return tuple(labels[label] for label in self.labels)
+
+    def _series(self, values):
+        if self.labels:
+            pairs = ','.join(f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values))
+            return f'{{{pairs}}}'
+        return ''
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) for every exported sample."""
+        with self._lock:
+            return [('', values, '', value) for values, value in self._values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for suffix, values, extra, value in self.samples():
+            series = self._series(values)
+            if extra:
+                series = f'{{{extra}}}' if not series else f'{series[:-1]},{extra}}}'
+            lines.append(f'{self.name}{suffix}{series} {_number(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative `buckets` (upper bounds, in seconds)."""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # per-bucket counts, the +Inf count last, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(values, list(counts)) for values, counts in self._values.items()]
+        samples = []
+        for values, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts[:-1]):
+                cumulative += count
+                samples.append(('_bucket', values, f'le="{bound}"', cumulative))
+            samples.append(('_sum', values, '', counts[-1]))
+            samples.append(('_count', values, '', cumulative))
+        return samples
+
+    def summary(self):
+        """(count, p50, p95) over all label values; the percentiles are bucket upper bounds."""
+        with self._lock:
+            merged = [sum(column) for column in zip(*self._values.values())] if self._values else []
+        if not merged:
+            return 0, None, None
+        count = sum(merged[:-1])
+        return count, self._percentile(merged, count, 0.5), self._percentile(merged, count, 0.95)
+
+    def _percentile(self, counts, count, fraction):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts[:-1]):
+            cumulative += bucket_count
+            if cumulative >= fraction * count:
+                return bound
+        return float('inf')
+
+
+class Registry:
+    """The metric families of a process, rendered in the Prometheus text format."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _add(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram, name, help, labels, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(line + '\n' for metric in metrics for line in metric.render())
+
+    def summary(self):
+        """One log line: counter and gauge totals, histogram counts with p50/p95."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        parts = []
+        for metric in metrics:
+            name = metric.name.removeprefix('helixcycler_')
+            if isinstance(metric, Histogram):
+                count, p50, p95 = metric.summary()
+                parts.append(f"{name}={count}" + (f" (p50<={_number(p50)} p95<={_number(p95)})" if count else ""))
+            else:
+                parts.append(f"{name}={_number(metric.total())}")
+        return "metrics: " + ", ".join(parts)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    if isinstance(value, float):
+        return '+Inf' if value == float('inf') else f'{value:.6g}'
+    return str(value)
+
+
+_registry = Registry()
+
+def get_registry():
+    """The process-wide Registry."""
+    return _registry
+
+def counter(name, help, labels=()):
+    return _registry.counter(name, help, labels)
+
+def gauge(name, help, labels=()):
+    return _registry.gauge(name, help, labels)
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    return _registry.histogram(name, help, labels, buckets)
+
+
+class MetricsLogger:
+    """Prints the registry's summary line every `interval` seconds from a background thread."""
+    def __init__(self, interval, registry=None, out=print):
+        self.interval = interval
+        self.registry = registry or _registry
+        self.out = out
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.out(self.registry.summary())
+
+
+def serve(port, host='127.0.0.1', registry=None):
+    """Serves the registry at http://host:port/metrics from a background thread; returns the server."""
+    # http.server is only needed when metrics are served, keep it off the startup path
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    registry = registry or _registry
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start(port=None, log_sec=None):
+    """
+    Serves /metrics on `port` and prints a summary line every `log_sec` seconds;
+    either defaults to METRICS_PORT_ENV / METRICS_LOG_ENV and is off if unset.
+    """
+    port = port if port is not None else os.environ.get(METRICS_PORT_ENV)
+    log_sec = log_sec if log_sec is not None else os.environ.get(METRICS_LOG_ENV)
+    if port:
+        try:
+            server = serve(int(port))
+            print(f"Serving metrics on http://127.0.0.1:{server.server_address[1]}/metrics")
+        except (OSError, ValueError) as e:
+            # e.g. a second window started from the launcher with the same port
+            print(f"Metrics endpoint disabled (port {port}): {e}")
+    if log_sec:
+        try:
+            MetricsLogger(float(log_sec)).start()
+        except ValueError:
+            print(f"Ignoring metrics log interval {log_sec!r} (expected seconds).")
@@ -0,0 +1,216 @@
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+
+from estimator import estimate_run, format_duration
+from protocol_loader import ProtocolError, parse_protocol
+from protocol_manager import Incubate
+
+PROTOCOL_SUFFIXES = ('.csv', '.json', '.yaml', '.yml')
+INDEX_VERSION = 1
+
+
+class ProtocolLibrary:
+    """
+    On-disk index of the protocols under one or more folders, for instant search.
+
+    Each entry records the protocol's name, stage and cycle counts, plate
+    temperature range, estimated duration and content hash (or the error that
+    made it invalid). scan() only re-reads files whose size or mtime changed, and
+    only re-parses those whose content hash changed too; entries for deleted files
+    are dropped. The index is saved atomically as JSON at `index_path`.
+    Scans and saves are serialized, so several windows and watchers can share
+    one library.
+    """
+    def __init__(self, index_path):
+        self.index_path = pathlib.Path(index_path)
+        self._lock = threading.Lock()  # guards roots and entries
+        self._scan_lock = threading.RLock()  # one scan or save at a time
+        self.roots = []
+        self.entries = {}  # absolute path -> entry dict
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable protocol index {self.index_path}: {e}")
+            return
+        if data.get('version') == INDEX_VERSION:
+            self.roots = data.get('roots', [])
+            self.entries = {entry['path']: entry for entry in data.get('entries', [])}
+
+    def save(self):
+        with self._scan_lock:
+            with self._lock:
+                data = {'version': INDEX_VERSION, 'roots': list(self.roots), 'entries': list(self.entries.values())}
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            # A temp file of its own, in case another process saves the same index
+            fd, temp_path = tempfile.mkstemp(dir=self.index_path.parent, prefix=self.index_path.name + '.',
+                                             suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self.index_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+    def add_root(self, root):
+        root = str(pathlib.Path(root).resolve())
+        with self._lock:
+            if root not in self.roots:
+                self.roots.append(root)
+        return root
+
+    def scan(self, root=None):
+        """
+        Brings the index up to date for `root` (default: every known root) and
+        saves it if anything changed. Returns (added, updated, removed) counts.
+        """
+        with self._scan_lock:
+            return self._scan(root)
+
+    def _scan(self, root):
+        roots = [self.add_root(root)] if root else list(self.roots)
+        added = updated = removed = 0
+        for root in roots:
+            found = set()
+            for path, stat in _walk(root):
+                found.add(path)
+                with self._lock:
+                    known = self.entries.get(path)
+                if known and (known['mtime_ns'], known['size']) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    data = pathlib.Path(path).read_bytes()
+                except OSError as e:
+                    print(f"Could not read {path}: {e}")
+                    continue
+                entry = _index_entry(path, stat, data, known)
+                with self._lock:
+                    self.entries[path] = entry
+                if known:
+                    updated += 1
+                else:
+                    added += 1
+            prefix = os.path.join(root, '')
+            with self._lock:
+                gone = [path for path in self.entries if path.startswith(prefix) and path not in found]
+                for path in gone:
+                    del self.entries[path]
+            removed += len(gone)
+        if added or updated or removed:
+            self.save()
+        return added, updated, removed
+
+    def watch(self, interval=10.0, on_change=None):
+        """
+        Rescans every `interval` seconds on a background thread (a stat() per file
+        when nothing changed), calling on_change() after scans that changed the
+        index. Returns an Event that stops the watcher when set.
+        """
+        stop_event = threading.Event()
+
+        def loop():
+            while not stop_event.wait(interval):
+                try:
+                    if any(self.scan()) and on_change and not stop_event.is_set():
+                        on_change()
+                except OSError as e:
+                    print(f"Protocol library scan failed: {e}")
+
+        threading.Thread(target=loop, daemon=True).start()
+        return stop_event
+
+    def search(self, query='', min_temp=None, max_temp=None, max_duration_sec=None, include_invalid=True):
+        """
+        Entries whose name or path contains every word of `query` (case-insensitive)
+        and whose plate temperatures and estimated duration fit the given bounds,
+        sorted by name.
+        """
+        words = query.lower().split()
+        with self._lock:
+            entries = list(self.entries.values())
+        results = []
+        for entry in entries:
+            if entry['error'] and not include_invalid:
+                continue
+            if any(word not in entry['search_text'] for word in words):
+                continue
+            if not entry['error']:
+                if min_temp is not None and entry['min_temp'] is not None and entry['min_temp'] < min_temp:
+                    continue
+                if max_temp is not None and entry['max_temp'] is not None and entry['max_temp'] > max_temp:
+                    continue
+                if max_duration_sec is not None and entry['estimated_sec'] > max_duration_sec:
+                    continue
+            results.append(entry)
+        results.sort(key=lambda entry: (entry['name'].lower(), entry['path']))
+        return results
+
+
+def _walk(root):
+    """Yields (path, stat) for every protocol file under root."""
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for item in it:
+                    if item.name.startswith('.'):
+                        continue
+                    if item.is_dir(follow_symlinks=False):
+                        stack.append(item.path)
+                    elif item.name.lower().endswith(PROTOCOL_SUFFIXES) and item.is_file():
+                        yield item.path, item.stat()
+        except OSError as e:
+            print(f"Could not scan {e.filename}: {e.strerror}")
+
+def _index_entry(path, stat, data, known=None):
+    """Builds the index entry for a protocol file, reusing `known` if the content is unchanged."""
+    digest = hashlib.sha256(data).hexdigest()
+    if known and known['digest'] == digest:
+        return dict(known, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    name = pathlib.Path(path).stem
+    entry = {'path': path, 'name': name, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+             'digest': digest, 'error': None, 'stages': 0, 'cycles': [], 'total_steps': 0,
+             'min_temp': None, 'max_temp': None, 'estimated_sec': None, 'open_ended': False,
+             'search_text': f"{name} {path}".lower()}
+    try:
+        program = parse_protocol(path, data).program
+    except ProtocolError as e:
+        entry['error'] = e.errors[0] + (f" (+{len(e.errors) - 1} more)" if len(e.errors) > 1 else "")
+        return entry
+    temps = [step.plate_temp for stage in program.stages for step in stage.steps if isinstance(step, Incubate)]
+    estimate = estimate_run(program)
+    entry.update(stages=len(program.stages), cycles=[stage.cycles for stage in program.stages],
+                 total_steps=program.total_steps, min_temp=min(temps, default=None), max_temp=max(temps, default=None),
+                 estimated_sec=estimate.total_sec, open_ended=estimate.open_ended)
+    return entry
+
+def describe(entry):
+    """One-line description of an index entry."""
+    if entry['error']:
+        return f"{entry['name']}  -  invalid: {entry['error']}"
+    temps = f"{entry['min_temp']:g}-{entry['max_temp']:g} °C" if entry['min_temp'] is not None else "no steps"
+    cycles = '+'.join(str(c) for c in entry['cycles'])
+    return (f"{entry['name']}  -  {entry['stages']} stages ({cycles} cycles), {temps}, "
+            f"~{format_duration(entry['estimated_sec'])}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Index and search a folder of protocols.")
+    parser.add_argument('folder', nargs='?', help="folder to (re)scan; default: every indexed folder")
+    parser.add_argument('-q', '--query', default='', help="words to search for")
+    parser.add_argument('--index', default=pathlib.Path(__file__).parent / 'protocol_index.json')
+    args = parser.parse_args()
+    library = ProtocolLibrary(args.index)
+    print("Added %d, updated %d, removed %d." % library.scan(args.folder))
+    for entry in library.search(args.query):
+        print(f"{describe(entry)}\n    {entry['path']}")
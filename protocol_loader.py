@@ -0,0 +1,224 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import pathlib
+import threading
+from collections import namedtuple
+
+from protocol_manager import compile_protocol
+
+# Accepted ranges, as for the control window's presets
+PLATE_RANGE = (4.0, 99.0)
+LID_RANGE = (37.0, 105.0)
+COMMANDS = ('CYCLES', 'STEP', 'DEACTIVATE_ALL', 'END&GRAPH')
+
+LoadedProtocol = namedtuple('LoadedProtocol', 'path digest prot_dict program summary')
+
+
+class ProtocolError(ValueError):
+    """A protocol file failed validation; `errors` lists every problem with its location."""
+    def __init__(self, path, errors):
+        self.path = path
+        self.errors = list(errors)
+        super().__init__(f"{path}: {len(self.errors)} error(s)\n" + "\n".join(self.errors))
+
+
+class _Builder:
+    """Collects stages and errors while one file is parsed."""
+    def __init__(self):
+        self.prot_dict = {}
+        self.rows = []  # (kind, values) in file order, for the summary
+        self.errors = []
+
+    def error(self, where, message):
+        self.errors.append(f"{where}: {message}")
+
+    def number(self, where, value, name, required=False, bounds=None, whole=False):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if required:
+                self.error(where, f"{name} is required.")
+            return None
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            number = float(value)
+            if whole:
+                if not number.is_integer():
+                    raise ValueError
+                number = int(number)
+        except (TypeError, ValueError, OverflowError):
+            self.error(where, f"{name} {value!r} is not a{' whole' if whole else ''} number.")
+            return None
+        if bounds and not bounds[0] <= number <= bounds[1]:
+            self.error(where, f"{name} {number:g} is outside {bounds[0]:g}-{bounds[1]:g}.")
+        return number
+
+    def cycles(self, where, cycles):
+        if cycles is not None and cycles < 1:
+            self.error(where, "Number of cycles must be at least 1.")
+        stage = len(self.prot_dict) + 1
+        self.prot_dict[stage] = [cycles if cycles is not None else 1]
+        self.rows.append(('CYCLES', cycles))
+
+    def step(self, where, command, params=None):
+        if not self.prot_dict:
+            self.error(where, f"{command} before the first CYCLES.")
+            return
+        stage = self.prot_dict[len(self.prot_dict)]
+        if command == 'STEP':
+            stage.append(list(params))
+            self.rows.append(('STEP', params))
+        else:
+            stage.append([command])
+            self.rows.append((command, None))
+
+
+def _csv_column(index):
+    return 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'[index] if index < 26 else str(index + 1)
+
+def _parse_csv(text, builder):
+    for row_number, line in enumerate(csv.reader(io.StringIO(text)), 1):
+        line = [cell.strip() for cell in line] + [''] * (5 - len(line))
+        command = line[0]
+        if not command:
+            continue  # header, notes or blank row
+        where = lambda column: f"Row {row_number}, column {_csv_column(column)}"
+        if command == 'CYCLES':
+            builder.cycles(where(1), builder.number(where(1), line[1], "Number of cycles", required=True, whole=True))
+        elif command == 'STEP':
+            plate = builder.number(where(2), line[2], "Plate temperature", required=True, bounds=PLATE_RANGE)
+            hold = builder.number(where(3), line[3], "Hold time", bounds=(0, float('inf')))
+            lid = builder.number(where(4), line[4], "Lid temperature", bounds=LID_RANGE)
+            builder.step(where(0), 'STEP', (plate, hold, lid))
+        elif command in COMMANDS:
+            builder.step(where(0), command)
+        else:
+            builder.error(where(0), f"unknown command {command!r} (expected {', '.join(COMMANDS)}).")
+
+def _parse_structured(data, builder):
+    """
+    JSON/YAML form of the CSV format:
+        {"stages": [{"cycles": 30, "steps": [{"plate": 98, "time": 25, "lid": 105},
+                                             "DEACTIVATE_ALL", "END&GRAPH"]}]}
+    A bare list of stages is accepted too.
+    """
+    stages = data.get('stages') if isinstance(data, dict) else data
+    if not isinstance(stages, list):
+        builder.error("stages", "expected a list of stages.")
+        return
+    for i, stage in enumerate(stages):
+        where = f"stages[{i}]"
+        if not isinstance(stage, dict):
+            builder.error(where, "expected an object with 'cycles' and 'steps'.")
+            continue
+        unknown = set(stage) - {'cycles', 'steps'}
+        if unknown:
+            builder.error(where, f"unknown field(s) {', '.join(sorted(unknown))}.")
+        builder.cycles(f"{where}.cycles", builder.number(f"{where}.cycles", stage.get('cycles'), "cycles", required=True, whole=True))
+        steps = stage.get('steps', [])
+        if not isinstance(steps, list):
+            builder.error(f"{where}.steps", "expected a list of steps.")
+            continue
+        for j, step in enumerate(steps):
+            step_where = f"{where}.steps[{j}]"
+            if isinstance(step, str):
+                if step.upper() in COMMANDS[2:]:
+                    builder.step(step_where, step.upper())
+                else:
+                    builder.error(step_where, f"unknown step {step!r} (expected DEACTIVATE_ALL or END&GRAPH).")
+            elif isinstance(step, dict):
+                unknown = set(step) - {'plate', 'time', 'lid'}
+                if unknown:
+                    builder.error(step_where, f"unknown field(s) {', '.join(sorted(unknown))}.")
+                plate = builder.number(f"{step_where}.plate", step.get('plate'), "plate", required=True, bounds=PLATE_RANGE)
+                hold = builder.number(f"{step_where}.time", step.get('time'), "time", bounds=(0, float('inf')))
+                lid = builder.number(f"{step_where}.lid", step.get('lid'), "lid", bounds=LID_RANGE)
+                builder.step(step_where, 'STEP', (plate, hold, lid))
+            else:
+                builder.error(step_where, "expected a step object or command name.")
+
+def _load_yaml(text):
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError("YAML protocols need PyYAML (pip install pyyaml).")
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ValueError(f"invalid YAML: {e}")
+
+def _summary(rows):
+    """The protocol overview shown in the control window."""
+    text = ""
+    step_count, stage_count = 1, 1
+    fmt = lambda value: '' if value is None else f'{value:g}'
+    for kind, values in rows:
+        if kind == 'CYCLES':
+            text += f'\n\n\t\tStage - {stage_count}\nCycles - {fmt(values)}\nStep    Plate_temp    Time(seconds)    Set Lid Target\n'
+            step_count, stage_count = 1, stage_count + 1
+        elif kind == 'STEP':
+            plate, hold, lid = values
+            text += f'  {step_count}                {fmt(plate)}                        {fmt(hold) or "Hold"}                                  {fmt(lid)}\n'
+            step_count += 1
+        elif kind == 'DEACTIVATE_ALL':
+            text += f'  {step_count}                                 Deactivate All\n'
+            step_count += 1
+        elif kind == 'END&GRAPH':
+            text += f'  {step_count}                                  End Protocol\n'
+    return text
+
+def parse_protocol(path, data):
+    """Parses and validates protocol file contents (bytes) in one pass."""
+    path = pathlib.Path(path)
+    builder = _Builder()
+    try:
+        text = data.decode('utf-8-sig')
+        suffix = path.suffix.lower()
+        if suffix == '.json':
+            _parse_structured(json.loads(text), builder)
+        elif suffix in ('.yaml', '.yml'):
+            _parse_structured(_load_yaml(text), builder)
+        else:
+            _parse_csv(text, builder)
+    except (UnicodeDecodeError, ValueError) as e:
+        # Includes JSON/YAML syntax errors, which carry their own line numbers
+        builder.error(path.name, str(e))
+    if not builder.errors and not builder.prot_dict:
+        builder.error(path.name, "no CYCLES found.")
+    if builder.errors:
+        raise ProtocolError(path, builder.errors)
+    digest = hashlib.sha256(data).hexdigest()
+    return LoadedProtocol(path, digest, builder.prot_dict, compile_protocol(builder.prot_dict), _summary(builder.rows))
+
+
+_lock = threading.Lock()
+_by_path = {}    # resolved path -> (mtime_ns, size, digest)
+_by_digest = {}  # content digest -> LoadedProtocol
+
+def load_protocol(path):
+    """
+    Loads a protocol (.csv, .json, .yaml/.yml), raising ProtocolError listing every
+    problem. Results are cached by path + mtime + size and by content hash, so an
+    unchanged file is not re-read and an identical copy is not re-parsed.
+    The returned LoadedProtocol is shared: don't modify its prot_dict.
+    """
+    path = pathlib.Path(path).resolve()
+    stat = os.stat(path)
+    with _lock:
+        known = _by_path.get(path)
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size) and known[2] in _by_digest:
+            return _by_digest[known[2]]
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    with _lock:
+        loaded = _by_digest.get(digest)
+    if loaded is None or loaded.path.suffix.lower() != path.suffix.lower():
+        loaded = parse_protocol(path, data)
+    elif loaded.path != path:
+        loaded = loaded._replace(path=path)
+    with _lock:
+        _by_path[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        _by_digest[digest] = loaded
+    return loaded
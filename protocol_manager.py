@@ -1,183 +1,430 @@
 import time
-import matplotlib.pyplot as plt
-import csv
-import sys
+import copy
 import datetime
 import serial 
-import threading 
+import asyncio
+import hashlib
+import json
+import pathlib
+import re
+from collections import namedtuple
+from telemetry import TelemetryBuffer, RunLogWriter, TeeSink
+from estimator import estimate_run, format_duration
+import metrics
+
+POLL_PERIOD = metrics.histogram('helixcycler_poll_period_seconds',
+                                "Time between consecutive status polls of a poll loop.", buckets=metrics.INTERVAL_BUCKETS)
+POLL_JITTER = metrics.histogram('helixcycler_poll_jitter_seconds',
+                                "How much later than planned each poll came (includes the previous status query).")
 
 def protocol_dict(infile_path):
-    """Parses a CSV protocol file into a dictionary."""
-    protocol = {}
-    with open(infile_path, 'r') as infile:
-        csv_file = csv.reader(infile, delimiter=',')
-        stage_count = 0
-        for line in csv_file:
-            if line[0] == 'CYCLES':
-                stage_count += 1
-                protocol[stage_count] = [int(line[1])]
-            elif line[0] == 'STEP':
-                inc_params = []
-                # add plate temp
-                inc_params.append(float(line[2]))
-                # add incubation time
-                if len(line[3]) > 0:
-                    inc_params.append(float(line[3]))
-                else:
-                    inc_params.append(None)
-                # add lid temp
-                if len(line[4]) > 0:
-                    inc_params.append(float(line[4]))
-                else:
-                    inc_params.append(None)
-                # add step to current stage
-                protocol[stage_count].append(inc_params)
-            elif line[0] == 'DEACTIVATE_ALL':
-                protocol[stage_count].append(['DEACTIVATE_ALL'])
-            elif line[0] == 'END&GRAPH':
-                protocol[stage_count].append(['END&GRAPH'])
-    return protocol
-
-def plot_line(dictionary, ind, line_name):
-    x = []
-    y = []
-    for key in dictionary.keys():
-        y.append(key)
-        x.append(dictionary[key][ind])
-    plt.plot(y, x, label=line_name)
+    """
+    Parses a protocol file (CSV, JSON or YAML) into a dictionary of stages, raising
+    protocol_loader.ProtocolError if it is malformed. Returns a copy the caller may modify.
+    """
+    from protocol_loader import load_protocol
+    return copy.deepcopy(load_protocol(infile_path).prot_dict)
+
+# --- Compiled protocols ---
+
+Incubate = namedtuple('Incubate', 'plate_temp hold_sec lid_temp')  # hold_sec None = hold until skipped
+Deactivate = namedtuple('Deactivate', ())
+EndGraph = namedtuple('EndGraph', ())
+Stage = namedtuple('Stage', 'number cycles steps')
+ProgramStep = namedtuple('ProgramStep', 'index stage cycle step action')  # index is 0-based over the whole run
+
+class Program:
+    """
+    An immutable, validated protocol. Stages keep each step once; iterating expands
+    the cycles lazily into ProgramSteps. Step counts and nominal hold time are
+    precomputed.
+    """
+    def __init__(self, stages):
+        self.stages = tuple(stages)
+        self.total_steps = sum(stage.cycles * len(stage.steps) for stage in self.stages)
+        self.nominal_hold_sec = sum(stage.cycles * sum(step.hold_sec for step in stage.steps
+                                                       if isinstance(step, Incubate) and step.hold_sec)
+                                    for stage in self.stages)
+
+    def __len__(self):
+        return self.total_steps
+
+    def __iter__(self):
+        index = 0
+        for stage in self.stages:
+            for cycle in range(1, stage.cycles + 1):
+                for number, action in enumerate(stage.steps, 1):
+                    yield ProgramStep(index, stage.number, cycle, number, action)
+                    index += 1
+
+    def digest(self):
+        """SHA-256 of the program's content, identifying the protocol in run logs."""
+        # Namedtuples serialize as bare lists, so each step is tagged with its type
+        # (Deactivate() and EndGraph() are both [] otherwise)
+        content = [[stage.number, stage.cycles, [[type(step).__name__, *step] for step in stage.steps]]
+                   for stage in self.stages]
+        return hashlib.sha256(json.dumps(content).encode('utf-8')).hexdigest()
+
+def compile_protocol(prot_dict):
+    """Compiles a protocol_dict() result into a Program, raising ValueError if it is malformed."""
+    if isinstance(prot_dict, Program):
+        return prot_dict
+    stages = []
+    for number, stage in prot_dict.items():
+        if not stage or isinstance(stage[0], bool) or not isinstance(stage[0], int) or stage[0] < 1:
+            raise ValueError(f"Stage {number}: CYCLES must be a whole number >= 1.")
+        steps = []
+        for step in stage[1:]:
+            if step == ['DEACTIVATE_ALL']:
+                steps.append(Deactivate())
+            elif step == ['END&GRAPH']:
+                steps.append(EndGraph())
+            elif len(step) == 3 and isinstance(step[0], (int, float)):
+                steps.append(Incubate(float(step[0]),
+                                      None if step[1] is None else float(step[1]),
+                                      None if step[2] is None else float(step[2])))
+            else:
+                raise ValueError(f"Stage {number}: unrecognised step {step!r}.")
+        stages.append(Stage(number, stage[0], tuple(steps)))
+    return Program(stages)
 
 def create_graph(graph, title):
-    """Creates and displays the temperature graph."""
-    plot_line(graph, 1, 'Block_temp')
-    plot_line(graph, 0, 'Lid_temp')
-
-    plt.title(title + f' - {datetime.datetime.now().replace(second=0, microsecond=0)}')
-    plt.ylabel('Temperature - °C')
-    plt.xlabel('Time - minutes')
-    plt.ylim(-20, 120)
-    plt.legend()
+    """Creates and displays the temperature graph (interactive, main thread only)."""
+    import matplotlib.pyplot as plt
+    from graph_renderer import draw_graph
+
+    draw_graph(plt.figure(), graph.column('time'), graph.column('lid'), graph.column('plate'), title)
     plt.show()
-    wm = plt.get_current_fig_manager()
-    if wm:
-        # Try to bring window to front
+
+def open_run_log(log_dir, controller, program, experiment_title):
+    """
+    Starts a crash-safe run log in `log_dir` (see telemetry.RunLogWriter), named after
+    the start time, experiment title and port, with a -2, -3... suffix if that name
+    is taken. Returns None if the file can't be created.
+    """
+    started = datetime.datetime.now()
+    safe_title = re.sub(r'[^\w-]+', '_', experiment_title).strip('_') or 'run'
+    port_name = getattr(controller, 'port_name', None) or ''
+    safe_port = re.sub(r'[^\w-]+', '_', port_name.split('?')[0]).strip('_')
+    stem = f"{started:%Y%m%d-%H%M%S}_{safe_title}" + (f"_{safe_port}" if safe_port else '')
+    header = {
+        'experiment_title': experiment_title,
+        'port': getattr(controller.port, 'port', None),
+        'protocol_sha256': program.digest(),
+        'start_time': started.isoformat(timespec='seconds'),
+    }
+    path = pathlib.Path(log_dir) / f"{stem}.hxlog"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for attempt in range(2, 1000):
+            try:
+                return RunLogWriter(path, header)
+            except FileExistsError:
+                # Another run with this title on this port started in the same second
+                path = path.with_name(f"{stem}-{attempt}.hxlog")
+        raise FileExistsError(f"too many run logs named {stem}")
+    except OSError as e:
+        print(f"Error: Could not create run log {path}: {e}")
+        return None
+
+class AdaptivePoller:
+    """
+    Picks the delay before the next status poll: `min_interval` while temperatures
+    are changing or the plate is away from its setpoint, backing off by `backoff`
+    per stable poll up to `max_interval`. For timed steps it never sleeps past the
+    last `endgame_sec` seconds of the step, and polls at `min_interval` within them,
+    so step completion is still seen promptly.
+    Each call records the loop's actual poll period and its lateness against the
+    previously planned interval in POLL_PERIOD and POLL_JITTER.
+    """
+    def __init__(self, min_interval=0.1, max_interval=2.0, tolerance=0.5, backoff=1.5, endgame_sec=5.0):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.endgame_sec = endgame_sec
+        self.interval = min_interval
+        self._last = None  # (lid, plate) at the previous poll
+        self._polled_at = None  # time.monotonic() of the previous call, and the interval it planned
+        self._planned = None
+
+    def next_interval(self, lid, plate, setpoint=None, seconds_left=None):
+        now = time.monotonic()
+        if self._polled_at is not None:
+            period = now - self._polled_at
+            POLL_PERIOD.observe(period)
+            POLL_JITTER.observe(max(0.0, period - self._planned))
+        changing = (self._last is None
+                    or abs(lid - self._last[0]) > self.tolerance
+                    or abs(plate - self._last[1]) > self.tolerance)
+        ramping = setpoint is not None and abs(plate - setpoint) > self.tolerance
+        self._last = (lid, plate)
+        if changing or ramping:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        interval = self.interval
+        if seconds_left is not None:
+            interval = min(interval, max(self.min_interval, seconds_left - self.endgame_sec))
+        self._polled_at, self._planned = now, interval
+        return interval
+
+# The step loop is written once, as generators that yield what they need done:
+# Call(method, args) for a controller method, whose result (or exception) is sent
+# back in, and Sleep(seconds) between polls. incubation() and run_protocol() drive
+# them against a HardwareController, the *_async versions against an
+# AsyncHardwareController (see tc_async.py).
+Call = namedtuple('Call', 'method args')
+Sleep = namedtuple('Sleep', 'seconds')
+
+class EmergencyStop(Exception):
+    """Raised inside a run when its emergency_stop_event is set."""
+
+def _drive(steps, controller, emergency_stop_event):
+    """Runs a step generator against a HardwareController and returns its result."""
+    reply, error = None, None
+    while True:
         try:
-            wm.window.attributes('-topmost', 1)
-            wm.window.attributes('-topmost', 0)
-        except Exception:
-            pass # Fails on some platforms, but that's ok
+            request = steps.throw(error) if error else steps.send(reply)
+        except StopIteration as finished:
+            return finished.value
+        reply, error = None, None
+        if isinstance(request, Sleep):
+            emergency_stop_event.wait(request.seconds)
+            continue
+        try:
+            reply = getattr(controller, request.method)(*request.args)
+        except Exception as e:
+            error = e
+
+async def _stop_or_sleep(emergency_stop_event, seconds):
+    """Sleeps for `seconds`, waking early if the threading or asyncio Event is set."""
+    if isinstance(emergency_stop_event, asyncio.Event):
+        try:
+            await asyncio.wait_for(emergency_stop_event.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        return
+    # A threading.Event can't be awaited, and waiting on it in an executor thread
+    # would tie the thread up after the run ends, so check it in short slices
+    deadline = time.monotonic() + seconds
+    while not emergency_stop_event.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, 0.05))
+
+async def _drive_async(steps, controller, emergency_stop_event):
+    """Runs a step generator against an AsyncHardwareController and returns its result."""
+    reply, error = None, None
+    while True:
+        try:
+            request = steps.throw(error) if error else steps.send(reply)
+        except StopIteration as finished:
+            return finished.value
+        reply, error = None, None
+        if isinstance(request, Sleep):
+            await _stop_or_sleep(emergency_stop_event, request.seconds)
+            continue
+        try:
+            reply = await getattr(controller, request.method)(*request.args)
+        except Exception as e:
+            error = e
+
+def _incubation_steps(update_lid_fn, update_plate_fn, update_time_fn,
+                      emergency_stop_event,
+                      start_time, graph, plate_temp,
+                      inc_time=None, lid_temp=None, well_vol=None, update_sec=0.1, max_update_sec=2.0,
+                      on_poll=None):
+    """Step generator for one incubation (see incubation); `on_poll()` is called after each status poll."""
+    poller = AdaptivePoller(update_sec, max_update_sec)
 
-def incubation(controller, 
-               update_lid_fn, update_plate_fn, update_time_fn, 
-               emergency_stop_event,
-               start_time, graph, plate_temp, 
-               inc_time=None, lid_temp=None, well_vol=None, update_sec=0.1):
-    """Manages a single incubation step and updates GUI labels via callbacks."""
-    
     try:
         if lid_temp is not None:
-            controller.set_lid_temperature(lid_temp)
+            yield Call('set_lid_temperature', (lid_temp,))
 
         if inc_time is not None:
             time_remaining = inc_time
-            controller.set_plate_temperature(plate_temp, inc_time, well_vol)
-            
-            while float(time_remaining) > 0.001:
-                if emergency_stop_event.is_set():
-                    raise Exception("Emergency Stop Triggered")
-
-                current_time = (time.time() - start_time) / 60
-                current_lid_temp = controller.get_lid_temperature() 
-                plate_info = controller.get_plate_info() 
-                current_plate_temp, time_remaining = plate_info[0], plate_info[1]
-
-                update_lid_fn(f'{current_lid_temp} °C')
-                update_plate_fn(f'{current_plate_temp} °C')
-                update_time_fn(f'{time_remaining} secs')
-
-                graph[current_time] = [current_lid_temp, current_plate_temp, inc_time]
-                time.sleep(update_sec)
+            yield Call('set_plate_temperature', (plate_temp, inc_time, well_vol))
         else:
-            # This is a 'hold' step
-            controller.set_plate_temperature(plate_temp)
-            
-            while True: 
-                if emergency_stop_event.is_set():
-                    raise Exception("Emergency Stop Triggered")
-                    
-                current_lid_temp = controller.get_lid_temperature() 
-                plate_info = controller.get_plate_info() 
-                current_plate_temp, time_remaining = plate_info[0], plate_info[1]
-
-                update_lid_fn(f'{current_lid_temp} °C')
-                update_plate_fn(f'{current_plate_temp} °C')
-                update_time_fn(f'{time_remaining} secs')
-                
-                time.sleep(update_sec)
-                
+            # This is a 'hold' step, it runs until skipped or stopped
+            yield Call('set_plate_temperature', (plate_temp,))
+
+        while inc_time is None or float(time_remaining) > 0.001:
+            if emergency_stop_event.is_set():
+                raise EmergencyStop("Emergency Stop Triggered")
+
+            current_time = (time.time() - start_time) / 60
+            current_lid_temp, current_plate_temp, time_remaining = yield Call('get_status', ())
+
+            update_lid_fn(f'{current_lid_temp} °C')
+            update_plate_fn(f'{current_plate_temp} °C')
+            update_time_fn(f'{time_remaining} secs')
+
+            graph.append(current_time, current_lid_temp, current_plate_temp, setpoint=plate_temp)
+            if on_poll:
+                on_poll()
+            seconds_left = float(time_remaining) if inc_time is not None else None
+            yield Sleep(poller.next_interval(current_lid_temp, current_plate_temp, plate_temp, seconds_left))
+
     except serial.SerialException as e:
         # This is the "Skip Step" logic
         print(f'Step Skipped: SerialException ({e})')
         pass # We just catch the exception and return, allowing the protocol to continue
-    
-    # --- *** THIS IS THE FIX *** ---
-    except (ValueError, TypeError) as e: 
+    except (ValueError, TypeError) as e:
         # This is also "Skip Step" logic, catching float('none')
         print(f'Step Skipped: Value Error ({e})')
         pass # Do not re-raise, just let the step end.
-    # --- *** END OF FIX *** ---
 
-def run_protocol(controller, prot_dict, 
-                 update_step_fn, update_lid_fn, update_plate_fn, update_time_fn, 
-                 emergency_stop_event, 
-                 experiment_title, update_sec=0.1):
-    """Runs the full protocol, step by step."""
+def incubation(controller, 
+               update_lid_fn, update_plate_fn, update_time_fn, 
+               emergency_stop_event,
+               start_time, graph, plate_temp, 
+               inc_time=None, lid_temp=None, well_vol=None, update_sec=0.1, max_update_sec=2.0):
+    """
+    Manages a single incubation step and updates GUI labels via callbacks.
+    Polls every `update_sec` to `max_update_sec` seconds (see AdaptivePoller).
+    """
+    steps = _incubation_steps(update_lid_fn, update_plate_fn, update_time_fn, emergency_stop_event,
+                              start_time, graph, plate_temp, inc_time, lid_temp, well_vol, update_sec, max_update_sec)
+    _drive(steps, controller, emergency_stop_event)
+
+def step_text(step, program, estimate=None, elapsed_in_step=0.0):
+    """Status text for a step `elapsed_in_step` seconds in, with the estimated finish time if given."""
+    text = (f'Stage\t\tCycle\t\tStep\n{step.stage}\t\t{step.cycle}\t\t{step.step}'
+            f'\n\nStep {step.index + 1} of {program.total_steps}')
+    if estimate is not None:
+        remaining = estimate.remaining_sec(step.index, elapsed_in_step)
+        finish = datetime.datetime.now() + datetime.timedelta(seconds=remaining)
+        text += f'   -   ETA {finish:%H:%M} ({format_duration(remaining)} left)'
+    return text
+
+def _run_steps(controller, prot_dict,
+               update_step_fn, update_lid_fn, update_plate_fn, update_time_fn,
+               emergency_stop_event,
+               experiment_title, update_sec, max_update_sec, telemetry, log_dir, show_graph, ramp_model,
+               render_graph, on_step):
+    """Step generator for a whole protocol run (see run_protocol)."""
     if not controller or not controller.port:
         print("Error: Controller not connected.")
         update_step_fn("Error: Not Connected") 
         return
 
-    temp_graph = {}
+    program = compile_protocol(prot_dict)
+    estimate = estimate_run(program, ramp_model)
+    temp_graph = telemetry if telemetry is not None else TelemetryBuffer()
+    run_log = open_run_log(log_dir, controller, program, experiment_title) if log_dir else None
+    caller_sink = temp_graph.sink
+    if run_log:
+        temp_graph.sink = run_log if caller_sink is None else TeeSink(caller_sink, run_log)
     strt_time = time.time()
     
     try:
-        for stage in prot_dict:
+        for step in program:
             if emergency_stop_event.is_set():
-                raise Exception("Emergency Stop Triggered")
-                
-            cycles = prot_dict[stage][0]
-            for i in range(cycles):
-                if emergency_stop_event.is_set():
-                    raise Exception("Emergency Stop Triggered")
-                    
-                for step_counter in range(1, len(prot_dict[stage])):
-                    if emergency_stop_event.is_set():
-                        raise Exception("Emergency Stop Triggered")
-
-                    step_text = f'Stage\t\tCycle\t\tStep\n{stage}\t\t{i+1}\t\t{step_counter}'
-                    update_step_fn(step_text)
-                    print(f'Stage-{stage}\t\tCycle-{i+1}\t\tStep-{step_counter}')
-                    
-                    step = (prot_dict[stage][step_counter])
-
-                    if step[0] == 'DEACTIVATE_ALL':
-                        controller.deactivate_all()
-                    elif step[0] == 'END&GRAPH':
-                        create_graph(temp_graph, experiment_title)
-                        incubation(controller, 
-                                   update_lid_fn, update_plate_fn, update_time_fn, 
-                                   emergency_stop_event, 
-                                   strt_time, temp_graph, 
-                                   plate_temp=temp_graph[max(temp_graph.keys())][1], 
-                                   update_sec=update_sec) 
-                    else:
-                        incubation(controller, 
-                                   update_lid_fn, update_plate_fn, update_time_fn, 
-                                   emergency_stop_event, 
-                                   strt_time, temp_graph, 
-                                   plate_temp=step[0], inc_time=step[1], lid_temp=step[2], 
-                                   update_sec=update_sec)
-    except Exception as e:
-        # This will now *only* catch the Emergency Stop
-        print(f"Protocol run stopped: {e}") 
+                raise EmergencyStop("Emergency Stop Triggered")
+
+            update_step_fn(step_text(step, program, estimate))
+            if on_step:
+                on_step(step, program, estimate.remaining_sec(step.index))
+            print(f'Stage-{step.stage}\t\tCycle-{step.cycle}\t\tStep-{step.step}')
+            temp_graph.set_position(step.stage, step.cycle, step.step)
+            action = step.action
+            step_started = time.monotonic()
+            # Re-estimates the finish time as the step progresses (a hold can run for hours)
+            on_poll = lambda: update_step_fn(step_text(step, program, estimate, time.monotonic() - step_started))
+
+            if isinstance(action, Deactivate):
+                yield Call('deactivate_all', ())
+            elif isinstance(action, EndGraph):
+                if render_graph:
+                    from graph_renderer import graph_path, render_graph_async
+                    render_graph_async(temp_graph, experiment_title, graph_path(experiment_title, run_log), show=show_graph)
+                last_sample = temp_graph.latest()
+                if last_sample:
+                    # Hold at the last measured plate temperature
+                    yield from _incubation_steps(update_lid_fn, update_plate_fn, update_time_fn, 
+                                                 emergency_stop_event, 
+                                                 strt_time, temp_graph, 
+                                                 plate_temp=round(last_sample['plate'], 2), 
+                                                 update_sec=update_sec, max_update_sec=max_update_sec,
+                                                 on_poll=on_poll) 
+            else:
+                yield from _incubation_steps(update_lid_fn, update_plate_fn, update_time_fn, 
+                                             emergency_stop_event, 
+                                             strt_time, temp_graph, 
+                                             plate_temp=action.plate_temp, inc_time=action.hold_sec,
+                                             lid_temp=action.lid_temp,
+                                             update_sec=update_sec, max_update_sec=max_update_sec,
+                                             on_poll=on_poll)
+    except EmergencyStop as e:
+        print(f"Protocol run stopped: {e}")
+        # A setpoint queued as the stop came in would land after the caller's
+        # deactivate_all and switch the heaters back on, so deactivate again
+        yield Call('deactivate_all', ())
+    except Exception:
+        # Anything else is a real failure (lost connection, controller error): switch
+        # the heaters off if the device still answers and let the caller report it
+        try:
+            yield Call('deactivate_all', ())
+        except Exception:
+            pass
+        raise
     finally:
-        print("Protocol finished or stopped.")
\ No newline at end of file
+        if run_log:
+            temp_graph.sink = caller_sink
+            run_log.close()
+            print(f"Run log saved to {run_log.path}")
+        print("Protocol finished or stopped.")
+    return temp_graph
+
+def run_protocol(controller, prot_dict, 
+                 update_step_fn, update_lid_fn, update_plate_fn, update_time_fn, 
+                 emergency_stop_event, 
+                 experiment_title, update_sec=0.1, max_update_sec=2.0, telemetry=None, log_dir=None, show_graph=True, ramp_model=None,
+                 render_graph=True, on_step=None):
+    """
+    Runs the full protocol, step by step. `prot_dict` is a protocol_dict() result or
+    a Program from compile_protocol().
+    Samples are recorded into `telemetry` (a TelemetryBuffer, e.g. ring-mode for
+    very long runs) or a new buffer, which is returned. With `log_dir`, every sample
+    is also streamed to a run log file there (see open_run_log).
+    At END&GRAPH the graph is saved next to the run log (see graph_renderer) by a
+    separate process and, with `show_graph`, opened in a viewer while the final
+    hold keeps sampling. With `render_graph=False` it only holds, and matplotlib
+    is never imported.
+    The step text includes an ETA from estimator.estimate_run() with `ramp_model`
+    (nominal ramp rates if None), updated with the time spent in the step at every poll.
+    `on_step(step, program, seconds_left)` is called as each ProgramStep starts.
+    """
+    steps = _run_steps(controller, prot_dict, update_step_fn, update_lid_fn, update_plate_fn, update_time_fn,
+                       emergency_stop_event, experiment_title, update_sec, max_update_sec, telemetry, log_dir,
+                       show_graph, ramp_model, render_graph, on_step)
+    return _drive(steps, controller, emergency_stop_event)
+
+
+# --- asyncio versions, for driving several devices from one event loop (see tc_async.py) ---
+
+async def incubation_async(controller,
+                           update_lid_fn, update_plate_fn, update_time_fn,
+                           emergency_stop_event,
+                           start_time, graph, plate_temp,
+                           inc_time=None, lid_temp=None, well_vol=None, update_sec=0.1, max_update_sec=2.0):
+    """Async version of incubation() for an AsyncHardwareController."""
+    steps = _incubation_steps(update_lid_fn, update_plate_fn, update_time_fn, emergency_stop_event,
+                              start_time, graph, plate_temp, inc_time, lid_temp, well_vol, update_sec, max_update_sec)
+    await _drive_async(steps, controller, emergency_stop_event)
+
+async def run_protocol_async(controller, prot_dict,
+                             update_step_fn, update_lid_fn, update_plate_fn, update_time_fn,
+                             emergency_stop_event,
+                             experiment_title, update_sec=0.1, max_update_sec=2.0, telemetry=None, log_dir=None, show_graph=True, ramp_model=None,
+                             render_graph=True, on_step=None):
+    """
+    Async version of run_protocol(). `emergency_stop_event` may be a threading.Event
+    or an asyncio.Event.
+    """
+    steps = _run_steps(controller, prot_dict, update_step_fn, update_lid_fn, update_plate_fn, update_time_fn,
+                       emergency_stop_event, experiment_title, update_sec, max_update_sec, telemetry, log_dir,
+                       show_graph, ramp_model, render_graph, on_step)
+    return await _drive_async(steps, controller, emergency_stop_event)
@@ -0,0 +1,308 @@
+import argparse
+import collections
+import datetime
+import json
+import pathlib
+import queue
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from serial.serialutil import SerialException, PortNotOpenError
+
+from tc_simulator import SimulatedSerial
+
+# Set to a directory to trace every connection a HardwareController makes (see
+# HardwareController.trace_dir).
+TRACE_DIR_ENV = 'HELIXCYCLER_SERIAL_TRACE'
+MAGIC = b'HXTRACE1\n'
+MAX_SKIP = 20  # recorded writes a replayed write may skip ahead to find its match
+
+
+class TraceWriter:
+    """
+    Records serial traffic to a trace file: MAGIC, a JSON header line, then one line
+    per event, `<seconds since start> <W|R> <data as a JSON string>`, W for bytes
+    written and R for bytes read. Timestamps are time.monotonic() based. Events are
+    written out from a background thread, so record() never blocks serial I/O on disk.
+    """
+    def __init__(self, path, header, flush_interval=0.5):
+        self.path = pathlib.Path(path)
+        self.flush_interval = flush_interval
+        self._started = time.monotonic()
+        self._queue = queue.SimpleQueue()
+        self._file = open(self.path, 'xb')
+        self._file.write(MAGIC + json.dumps(header).encode('utf-8') + b'\n')
+        self._file.flush()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def record(self, kind, data):
+        self._queue.put((time.monotonic() - self._started, kind, bytes(data)))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _writer_loop(self):
+        closing = False
+        while not closing:
+            lines = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is None:
+                        closing = True
+                        break
+                    seconds, kind, data = item
+                    # latin-1 maps bytes 1:1 to code points, so any byte survives the round trip
+                    lines.append(f"{seconds:.4f} {kind} {json.dumps(data.decode('latin-1'))}\n")
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                if lines:
+                    self._file.write(''.join(lines).encode('utf-8'))
+                    self._file.flush()
+            except OSError as e:
+                print(f"Serial trace write failed ({self.path}): {e}")
+        self._file.close()
+
+
+def read_trace(path):
+    """Returns (header, events) of a trace file, events as (seconds, 'W' or 'R', bytes)."""
+    with open(path, 'rb') as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"{path} is not a HelixCycler serial trace.")
+        header = json.loads(f.readline())
+        events = []
+        for line in f:
+            seconds, kind, data = line.decode('utf-8').split(' ', 2)
+            events.append((float(seconds), kind, json.loads(data).encode('latin-1')))
+    return header, events
+
+
+class TracingSerial:
+    """
+    Wraps an open serial port and records everything written to and read from it
+    in a TraceWriter. Anything else (attributes, settings) goes to the port.
+    """
+    def __init__(self, port, trace):
+        object.__setattr__(self, '_port', port)
+        object.__setattr__(self, 'trace', trace)
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._port, name, value)
+
+    def write(self, data):
+        # Recorded first, so a fast reply can never precede its command in the trace
+        self.trace.record('W', data)
+        return self._port.write(data)
+
+    def read(self, size=1):
+        data = self._port.read(size)
+        if data:
+            self.trace.record('R', data)
+        return data
+
+    def readline(self, size=-1):
+        data = self._port.readline(size)
+        if data:
+            self.trace.record('R', data)
+        return data
+
+    def close(self):
+        self._port.close()
+        self.trace.close()
+
+
+def trace_port(port, port_name, trace_dir):
+    """
+    Starts tracing `port` to a new file in `trace_dir`, named after the time and
+    port. Returns the TracingSerial, or the port itself if the file can't be created.
+    """
+    started = datetime.datetime.now()
+    safe_port = re.sub(r'[^\w-]+', '_', port_name.split('?')[0]).strip('_') or 'port'
+    path = pathlib.Path(trace_dir) / f"{started:%Y%m%d-%H%M%S}_{safe_port}.hxtrace"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        trace = TraceWriter(path, {'port': port_name, 'start_time': started.isoformat(timespec='seconds')})
+    except OSError as e:
+        print(f"Error: Could not create serial trace {path}: {e}")
+        return port
+    print(f"Tracing serial traffic to {path}")
+    return TracingSerial(port, trace)
+
+
+Exchange = collections.namedtuple('Exchange', 'write replies')  # replies: [(delay after the write, bytes)]
+
+def exchanges(events):
+    """
+    Groups trace events by write: returns (preamble, exchanges), where preamble is
+    what was read before the first write, as (delay after the start, bytes).
+    """
+    preamble, result = [], []
+    for seconds, kind, data in events:
+        if kind == 'W':
+            result.append(Exchange(data, []))
+            written_at = seconds
+        elif result:
+            result[-1].replies.append((seconds - written_at, data))
+        else:
+            preamble.append((seconds, data))
+    return preamble, result
+
+
+class ReplaySerial(SimulatedSerial):
+    """
+    pyserial-compatible transport that plays a recorded trace back to the controller.
+    Open it with a URL such as 'replay://run.hxtrace?speed=10' (see
+    HardwareController.connect); `speed` divides the recorded reply delays, 0 sends
+    replies at once.
+
+    Replies follow the controller's writes, not the clock, so a replay is
+    deterministic: each write is matched to the next recorded write with the same
+    bytes (up to MAX_SKIP ahead) and answered with what the device sent after it.
+    A write with no match ahead gets the latest recorded reply to the same bytes,
+    or no reply if there is none. `stats` counts these cases.
+    """
+    def __init__(self, *args, exchanges=(), preamble=(), speed=1.0, **kwargs):
+        self._exchanges = list(exchanges)
+        self._preamble = list(preamble)
+        self.speed = speed
+        self._cursor = 0
+        self._last_replies = {}
+        self.stats = collections.Counter()
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        if self._port is None:
+            raise SerialException("Port must be configured before it can be used.")
+        if self.is_open:
+            raise SerialException("Port is already open.")
+        if not self._exchanges and not self._preamble:
+            self._configure_from_url(self._port)
+        self.is_open = True
+        with self._cond:
+            self._schedule(self._preamble)
+
+    def _configure_from_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme != 'replay':
+            raise SerialException(f'expected a string in the form "replay://path[?speed=N]": ({url!r})')
+        options = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        try:
+            self.speed = float(options.get('speed', self.speed))
+            _, events = read_trace(parts.netloc + parts.path)
+        except (OSError, ValueError) as e:
+            raise SerialException(f'could not replay {url!r}: {e}')
+        self._preamble, self._exchanges = exchanges(events)
+
+    def _schedule(self, replies):
+        now = time.monotonic()
+        for delay, data in replies:
+            # Replies never overtake earlier ones
+            ready_at = now + (delay / self.speed if self.speed > 0 else 0.0)
+            if self._pending:
+                ready_at = max(ready_at, self._pending[-1][0])
+            self._pending.append((ready_at, data))
+        self._cond.notify_all()
+
+    def write(self, data):
+        if not self.is_open:
+            raise PortNotOpenError()
+        data = bytes(data)
+        with self._cond:
+            end = min(len(self._exchanges), self._cursor + MAX_SKIP + 1)
+            match = next((i for i in range(self._cursor, end) if self._exchanges[i].write == data), None)
+            if match is not None:
+                for exchange in self._exchanges[self._cursor:match + 1]:
+                    self._last_replies[exchange.write] = exchange.replies
+                self.stats['matched'] += 1
+                self.stats['skipped'] += match - self._cursor
+                self._cursor = match + 1
+                replies = self._exchanges[match].replies
+            elif data in self._last_replies:
+                self.stats['reused'] += 1
+                replies = self._last_replies[data]
+            else:
+                self.stats['unmatched'] += 1
+                replies = []
+            self._schedule(replies)
+        return len(data)
+
+    @property
+    def remaining(self):
+        """Recorded writes not replayed yet."""
+        return len(self._exchanges) - self._cursor
+
+
+def summary(path):
+    """Prints what a trace contains: duration, traffic and the slowest replies per command."""
+    header, events = read_trace(path)
+    _, recorded = exchanges(events)
+    duration = events[-1][0] if events else 0.0
+    written = sum(len(data) for _, kind, data in events if kind == 'W')
+    print(f"{path}: {header.get('port')} at {header.get('start_time')}")
+    print(f"{len(recorded)} writes ({written} bytes), {len(events) - len(recorded)} reads "
+          f"({sum(len(data) for _, kind, data in events if kind == 'R')} bytes) over {duration:.1f} s")
+    replies = collections.defaultdict(list)
+    for exchange in recorded:
+        command = ' '.join(exchange.write.decode('latin-1').split()) or '(empty)'
+        replies[command].append(exchange.replies[-1][0] if exchange.replies else None)
+    for command, delays in sorted(replies.items(), key=lambda item: -len(item[1])):
+        answered = [delay for delay in delays if delay is not None]
+        slowest = f", slowest reply {max(answered) * 1000:.0f} ms" if answered else ""
+        print(f"  {command}: {len(delays)}x, {len(delays) - len(answered)} unanswered{slowest}")
+
+
+def bench(trace_path, protocol_path, speed=0.0):
+    """
+    Replays a trace through run_protocol, polling as fast as the replay answers,
+    and reports real run time and how closely the run's commands followed the trace.
+    """
+    from tc_send_code import HardwareController
+    from protocol_manager import run_protocol, protocol_dict
+
+    controller = HardwareController()
+    if not controller.connect(f"replay://{trace_path}?speed={speed}"):
+        return 1
+    prot_dict = protocol_dict(protocol_path)
+    for stage in prot_dict:
+        prot_dict[stage] = [step for step in prot_dict[stage] if step != ['END&GRAPH']]
+    replay = controller.port
+    ignore = lambda text: None
+    start = time.monotonic()
+    run_protocol(controller, prot_dict, ignore, ignore, ignore, ignore,
+                 threading.Event(), 'replay', update_sec=0.0, max_update_sec=0.0, render_graph=False)
+    elapsed = time.monotonic() - start
+    stats, remaining = dict(replay.stats), replay.remaining
+    controller.disconnect()
+    print(f"Real run time: {elapsed:.2f} s")
+    print(f"Writes: {stats.get('matched', 0)} matched, {stats.get('skipped', 0)} recorded skipped, "
+          f"{stats.get('reused', 0)} answered with an earlier reply, {stats.get('unmatched', 0)} unanswered")
+    print(f"Recorded writes left after the run: {remaining}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or replay serial traces (record them with "
+                                                 f"{TRACE_DIR_ENV}=DIR or the headless runner's --trace).")
+    commands = parser.add_subparsers(dest='command', required=True)
+    summary_parser = commands.add_parser('summary', help="describe a trace")
+    summary_parser.add_argument('trace')
+    bench_parser = commands.add_parser('bench', help="replay a trace through a protocol run and time it")
+    bench_parser.add_argument('trace')
+    bench_parser.add_argument('protocol', help="the protocol file the trace was recorded with")
+    bench_parser.add_argument('--speed', type=float, default=0.0,
+                              help="divide the recorded reply delays by this (default 0: no delays)")
+    args = parser.parse_args()
+    if args.command == 'summary':
+        summary(args.trace)
+    else:
+        sys.exit(bench(args.trace, args.protocol, args.speed))
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+# Set in a window's environment to print its startup times and close once painted
+STARTUP_REPORT_ENV = 'HELIXCYCLER_STARTUP_REPORT'
+# Modules the windows defer until first use; loading one at startup is a regression
+DEFERRED_MODULES = ('matplotlib', 'numpy', 'asyncio', 'protocol_manager')
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+def report_when_painted(window, started, imports_done):
+    """
+    If STARTUP_REPORT_ENV is set, prints the import and first-paint times of
+    `window` (seconds since `started`, a time.perf_counter() taken at the top of
+    the script) as one JSON line once it is visible, then closes it.
+    """
+    if not os.environ.get(STARTUP_REPORT_ENV):
+        return
+
+    def report():
+        window.wait_visibility()
+        window.update_idletasks()
+        painted = time.perf_counter()
+        print(json.dumps({'imports_sec': imports_done - started, 'first_paint_sec': painted - started,
+                          'deferred_loaded': [name for name in DEFERRED_MODULES if name in sys.modules]}), flush=True)
+        getattr(window, 'on_closing', window.destroy)()
+
+    window.after(0, report)
+
+
+def measure(script, runs=5, timeout=30.0):
+    """
+    Starts `script` `runs` times with STARTUP_REPORT_ENV set and returns a
+    summary: median import, first-paint and wall-clock (spawn to visible) times.
+    """
+    env = dict(os.environ, **{STARTUP_REPORT_ENV: '1'})
+    samples = []
+    for _ in range(runs):
+        spawned = time.perf_counter()
+        process = subprocess.Popen([sys.executable, script], cwd=BASE_DIR, env=env, text=True,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        sample = None
+        for line in process.stdout:
+            if line.startswith('{'):
+                sample = json.loads(line)
+                sample['wall_sec'] = time.perf_counter() - spawned
+                break
+        _, stderr = process.communicate(timeout=timeout)
+        if sample is None:
+            raise RuntimeError(f"{script} did not report its startup (exit {process.returncode}):\n{stderr.strip()}")
+        samples.append(sample)
+    median = lambda key: sorted(sample[key] for sample in samples)[len(samples) // 2]
+    return {'script': script, 'runs': runs, 'imports_sec': median('imports_sec'),
+            'first_paint_sec': median('first_paint_sec'), 'wall_sec': median('wall_sec'),
+            'deferred_loaded': sorted({name for sample in samples for name in sample['deferred_loaded']})}
+
+def import_profile(module, top=8):
+    """The `top` slowest direct imports of `module` as (cumulative seconds, name), from python -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BASE_DIR, capture_output=True, text=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if len(name) - len(name.lstrip()) == 3:  # Direct imports of `module` (one level of nesting)
+            timings.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure how long the HelixCycler windows take to appear.")
+    parser.add_argument('scripts', nargs='*', default=['helixcycler.py', 'launcher.py'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0, help="maximum seconds from start to visible window")
+    parser.add_argument('--record', help="append the results as JSON lines to this file")
+    parser.add_argument('--imports', action='store_true', help="also list the slowest imports of each script")
+    args = parser.parse_args()
+
+    failed = False
+    for script in args.scripts:
+        summary = measure(script, args.runs)
+        summary['time'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        over_budget = summary['wall_sec'] > args.budget
+        failed = failed or over_budget or bool(summary['deferred_loaded'])
+        print(f"{script}: imports {summary['imports_sec'] * 1000:.0f} ms, first paint {summary['first_paint_sec'] * 1000:.0f} ms, "
+              f"visible after {summary['wall_sec'] * 1000:.0f} ms (median of {args.runs})"
+              + (f"  OVER BUDGET ({args.budget:g} s)" if over_budget else ""))
+        if summary['deferred_loaded']:
+            print(f"  Loaded at startup but should be deferred: {', '.join(summary['deferred_loaded'])}")
+        if args.imports:
+            for seconds, name in import_profile(pathlib.Path(script).stem):
+                print(f"  {seconds * 1000:7.1f} ms  {name}")
+        if args.record:
+            with open(args.record, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(summary) + '\n')
+    sys.exit(1 if failed else 0)
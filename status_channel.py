@@ -0,0 +1,159 @@
+import json
+import os
+import socket
+import threading
+import time
+
+# Set by the launcher to the "host:port" its StatusListener receives on; control
+# views started from it (as child processes or in-process tabs) report there.
+STATUS_ADDR_ENV = 'HELIXCYCLER_STATUS_ADDR'
+STALE_SEC = 6.0
+
+
+class StatusPublisher:
+    """
+    Reports one control view's status to the launcher as small JSON datagrams over
+    localhost UDP. Sending never blocks and nothing breaks if nobody is listening.
+
+    update() only stores fields, from any thread. A sender thread sends the whole
+    status at most `rate` times per second when a field changed, and at least every
+    `heartbeat_sec` so the launcher can tell a hung window from an idle one.
+    Also a TelemetryBuffer sink, so a run's samples update the temperatures
+    without any extra serial polls.
+    """
+    def __init__(self, address, key, rate=4, heartbeat_sec=2.0):
+        host, port = address.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.interval = 1.0 / rate
+        self.heartbeat_sec = heartbeat_sec
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._lock = threading.Lock()
+        self._status = {'key': key, 'pid': os.getpid(), 'state': 'disconnected'}
+        self._dirty = True
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def update(self, **fields):
+        with self._lock:
+            if any(self._status.get(name) != value for name, value in fields.items()):
+                self._status.update(fields)
+                self._dirty = True
+
+    def append(self, minutes, lid, plate, setpoint, stage, cycle, step):
+        self.update(lid=round(float(lid), 1), plate=round(float(plate), 1))
+
+    def close(self):
+        """Tells the launcher this view is gone and stops sending."""
+        self.update(state='closed')
+        self._stop.set()
+        self._send()
+
+    def _run(self):
+        last_sent = 0.0
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                due = self._dirty or time.monotonic() - last_sent >= self.heartbeat_sec
+            if due:
+                self._send()
+                last_sent = time.monotonic()
+
+    def _send(self):
+        with self._lock:
+            data = json.dumps(dict(self._status, sent=time.time()), separators=(',', ':')).encode()
+            self._dirty = False
+        try:
+            self._socket.sendto(data, self.address)
+        except OSError:
+            pass  # Launcher gone or socket buffer full; the next update resends everything
+
+
+def publisher_for(key):
+    """A StatusPublisher to the launcher named in STATUS_ADDR_ENV, or None if there is none."""
+    address = os.environ.get(STATUS_ADDR_ENV)
+    if not address:
+        return None
+    try:
+        return StatusPublisher(address, key)
+    except (OSError, ValueError) as e:
+        print(f"Status reporting disabled ({address}): {e}")
+        return None
+
+
+class StatusListener:
+    """
+    Receives StatusPublisher datagrams on a localhost UDP port (any free one by
+    default) and keeps the latest status of each view. `address` is the value for
+    STATUS_ADDR_ENV.
+    """
+    def __init__(self, port=0):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(('127.0.0.1', port))
+        self._socket.settimeout(1.0)
+        self.address = '%s:%d' % self._socket.getsockname()
+        self._lock = threading.Lock()
+        self._statuses = {}  # key -> (time.monotonic() received, status dict)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._socket.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # Closed by stop()
+            try:
+                status = json.loads(data)
+                key = status['key']
+            except (ValueError, KeyError, TypeError):
+                continue
+            with self._lock:
+                if status.get('state') == 'closed':
+                    self._statuses.pop(key, None)
+                else:
+                    self._statuses[key] = (time.monotonic(), status)
+
+    def snapshot(self):
+        """The latest status of every view, with 'stale' set for those not heard from lately."""
+        now = time.monotonic()
+        with self._lock:
+            return [dict(status, stale=now - received > STALE_SEC) for received, status in self._statuses.values()]
+
+    def forget(self, pid):
+        """Drops the statuses of a process that exited."""
+        with self._lock:
+            for key in [key for key, (_, status) in self._statuses.items() if status.get('pid') == pid]:
+                del self._statuses[key]
+
+
+def describe(status):
+    """One dashboard line for a view's status."""
+    port = status.get('port') or '(no port)'
+    if status.get('stale'):
+        return f"{port}  -  not responding"
+    state = status.get('state')
+    temps = ""
+    if status.get('lid') is not None and status.get('plate') is not None:
+        temps = f"lid {status['lid']:.1f} °C  plate {status['plate']:.1f} °C"
+    if state != 'running':
+        return f"{port}  -  {state}" + (f"  -  {temps}" if temps else "")
+    text = f"{port}  -  {status.get('title', '')}: {status.get('protocol', '')}"
+    if status.get('index') is not None:
+        text += (f"  -  step {status['index'] + 1}/{status['total']} (stage {status['stage']}, "
+                 f"cycle {status['cycle']}, step {status['step']})")
+    if temps:
+        text += f"  -  {temps}"
+    if status.get('eta'):
+        text += f"  -  ETA {time.strftime('%H:%M', time.localtime(status['eta']))}"
+    return text
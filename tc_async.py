@@ -0,0 +1,254 @@
+import asyncio
+import time
+
+import serial
+
+from tc_send_code import HardwareController, CommandChannel, _Command, WRITE_ERRORS, BYTES_WRITTEN
+
+
+class _AsyncCommand(_Command):
+    """A _Command awaited from the event loop."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.done = asyncio.Event()
+
+    async def wait(self, timeout=None):
+        """Waits for the device to acknowledge the command and returns its reply lines."""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise serial.SerialException(f"No acknowledgement for {self.payload.strip()!r}.")
+        if self.error:
+            raise serial.SerialException(f"Command {self.payload.strip()!r} failed: {self.error}")
+        return self.lines
+
+
+class AsyncHardwareController:
+    """
+    asyncio counterpart of HardwareController, so one event loop can drive many devices:
+
+        ctl = AsyncHardwareController()
+        await ctl.connect('/dev/ttyACM0')
+        await ctl.set_plate_temperature(95, 30)
+        plate_temp, seconds_left = await ctl.get_plate_info()
+
+    Shares HardwareController's command table, priorities, reply parsing and
+    CommandChannel; only the I/O differs. On POSIX the port is read without blocking
+    via loop.add_reader(); transports without a file descriptor (Windows COM ports,
+    sim://) fall back to a blocking readline() in the default executor. Writes go
+    through the executor too, so a slow port never stalls the loop.
+    """
+    COMMANDS = HardwareController.COMMANDS
+    QUERIES = HardwareController.QUERIES
+    URGENT_COMMANDS = HardwareController.URGENT_COMMANDS
+    CANCELS = HardwareController.CANCELS
+    REPLY_TIMEOUT = HardwareController.REPLY_TIMEOUT
+    _priority_for = HardwareController._priority_for
+    _payload = staticmethod(HardwareController._payload)
+    _parse_reply = HardwareController._parse_reply
+
+    def __init__(self):
+        self.port = None
+        self.port_name = None
+        self.trace_dir = None  # see HardwareController.trace_dir
+        self._loop = None
+        self._tasks = []
+        self._fd = None
+        self._closing = False
+        self._channel = None
+        self._changed = None
+
+    async def connect(self, port_name):
+        """
+        Connects to the specified serial port (or URL, see HardwareController.connect).
+        Returns True on success, False on failure.
+        """
+        self._loop = asyncio.get_running_loop()
+        try:
+            self.port = await self._loop.run_in_executor(None, self._open, port_name)
+        except serial.SerialException as e:
+            print(f"Error connecting to {port_name}: {e}")
+            self.port = None
+            return False
+        self.port_name = port_name
+        self._closing = False
+        self._changed = asyncio.Event()
+        self._channel = CommandChannel(self, _AsyncCommand, self._notify)
+        self._fd = self._fileno(self.port)
+        if self._fd is not None:
+            self.port.timeout = 0
+            self._loop.add_reader(self._fd, self._on_readable)
+        else:
+            self._tasks.append(self._loop.create_task(self._executor_reader()))
+        self._tasks.append(self._loop.create_task(self._writer()))
+        return True
+
+    def _open(self, port_name):
+        return HardwareController.trace(HardwareController.open_port(port_name), port_name, self.trace_dir)
+
+    @staticmethod
+    def _fileno(port):
+        try:
+            return port.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    async def disconnect(self):
+        """Flushes queued commands, stops the I/O tasks and closes the serial port."""
+        if not self.port or not self.port.is_open:
+            return
+        channel = self._channel
+        deadline = time.monotonic() + self.REPLY_TIMEOUT
+        while (channel.outbox or channel.in_flight) and not channel.error and time.monotonic() < deadline:
+            await self._wait_changed(deadline - time.monotonic())
+        # The flag, not just cancel(), stops the tasks: wait_for() can swallow a cancellation
+        self._closing = True
+        self._notify()
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.port.close()
+        channel.fail(serial.SerialException("Disconnected."))
+        self.port = None
+        print("Disconnected.")
+
+    # --- Command Channel ---
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait_changed(self, timeout=None):
+        event = self._changed
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _command(self, com, extra='', priority=None):
+        """Queues a command and returns its handle; `await handle.wait()` for the ack."""
+        return self._enqueue([f"{self.COMMANDS[com]}{extra}"], [com], priority)
+
+    def _commands(self, *coms, priority=None, keys=()):
+        """Queues several commands to be sent to the device in a single write."""
+        return self._enqueue([self.COMMANDS[com] for com in coms], coms, priority, keys)
+
+    def _enqueue(self, gcodes, coms, priority=None, keys=()):
+        if not self.port or not self.port.is_open:
+            print("Error: Not connected.")
+            return None
+        return self._channel.enqueue(gcodes, coms, priority, keys)
+
+    async def _writer(self):
+        """Writes queued commands in priority order, waiting for each to be acknowledged."""
+        channel, port = self._channel, self.port
+        while not channel.error and not self._closing:
+            command = channel.next_to_write()
+            if command is None:
+                await self._wait_changed(channel.write_timeout())
+                continue
+            data = str.encode(command.payload)
+            try:
+                await self._loop.run_in_executor(None, port.write, data)
+                BYTES_WRITTEN.inc(len(data), port=self.port_name)
+            except (serial.SerialException, OSError) as e:
+                print(f"Serial write failed: {e}")
+                WRITE_ERRORS.inc(port=self.port_name)
+                channel.write_failed(command, e)
+
+    def _reader_failed(self, error):
+        print(f"Serial reader stopped: {error}")
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        self._channel.fail(error)
+
+    # --- Reading ---
+
+    def _on_readable(self):
+        try:
+            data = self.port.read(self.port.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            self._reader_failed(e)
+            return
+        self._channel.feed(data)
+
+    async def _executor_reader(self):
+        channel, port = self._channel, self.port
+        while not self._closing:
+            try:
+                data = await self._loop.run_in_executor(None, port.readline)
+            except asyncio.CancelledError:
+                raise
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                self._reader_failed(e)
+                return
+            channel.feed(data)
+
+    async def _query(self, *keys, max_age=None):
+        """Async version of HardwareController._query."""
+        requested = time.monotonic()
+        since = requested - max_age if max_age is not None else requested
+        deadline = requested + self.REPLY_TIMEOUT
+        channel = self._channel
+        if channel is None or channel.error or not self.port:
+            raise serial.SerialException("Device read failed (not connected).")
+        waiting_on = channel.request(keys, since)
+        while True:
+            values = channel.answer(keys, since, waiting_on, deadline)
+            if values is not None:
+                return values
+            await self._wait_changed(deadline - time.monotonic())
+
+    # --- Public Hardware Commands ---
+
+    async def open_lid(self):
+        return self._command('open_lid')
+
+    async def close_lid(self):
+        return self._command('close_lid')
+
+    async def get_lid_temperature(self, max_age=None):
+        return (await self._query('lid', max_age=max_age))[0]
+
+    async def get_plate_info(self, max_age=None):
+        return list((await self._query('plate', max_age=max_age))[0])
+
+    async def get_status(self, max_age=None):
+        lid_temp, plate_info = await self._query('lid', 'plate', max_age=max_age)
+        return [lid_temp, plate_info[0], plate_info[1]]
+
+    async def get_device_info(self, max_age=None):
+        return dict((await self._query('info', max_age=max_age))[0])
+
+    async def set_lid_temperature(self, temp):
+        return self._command('set_lid_temp', ' S' + str(temp))
+
+    async def set_plate_temperature(self, target, time_val=None, well_vol=None):
+        return self._command("set_plate_temp", HardwareController._plate_args(target, time_val, well_vol))
+
+    async def deactivate_shaker(self):
+        self._command('deactivate_shake')
+        return self._command('deactivate_heating')
+
+    async def set_shake_speed(self, target):
+        return self._command("set_shake_speed", ' S' + str(target))
+
+    async def open_latch(self):
+        return self._command('open_latch')
+
+    async def close_latch(self):
+        return self._command('close_latch')
+
+    async def deactivate_all(self):
+        return self._command('deactivate_all')
+
+    async def deactivate_plate(self):
+        return self._command('deactivate_block')
+
+    async def deactivate_lid(self):
+        return self._command('deactivate_lid')
@@ -1,11 +1,253 @@
 import serial
 import serial.tools.list_ports
+import os
 import time
-import sys
+import threading
+import heapq
+import itertools
+
+import metrics
+
+# Command channel priorities, lowest value is written first
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_POLL = 2
+
+# Command channel metrics, labelled by port (shared with tc_async)
+COMMAND_LATENCY = metrics.histogram('helixcycler_command_latency_seconds',
+                                    "Time from writing a command to its last acknowledgement.", ('port', 'command'))
+COMMAND_TIMEOUTS = metrics.counter('helixcycler_command_timeouts_total',
+                                   "Commands dropped after REPLY_TIMEOUT without an acknowledgement.", ('port', 'command'))
+QUERY_RETRIES = metrics.counter('helixcycler_query_retries_total',
+                                "Queries resent because the device acknowledged without a usable reply.", ('port', 'keys'))
+QUERY_FAILURES = metrics.counter('helixcycler_query_failures_total',
+                                 "Queries that got no reply within REPLY_TIMEOUT.", ('port', 'keys'))
+WRITE_ERRORS = metrics.counter('helixcycler_write_errors_total', "Failed serial writes.", ('port',))
+BYTES_WRITTEN = metrics.counter('helixcycler_bytes_written_total', "Bytes written to the device.", ('port',))
+BYTES_READ = metrics.counter('helixcycler_bytes_read_total', "Bytes received from the device.", ('port',))
+UNMATCHED_LINES = metrics.counter('helixcycler_unmatched_lines_total',
+                                  "Received lines discarded because no command was in flight (late or unsolicited).",
+                                  ('port',))
+GARBLED_LINES = metrics.counter('helixcycler_garbled_lines_total', "Received lines that were not valid UTF-8.", ('port',))
+PARTIAL_READS = metrics.counter('helixcycler_partial_reads_total',
+                                "Reads that timed out mid-line (the fragment is kept for the next read).", ('port',))
+OUTBOX_DEPTH = metrics.gauge('helixcycler_outbox_depth', "Commands queued and not yet written.", ('port',))
+
+
+class _Command:
+    """One queued write on the command channel and the replies correlated to it."""
+    def __init__(self, payload, acks_expected, priority, seq, keys=(), name=''):
+        self.payload = payload
+        self.name = name
+        self.acks_expected = acks_expected
+        self.priority = priority
+        self.seq = seq
+        self.keys = keys
+        self.lines = []
+        self.sent_at = None
+        self.error = None
+        self.done = threading.Event()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wait(self, timeout=None):
+        """Waits for the device to acknowledge the command and returns its reply lines."""
+        if not self.done.wait(timeout):
+            raise serial.SerialException(f"No acknowledgement for {self.payload.strip()!r}.")
+        if self.error:
+            raise serial.SerialException(f"Command {self.payload.strip()!r} failed: {self.error}")
+        return self.lines
+
+
+class CommandChannel:
+    """
+    State of one connection's command channel, without any I/O: the priority queue,
+    the in-flight window, correlation of reply lines and acks with the command in
+    flight, and the telemetry cache. HardwareController drives it from its reader and
+    writer threads (under its lock), AsyncHardwareController from one event loop.
+    `on_change()` is called whenever a reply arrives or a command completes.
+    """
+    def __init__(self, controller, command_class, on_change):
+        self.controller = controller  # supplies COMMANDS, QUERIES, CANCELS, REPLY_TIMEOUT and port_name
+        self.command_class = command_class
+        self.on_change = on_change
+        self.error = None  # once the link fails, every command fails with this
+        self.telemetry = {}  # key -> (monotonic timestamp, value)
+        self.outbox = []
+        self.in_flight = []
+        self.pending_queries = {}
+        self._seq = itertools.count()
+        self._partial = b''
+
+    def enqueue(self, gcodes, coms, priority=None, keys=()):
+        """Queues a write of `gcodes` (named `coms`) and returns its command handle."""
+        controller = self.controller
+        if priority is None:
+            priority = controller._priority_for(coms)
+        command = self.command_class(controller._payload(gcodes), len(gcodes), priority, next(self._seq), keys,
+                                     '+'.join(coms))
+        if self.error:
+            command.error = self.error
+            command.done.set()
+            return command
+        if priority == PRIORITY_URGENT:
+            self._cancel_setpoints(coms, command.name)
+        heapq.heappush(self.outbox, command)
+        OUTBOX_DEPTH.set(len(self.outbox), port=controller.port_name)
+        for key in keys:
+            self.pending_queries[key] = command
+        self.on_change()
+        return command
+
+    def _cancel_setpoints(self, coms, cancelled_by):
+        """
+        Fails the queued setpoints an urgent command turns off: written after it,
+        they would switch the heaters (or shaker) straight back on.
+        """
+        cancels = set().union(*(self.controller.CANCELS.get(com, ()) for com in coms))
+        stale = [command for command in self.outbox
+                 if command.priority != PRIORITY_URGENT and cancels.intersection(command.name.split('+'))]
+        if not stale:
+            return
+        self.outbox = [command for command in self.outbox if command not in stale]
+        heapq.heapify(self.outbox)
+        for command in stale:
+            self._finish(command, f"cancelled by {cancelled_by}")
+
+    def next_to_write(self):
+        """
+        Expires overdue commands, then returns the next command to write (now in
+        flight), or None if the window is full or nothing is queued.
+        """
+        self._expire_in_flight()
+        if self.outbox and (not self.in_flight or self.outbox[0].priority == PRIORITY_URGENT):
+            command = heapq.heappop(self.outbox)
+            OUTBOX_DEPTH.set(len(self.outbox), port=self.controller.port_name)
+            command.sent_at = time.monotonic()
+            self.in_flight.append(command)
+            return command
+        return None
+
+    def write_timeout(self):
+        """Seconds until the oldest in-flight command expires, None if nothing is in flight."""
+        if not self.in_flight:
+            return None
+        return max(0.0, self.in_flight[0].sent_at + self.controller.REPLY_TIMEOUT - time.monotonic())
+
+    def write_failed(self, command, error):
+        if command in self.in_flight:
+            self.in_flight.remove(command)
+        self._finish(command, error)
+
+    def _expire_in_flight(self):
+        """Drops commands whose acknowledgement never arrived so the queue keeps moving."""
+        now = time.monotonic()
+        while self.in_flight and now - self.in_flight[0].sent_at > self.controller.REPLY_TIMEOUT:
+            command = self.in_flight.pop(0)
+            COMMAND_TIMEOUTS.inc(port=self.controller.port_name, command=command.name)
+            self._finish(command, "timed out waiting for acknowledgement")
+
+    def _finish(self, command, error=None):
+        command.error = error
+        for key in command.keys:
+            if self.pending_queries.get(key) is command:
+                del self.pending_queries[key]
+        command.done.set()
+        self.on_change()
+
+    def fail(self, error):
+        """Fails every queued and in-flight command, and every later one, with `error`."""
+        self.error = error
+        for command in self.in_flight + self.outbox:
+            self._finish(command, error)
+        self.in_flight, self.outbox = [], []
+        self.on_change()
+
+    def feed(self, data):
+        """Handles bytes read from the device; an incomplete last line is kept for the next call."""
+        if not data:
+            return
+        BYTES_READ.inc(len(data), port=self.controller.port_name)
+        *lines, self._partial = (self._partial + data).split(b'\n')
+        for line in lines:
+            self.handle_line(line.decode('utf-8', 'replace') + '\n')
+
+    def handle_line(self, line):
+        """
+        Parses one reply line (lid, plate, M115 info or ack) into the telemetry cache
+        and attributes it to the command currently in flight.
+        """
+        port_name = self.controller.port_name
+        key, value = self.controller._parse_reply(line)
+        if '\ufffd' in line:
+            GARBLED_LINES.inc(port=port_name)
+        if key:
+            self.telemetry[key] = (time.monotonic(), value)
+        if line.strip() and not self.in_flight:
+            UNMATCHED_LINES.inc(port=port_name)
+        elif line.strip().lower() == 'ok':
+            command = self.in_flight[0]
+            command.acks_expected -= 1
+            if command.acks_expected <= 0:
+                COMMAND_LATENCY.observe(time.monotonic() - command.sent_at, port=port_name, command=command.name)
+                self._finish(self.in_flight.pop(0))
+        elif line.strip():
+            self.in_flight[0].lines.append(line.strip())
+        self.on_change()
+
+    def request(self, keys, since):
+        """
+        Queues one query for those telemetry `keys` not cached since `since` and not
+        already being queried. Returns the set of commands the values will come from.
+        """
+        controller = self.controller
+        waiting_on = set()
+        missing = []
+        for key in keys:
+            if self._is_fresh(key, since):
+                continue
+            if key in self.pending_queries:
+                waiting_on.add(self.pending_queries[key])
+            else:
+                missing.append(key)
+        if missing:
+            coms = [controller.QUERIES[key] for key in missing]
+            waiting_on.add(self.enqueue([controller.COMMANDS[com] for com in coms], coms, keys=tuple(missing)))
+        return waiting_on
+
+    def answer(self, keys, since, waiting_on, deadline):
+        """
+        Returns the values of `keys` once all were cached since `since`, or None while
+        they are still awaited (wait for on_change() and ask again). Raises
+        SerialException on a failed link or after `deadline`.
+        """
+        if all(self._is_fresh(key, since) for key in keys):
+            return [self.telemetry[key][1] for key in keys]
+        if self.error:
+            raise serial.SerialException(f"Device read failed ({', '.join(keys)}): {self.error}")
+        if time.monotonic() >= deadline:
+            QUERY_FAILURES.inc(port=self.controller.port_name, keys='+'.join(keys))
+            raise serial.SerialException(f"Device read failed ({', '.join(keys)}).")
+        if any(command.done.is_set() for command in waiting_on):
+            # Acknowledged without a usable reply (garbled line), ask again
+            QUERY_RETRIES.inc(port=self.controller.port_name, keys='+'.join(keys))
+            waiting_on.clear()
+            waiting_on.update(self.request(keys, since))
+        return None
+
+    def _is_fresh(self, key, since):
+        cached = self.telemetry.get(key)
+        return cached is not None and cached[0] >= since
+
 
 class HardwareController:
     """
     Manages the low-level serial communication with the Opentrons hardware.
+    All writes go through a single writer thread in priority order, one command
+    in flight at a time (urgent ones excepted), and all reads through a single
+    reader thread that correlates replies with the in-flight command (see
+    CommandChannel).
     """
     COMMANDS = {
         'open_lid': "M126",
@@ -32,43 +274,202 @@ class HardwareController:
         "exit_debug": "M111 S0"
     }
 
+    # Telemetry keys published by the reader thread, and the command that refreshes each
+    QUERIES = {
+        'lid': 'get_lid_temp',
+        'plate': 'get_plate_temp',
+        'info': 'device_info',
+    }
+    # Commands that jump the queue and skip the one-in-flight window (E-stop path)
+    URGENT_COMMANDS = {'deactivate_all', 'deactivate_heating', 'deactivate_lid', 'deactivate_block', 'deactivate_shake'}
+    # Queued setpoints each urgent command cancels, so they can't undo it once it has jumped ahead of them
+    CANCELS = {
+        'deactivate_all': {'set_lid_temp', 'set_plate_temp', 'set_shake_speed'},
+        'deactivate_heating': {'set_lid_temp', 'set_plate_temp'},
+        'deactivate_lid': {'set_lid_temp'},
+        'deactivate_block': {'set_plate_temp'},
+        'deactivate_shake': {'set_shake_speed'},
+    }
+    REPLY_TIMEOUT = 2.0
+
     def __init__(self):
         self.port = None
+        self.port_name = None
+        # Directory to record each connection's serial traffic in (see serial_trace);
+        # defaults to the HELIXCYCLER_SERIAL_TRACE environment variable
+        self.trace_dir = None
+        self._reader_thread = None
+        self._writer_thread = None
+        self._stop = threading.Event()
+        # The channel is guarded by _cond
+        self._cond = threading.Condition()
+        self._channel = None
 
     def connect(self, port_name):
         """
-        Connects to the specified serial port.
+        Connects to the specified serial port and starts the reader and writer threads.
+        Also accepts pyserial URLs (e.g. 'loop://', 'socket://host:port'),
+        'sim://[?speed=60&latency=0.005]' for the simulated device in tc_simulator.py
+        and 'replay://trace.hxtrace[?speed=10]' to play back a recorded serial trace.
+        With `trace_dir` set, all traffic is recorded there (see serial_trace).
         Returns True on success, False on failure.
         """
         try:
-            self.port = serial.Serial(port_name, baudrate=115200, timeout=2, write_timeout=2)
-            return True
+            self.port = self.open_port(port_name)
         except serial.SerialException as e:
             print(f"Error connecting to {port_name}: {e}")
             self.port = None
             return False
+        self.port = self.trace(self.port, port_name, self.trace_dir)
+        self.port_name = port_name
+        self._start_threads()
+        return True
+
+    @staticmethod
+    def open_port(port_name):
+        """Opens a serial port, pyserial URL, sim:// or replay:// URL (see connect)."""
+        if port_name.startswith('sim://'):
+            from tc_simulator import SimulatedSerial
+            return SimulatedSerial(port_name, baudrate=115200, timeout=2, write_timeout=2)
+        if port_name.startswith('replay://'):
+            from serial_trace import ReplaySerial
+            return ReplaySerial(port_name, baudrate=115200, timeout=2, write_timeout=2)
+        return serial.serial_for_url(port_name, baudrate=115200, timeout=2, write_timeout=2)
+
+    @staticmethod
+    def trace(port, port_name, trace_dir=None):
+        """Wraps `port` to record its traffic if tracing is on (see trace_dir)."""
+        trace_dir = trace_dir or os.environ.get('HELIXCYCLER_SERIAL_TRACE')
+        if not trace_dir:
+            return port
+        # Imported lazily, tracing is off by default
+        from serial_trace import trace_port
+        return trace_port(port, port_name, trace_dir)
 
     def disconnect(self):
-        """Closes the serial port connection."""
+        """Flushes queued commands, stops the I/O threads and closes the serial port."""
         if self.port and self.port.is_open:
+            channel = self._channel
+            # Let queued commands (e.g. a final deactivate_all) reach the device and be
+            # acknowledged first; one taken off the queue may not have been written yet
+            with self._cond:
+                self._cond.wait_for(lambda: not (channel.outbox or channel.in_flight) or channel.error,
+                                    timeout=self.REPLY_TIMEOUT)
+            self._stop.set()
+            with self._cond:
+                self._cond.notify_all()
             self.port.close()
+            for thread in (self._writer_thread, self._reader_thread):
+                if thread and thread is not threading.current_thread():
+                    thread.join(timeout=self.REPLY_TIMEOUT + 0.5)
+            self._reader_thread = self._writer_thread = None
+            with self._cond:
+                channel.fail(serial.SerialException("Disconnected."))
             self.port = None
             print("Disconnected.")
 
-    def _command(self, com, extra=''):
-        """Sends a command to the device."""
+    def _command(self, com, extra='', priority=None):
+        """
+        Queues a command for the device and returns its _Command handle.
+        Call .wait() on the handle to block until it is acknowledged.
+        """
+        return self._enqueue([f"{self.COMMANDS[com]}{extra}"], [com], priority)
+
+    def _commands(self, *coms, priority=None, keys=()):
+        """Queues several commands to be sent to the device in a single write."""
+        return self._enqueue([self.COMMANDS[com] for com in coms], coms, priority, keys)
+
+    def _enqueue(self, gcodes, coms, priority=None, keys=()):
         if not self.port or not self.port.is_open:
             print("Error: Not connected.")
-            return
-        string = f"\r\n{self.COMMANDS[com]}{extra}\r\n"
-        self.port.write(str.encode(string))
+            return None
+        with self._cond:
+            return self._channel.enqueue(gcodes, coms, priority, keys)
 
-    def _response(self):
-        """Reads a response from the device."""
-        if not self.port or not self.port.is_open:
-            return ""
-        string = str(self.port.readline().decode('utf-8'))
-        return string
+    @classmethod
+    def _priority_for(cls, coms):
+        if any(com in cls.URGENT_COMMANDS for com in coms):
+            return PRIORITY_URGENT
+        if all(com in cls.QUERIES.values() for com in coms):
+            return PRIORITY_POLL
+        return PRIORITY_NORMAL
+
+    @staticmethod
+    def _payload(gcodes):
+        return ''.join(f"\r\n{gcode}\r\n" for gcode in gcodes)
+
+    # --- I/O Threads ---
+
+    def _start_threads(self):
+        self._stop = threading.Event()
+        with self._cond:
+            self._channel = CommandChannel(self, _Command, self._cond.notify_all)
+        args = (self.port, self._channel, self._stop)
+        self._reader_thread = threading.Thread(target=self._reader_loop, args=args, daemon=True)
+        self._writer_thread = threading.Thread(target=self._writer_loop, args=args, daemon=True)
+        self._reader_thread.start()
+        self._writer_thread.start()
+
+    def _writer_loop(self, port, channel, stop_event):
+        """Writes queued commands in priority order, waiting for each to be acknowledged."""
+        while True:
+            with self._cond:
+                while True:
+                    if stop_event.is_set() or channel.error:
+                        return
+                    command = channel.next_to_write()
+                    if command:
+                        break
+                    self._cond.wait(channel.write_timeout())
+            try:
+                data = str.encode(command.payload)
+                port.write(data)
+                BYTES_WRITTEN.inc(len(data), port=self.port_name)
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                if not stop_event.is_set():
+                    print(f"Serial write failed: {e}")
+                    WRITE_ERRORS.inc(port=self.port_name)
+                with self._cond:
+                    channel.write_failed(command, e)
+
+    def _reader_loop(self, port, channel, stop_event):
+        """Reads every line the device sends and hands it to the channel."""
+        while not stop_event.is_set():
+            try:
+                data = port.readline()
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                # TypeError/AttributeError: pyserial raises these when the port is closed under it
+                if not stop_event.is_set():
+                    print(f"Serial reader stopped: {e}")
+                with self._cond:
+                    channel.fail(e)
+                return
+            if data and not data.endswith(b'\n'):
+                # readline() timed out mid-line, the channel keeps the fragment for the next read
+                PARTIAL_READS.inc(port=self.port_name)
+            with self._cond:
+                channel.feed(data)
+
+    def _query(self, *keys, max_age=None):
+        """
+        Returns the latest values for the given telemetry keys.
+        Values cached less than `max_age` seconds ago are returned without any serial
+        traffic; the rest are requested in one write (or picked up from a query already
+        queued by another thread) and awaited from the reader thread.
+        """
+        requested = time.monotonic()
+        since = requested - max_age if max_age is not None else requested
+        deadline = requested + self.REPLY_TIMEOUT
+        with self._cond:
+            channel = self._channel
+            if channel is None or channel.error or not self._reader_thread:
+                raise serial.SerialException("Device read failed (not connected).")
+            waiting_on = channel.request(keys, since)
+            while True:
+                values = channel.answer(keys, since, waiting_on, deadline)
+                if values is not None:
+                    return values
+                self._cond.wait(deadline - time.monotonic())
 
     @staticmethod
     def get_available_ports():
@@ -81,6 +482,44 @@ class HardwareController:
             return ["No Ports Found"]
         return [port.device for port in ports]
 
+    @classmethod
+    def _parse_reply(cls, line):
+        """
+        Classifies a reply line into a telemetry (key, value) pair.
+        Returns (None, None) for acks, unknown and garbled lines.
+        """
+        try:
+            if line.startswith('T') and ' H:' in line:
+                return 'plate', cls._parse_plate_line(line)
+            elif line.startswith('T'):
+                return 'lid', cls._parse_lid_line(line)
+            elif line.startswith('FW:'):
+                return 'info', cls._parse_info_line(line)
+        except (IndexError, ValueError, TypeError):
+            # Garbled reply; the waiting caller resends once the command is acknowledged
+            pass
+        return None, None
+
+    @staticmethod
+    def _parse_lid_line(line):
+        """Parses a lid reply 'T:<target> C:<current>' into the current temperature."""
+        return float(line.split('C:', 1)[1])
+
+    @staticmethod
+    def _parse_plate_line(line):
+        """Parses a plate reply 'T:<target> C:<current> H:<secs>' into [current, secs_left]."""
+        current_temp = line.split('C:', 1)[1].split(' H:', 1)[0]
+        seconds_left = line.split('H:', 1)[1].strip()
+        return [float(current_temp), seconds_left]
+
+    @staticmethod
+    def _parse_info_line(line):
+        """Parses an M115 reply 'FW:<version> HW:<model> SerialNo:<serial>' into a dict."""
+        info = dict(field.split(':', 1) for field in line.split())
+        if 'FW' not in info:
+            raise ValueError(f"Not a device info line: {line!r}")
+        return info
+
     # --- Public Hardware Commands ---
 
     def open_lid(self):
@@ -89,61 +528,41 @@ class HardwareController:
     def close_lid(self):
         self._command('close_lid')
 
-    def get_lid_temperature(self):
-        self._command('get_lid_temp')
-        port_readline = self._response()
-        temp_received = False
-        while not temp_received:
-            try:
-                if port_readline.startswith('T') and ' H:' not in port_readline:
-                    current_temp = port_readline.split('C:', 1)[1]
-                    lid_temp = float(current_temp)
-                    temp_received = True
-                    self.port.reset_input_buffer()
-                else:
-                    port_readline = self._response()
-                    if not port_readline:
-                        raise serial.SerialException("Device read failed (lid temp).")
-            except (IndexError, ValueError, TypeError):
-                self._command('get_lid_temp') 
-                port_readline = self._response()
-                if not port_readline:
-                    raise serial.SerialException("Device read failed (lid temp retry).")
-                continue 
-        return lid_temp
-
-    def get_plate_info(self):
-        self._command('get_plate_temp')
-        port_readline = self._response()
-        temp_received = False
-        while not temp_received:
-            try:
-                if port_readline.startswith('T') and ' H:' in port_readline:
-                    current_temp = port_readline.split('C:', 1)[1].split(' H:', 1)[0]
-                    seconds_left = port_readline.split('H:', 1)[1].split('\r', 1)[0]
-                    plate_temp = float(current_temp)
-                    temp_received = True
-                    self.port.reset_input_buffer()
-                else:
-                    port_readline = self._response()
-                    if not port_readline:
-                        raise serial.SerialException("Device read failed (plate info).")
-            except (IndexError, ValueError, TypeError):
-                self._command('get_plate_temp')
-                port_readline = self._response()
-                if not port_readline:
-                    raise serial.SerialException("Device read failed (plate info retry).")
-                continue 
-        return [plate_temp, seconds_left]
+    def get_lid_temperature(self, max_age=None):
+        """
+        Returns the lid temperature. With `max_age` (seconds), a cached reading that
+        recent is returned immediately instead of querying the device.
+        """
+        return self._query('lid', max_age=max_age)[0]
+
+    def get_plate_info(self, max_age=None):
+        """Returns [plate_temp, seconds_left]; see get_lid_temperature for `max_age`."""
+        return list(self._query('plate', max_age=max_age)[0])
+
+    def get_status(self, max_age=None):
+        """
+        Queries lid and plate in one write and waits for both replies.
+        Returns [lid_temp, plate_temp, seconds_left].
+        """
+        lid_temp, plate_info = self._query('lid', 'plate', max_age=max_age)
+        return [lid_temp, plate_info[0], plate_info[1]]
+
+    def get_device_info(self, max_age=None):
+        """Returns the M115 device info as a dict with 'FW', 'HW' and 'SerialNo' keys."""
+        return dict(self._query('info', max_age=max_age)[0])
 
     def set_lid_temperature(self, temp):
         self._command('set_lid_temp', ' S' + str(temp))
 
     def set_plate_temperature(self, target, time_val=None, well_vol=None):
+        self._command("set_plate_temp", self._plate_args(target, time_val, well_vol))
+
+    @staticmethod
+    def _plate_args(target, time_val=None, well_vol=None):
         temp_string = ' S' + str(target)
         time_string = f' H{time_val}' if time_val is not None else ''
         vol_string = f' V{well_vol}' if well_vol is not None else ''
-        self._command("set_plate_temp", temp_string + time_string + vol_string)
+        return temp_string + time_string + vol_string
 
     def deactivate_shaker(self):
         self._command('deactivate_shake')
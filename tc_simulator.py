@@ -0,0 +1,371 @@
+import collections
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from serial.serialutil import SerialBase, SerialException, PortNotOpenError
+
+AMBIENT_TEMP = 23.0
+SUBSTEP_SEC = 0.25
+
+
+class SimClock:
+    """
+    Simulated device clock. Runs `speed` times faster than wall time so long
+    protocols can be replayed in seconds.
+    """
+    def __init__(self, speed=1.0):
+        self.speed = float(speed)
+        self._real_start = time.monotonic()
+
+    def now(self):
+        return (time.monotonic() - self._real_start) * self.speed
+
+
+class ThermalZone:
+    """
+    First-order thermal model of a heated zone (lid or plate).
+    Approaches the target with time constant `tau`, limited by the maximum
+    heating and cooling ramp rates (°C/s). With no target it drifts back to
+    ambient with `passive_tau`.
+    """
+    def __init__(self, heat_rate, cool_rate, tau, passive_tau, ambient=AMBIENT_TEMP):
+        self.heat_rate = heat_rate
+        self.cool_rate = cool_rate
+        self.tau = tau
+        self.passive_tau = passive_tau
+        self.ambient = ambient
+        self.temp = ambient
+        self.target = None
+
+    def advance(self, dt):
+        if self.target is not None:
+            goal, tau = self.target, self.tau
+        else:
+            goal, tau = self.ambient, self.passive_tau
+        error = goal - self.temp
+        rate = error / tau
+        rate = max(-self.cool_rate, min(self.heat_rate, rate))
+        step = rate * dt
+        if abs(step) >= abs(error):
+            self.temp = goal
+        else:
+            self.temp += step
+
+
+class SimulatedThermocycler:
+    """
+    Stand-in for the Opentrons thermocycler firmware.
+    Speaks the G-code subset used by HardwareController and replies with the
+    same 'T:... C:... H:...' line formats, followed by 'ok'.
+    """
+    def __init__(self, clock=None, plate_heat_rate=4.0, plate_cool_rate=2.0,
+                 lid_heat_rate=0.5, hold_tolerance=0.5, noise=0.0, seed=None,
+                 serial_number="SIM00000001"):
+        self.clock = clock or SimClock()
+        self.plate = ThermalZone(plate_heat_rate, plate_cool_rate, tau=2.0, passive_tau=60.0)
+        # The lid has no active cooling, only passive losses to ambient.
+        self.lid = ThermalZone(lid_heat_rate, 0.05, tau=5.0, passive_tau=120.0)
+        self.hold_tolerance = hold_tolerance
+        self.noise = noise
+        self.serial_number = serial_number
+        self.lid_open = False
+        self.hold_remaining = None
+        self.command_counts = collections.Counter()
+        self._rng = random.Random(seed)
+        self._last_update = self.clock.now()
+        self._lock = threading.Lock()
+
+    def _advance(self):
+        now = self.clock.now()
+        elapsed = now - self._last_update
+        self._last_update = now
+        while elapsed > 0:
+            dt = min(elapsed, SUBSTEP_SEC)
+            self.plate.advance(dt)
+            self.lid.advance(dt)
+            if (self.hold_remaining is not None and self.plate.target is not None
+                    and abs(self.plate.temp - self.plate.target) <= self.hold_tolerance):
+                self.hold_remaining = max(0.0, self.hold_remaining - dt)
+            elapsed -= dt
+
+    def _reading(self, zone):
+        temp = zone.temp
+        if self.noise:
+            temp += self._rng.gauss(0, self.noise)
+        return round(temp, 3)
+
+    @staticmethod
+    def _format(value):
+        return 'none' if value is None else f'{value:g}'
+
+    @staticmethod
+    def _params(args):
+        """Parses 'S95 H30 V20' into {'S': 95.0, 'H': 30.0, 'V': 20.0}."""
+        params = {}
+        for arg in args:
+            try:
+                params[arg[0].upper()] = float(arg[1:])
+            except (IndexError, ValueError):
+                continue
+        return params
+
+    def handle(self, line):
+        """Executes one G-code line and returns the list of reply lines."""
+        parts = line.strip().split()
+        if not parts:
+            return []
+        code, params = parts[0].upper(), self._params(parts[1:])
+        with self._lock:
+            self._advance()
+            self.command_counts[code] += 1
+            replies = []
+            if code == 'M141':
+                replies.append(f'T:{self._format(self.lid.target)} C:{self._reading(self.lid)}')
+            elif code == 'M105':
+                replies.append(f'T:{self._format(self.plate.target)} C:{self._reading(self.plate)} '
+                               f'H:{self._format(self.hold_remaining)}')
+            elif code == 'M140':
+                self.lid.target = params.get('S')
+            elif code == 'M104':
+                self.plate.target = params.get('S')
+                self.hold_remaining = params.get('H')
+            elif code == 'M18':
+                self.plate.target = None
+                self.lid.target = None
+                self.hold_remaining = None
+            elif code == 'M14':
+                self.plate.target = None
+                self.hold_remaining = None
+            elif code == 'M108':
+                self.lid.target = None
+            elif code == 'M126':
+                self.lid_open = True
+            elif code == 'M127':
+                self.lid_open = False
+            elif code == 'M119':
+                replies.append(f"Lid:{'open' if self.lid_open else 'closed'}")
+            elif code == 'M115':
+                replies.append(f'FW:v1.0.2-sim HW:Thermocycler_v02 SerialNo:{self.serial_number}')
+            replies.append('ok')
+            return replies
+
+
+class SimulatedSerial(SerialBase):
+    """
+    pyserial-compatible transport backed by a SimulatedThermocycler.
+    Open it with a URL such as 'sim://?speed=60&latency=0.005&jitter=0.002&seed=1'
+    (see HardwareController.connect), or pass a ready-made `device`.
+    Latency and jitter are in real seconds and delay each reply line.
+    """
+    def __init__(self, *args, device=None, latency=0.0, jitter=0.0, seed=None, **kwargs):
+        self.device = device
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._rx = bytearray()
+        self._pending = collections.deque()
+        self._line_buffer = b''
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        if self._port is None:
+            raise SerialException("Port must be configured before it can be used.")
+        if self.is_open:
+            raise SerialException("Port is already open.")
+        if self.device is None:
+            self._configure_from_url(self._port)
+        self.is_open = True
+
+    def _configure_from_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme != 'sim':
+            raise SerialException(f'expected a string in the form "sim://[?options]": not starting with sim:// ({url!r})')
+        options = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        try:
+            seed = int(options['seed']) if 'seed' in options else None
+            self.latency = float(options.get('latency', self.latency))
+            self.jitter = float(options.get('jitter', self.jitter))
+            self._rng = random.Random(seed)
+            self.device = SimulatedThermocycler(clock=SimClock(float(options.get('speed', 1.0))),
+                                                noise=float(options.get('noise', 0.0)),
+                                                seed=seed)
+        except ValueError as e:
+            raise SerialException(f'invalid sim:// option in {url!r}: {e}')
+
+    def _reconfigure_port(self):
+        pass
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+    def _collect_ready(self):
+        now = time.monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            self._rx += self._pending.popleft()[1]
+
+    def _wait(self, done, deadline):
+        """Waits on the condition until done() is true, the port closes or the deadline passes."""
+        while True:
+            self._collect_ready()
+            if done() or not self.is_open:
+                return
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return
+            wake = self._pending[0][0] if self._pending else None
+            if deadline is not None:
+                wake = deadline if wake is None else min(wake, deadline)
+            self._cond.wait(None if wake is None else max(0.0, wake - now))
+
+    def _deadline(self):
+        return None if self._timeout is None else time.monotonic() + self._timeout
+
+    @property
+    def in_waiting(self):
+        with self._cond:
+            self._collect_ready()
+            return len(self._rx)
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self._cond:
+            self._wait(lambda: len(self._rx) >= size, self._deadline())
+            data = bytes(self._rx[:size])
+            del self._rx[:size]
+            return data
+
+    def readline(self, size=-1):
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self._cond:
+            self._wait(lambda: b'\n' in self._rx, self._deadline())
+            end = self._rx.find(b'\n') + 1 or len(self._rx)
+            if size is not None and size >= 0:
+                end = min(end, size)
+            data = bytes(self._rx[:end])
+            del self._rx[:end]
+            return data
+
+    def write(self, data):
+        if not self.is_open:
+            raise PortNotOpenError()
+        data = bytes(data)
+        with self._cond:
+            self._line_buffer += data.replace(b'\r', b'\n')
+            *lines, self._line_buffer = self._line_buffer.split(b'\n')
+            ready_at = time.monotonic()
+            for line in lines:
+                replies = self.device.handle(line.decode('ascii', 'replace'))
+                if not replies:
+                    continue
+                # Replies never overtake earlier ones, even with jitter.
+                ready_at = max(ready_at, time.monotonic() + self.latency + self._rng.uniform(0, self.jitter))
+                self._pending.append((ready_at, ''.join(f'{r}\r\n' for r in replies).encode()))
+            self._cond.notify_all()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self._cond:
+            self._collect_ready()
+            self._rx.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+
+def serve_pty(device, latency=0.0):
+    """
+    Exposes the simulator on a pseudo-terminal (POSIX only) so the GUI can
+    connect to it like a real port, e.g. `python helixcycler.py /dev/pts/5`.
+    """
+    import pty
+    import tty
+    import select
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    print(f"Simulated thermocycler on {os.ttyname(slave)} (speed x{device.clock.speed:g}). Ctrl+C to stop.")
+    line_buffer = b''
+    try:
+        while True:
+            select.select([master], [], [])
+            line_buffer += os.read(master, 1024).replace(b'\r', b'\n')
+            *lines, line_buffer = line_buffer.split(b'\n')
+            for line in lines:
+                replies = device.handle(line.decode('ascii', 'replace'))
+                if replies:
+                    if latency:
+                        time.sleep(latency)
+                    os.write(master, ''.join(f'{r}\r\n' for r in replies).encode())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(slave)
+        os.close(master)
+
+
+def bench(protocol_path, url, fixed_rate=False):
+    """
+    Runs a protocol CSV against the simulator and reports run duration and
+    poll throughput. END&GRAPH holds indefinitely, so it is left out.
+    By default the run's adaptive poll intervals are scaled by the clock speed, so
+    the poll count matches a real-time run; `fixed_rate` polls as fast as possible.
+    """
+    from tc_send_code import HardwareController
+    from protocol_manager import run_protocol, protocol_dict
+
+    controller = HardwareController()
+    if not controller.connect(url):
+        return 1
+    prot_dict = protocol_dict(protocol_path)
+    for stage in prot_dict:
+        prot_dict[stage] = [step for step in prot_dict[stage] if step != ['END&GRAPH']]
+    device = controller.port.device
+    ignore = lambda text: None
+    if fixed_rate:
+        update_sec = max_update_sec = 0.0
+    else:
+        update_sec, max_update_sec = 0.1 / device.clock.speed, 2.0 / device.clock.speed
+    real_start, sim_start = time.monotonic(), device.clock.now()
+    run_protocol(controller, prot_dict, ignore, ignore, ignore, ignore,
+                 threading.Event(), 'bench', update_sec=update_sec, max_update_sec=max_update_sec)
+    real_elapsed = time.monotonic() - real_start
+    sim_elapsed = device.clock.now() - sim_start
+    polls = device.command_counts['M105']
+    controller.disconnect()
+    print(f"Simulated run time: {sim_elapsed / 60:.1f} min")
+    print(f"Real run time: {real_elapsed:.2f} s")
+    print(f"Plate polls: {polls} ({polls / real_elapsed:.0f}/s)")
+    print(f"Commands: {dict(device.command_counts)}")
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated Opentrons thermocycler.")
+    parser.add_argument('--speed', type=float, default=1.0, help="Clock acceleration factor.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Reply latency in seconds.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random reply latency in seconds.")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--bench', metavar='PROTOCOL_CSV', help="Run a protocol against the simulator and report timings.")
+    parser.add_argument('--fixed-rate', action='store_true', help="With --bench, poll as fast as possible instead of adaptively.")
+    args = parser.parse_args()
+
+    if args.bench:
+        seed = '' if args.seed is None else f'&seed={args.seed}'
+        sys.exit(bench(args.bench, f'sim://?speed={args.speed}&latency={args.latency}&jitter={args.jitter}{seed}', args.fixed_rate))
+    serve_pty(SimulatedThermocycler(clock=SimClock(args.speed), seed=args.seed), latency=args.latency)
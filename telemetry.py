@@ -0,0 +1,207 @@
+import json
+import os
+import pathlib
+import queue
+import threading
+import time as time_module
+
+import numpy as np
+
+
+class TelemetryBuffer:
+    """
+    Compact columnar store for run telemetry, one typed array per column.
+
+    Appends and latest() are O(1). The buffer is preallocated and doubles when
+    full, or, with `ring=True`, keeps only the newest `capacity` samples.
+    Columns are returned oldest-first by column()/columns().
+    """
+    COLUMNS = {
+        'time': np.float64,      # minutes since run start
+        'lid': np.float32,       # °C
+        'plate': np.float32,     # °C
+        'setpoint': np.float32,  # plate target °C, NaN when unknown
+        'stage': np.uint16,
+        'cycle': np.uint32,
+        'step': np.uint16,
+    }
+
+    def __init__(self, capacity=4096, ring=False, sink=None):
+        self.capacity = max(1, int(capacity))
+        # Optional object whose append(time, lid, plate, setpoint, stage, cycle, step)
+        # receives every sample, e.g. a RunLogWriter
+        self.sink = sink
+        self.ring = ring
+        self._data = {name: np.zeros(self.capacity, dtype) for name, dtype in self.COLUMNS.items()}
+        self._count = 0  # total samples ever appended
+        self.position = (0, 0, 0)  # (stage, cycle, step) stamped on new samples
+
+    def __len__(self):
+        return min(self._count, self.capacity) if self.ring else self._count
+
+    def set_position(self, stage, cycle, step):
+        """Sets the protocol position recorded with subsequent samples."""
+        self.position = (stage, cycle, step)
+
+    def append(self, time, lid, plate, setpoint=None):
+        if self._count >= self.capacity and not self.ring:
+            self._grow()
+        index = self._count % self.capacity
+        stage, cycle, step = self.position
+        row = self._data
+        row['time'][index] = time
+        row['lid'][index] = lid
+        row['plate'][index] = plate
+        row['setpoint'][index] = np.nan if setpoint is None else setpoint
+        row['stage'][index] = stage
+        row['cycle'][index] = cycle
+        row['step'][index] = step
+        self._count += 1
+        if self.sink is not None:
+            self.sink.append(time, lid, plate, setpoint, stage, cycle, step)
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, column in self._data.items():
+            grown = np.zeros(self.capacity, column.dtype)
+            grown[:len(column)] = column
+            self._data[name] = grown
+
+    def latest(self):
+        """Returns the newest sample as a dict, or None if the buffer is empty."""
+        if not self._count:
+            return None
+        index = (self._count - 1) % self.capacity
+        return {name: column[index].item() for name, column in self._data.items()}
+
+    def column(self, name):
+        """Returns one column, oldest sample first (a view unless the ring has wrapped)."""
+        column = self._data[name]
+        if not self.ring or self._count <= self.capacity:
+            return column[:len(self)]
+        start = self._count % self.capacity
+        return np.concatenate((column[start:], column[:start]))
+
+    def columns(self):
+        return {name: self.column(name) for name in self.COLUMNS}
+
+
+class TeeSink:
+    """TelemetryBuffer sink that forwards every sample to several sinks."""
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def append(self, *sample):
+        for sink in self.sinks:
+            sink.append(*sample)
+
+
+def minmax_indices(x, y, buckets):
+    """
+    Indices of a shape-preserving subset of the series (x ascending) for plotting:
+    the first, last, minimum and maximum sample of each of `buckets` equal-width x
+    intervals, so peaks and step edges survive. At most 2 * buckets + 2 indices.
+    """
+    n = len(x)
+    if n <= 2 * buckets + 2:
+        return np.arange(n)
+    starts = np.unique(np.searchsorted(x, np.linspace(x[0], x[-1], buckets, endpoint=False)))
+    counts = np.diff(np.append(starts, n))
+    bucket_of = np.repeat(np.arange(len(starts)), counts)
+    picked = [np.array([0, n - 1])]
+    for reduce in (np.fmin, np.fmax):
+        extreme = reduce.reduceat(y, starts)
+        hits = np.flatnonzero(y == extreme[bucket_of])
+        # First hit per bucket (buckets with only NaNs have none)
+        _, first = np.unique(bucket_of[hits], return_index=True)
+        picked.append(hits[first])
+    return np.unique(np.concatenate(picked))
+
+
+# --- Crash-safe per-run log ---
+#
+# File layout: the MAGIC line, one JSON header line, then fixed-size little-endian
+# records (RECORD_DTYPE) appended for every sample. A crash can at worst leave a
+# partial last record, which read_run_log() ignores.
+
+MAGIC = b'HXLOG1\n'
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('lid', '<f4'),
+    ('plate', '<f4'),
+    ('setpoint', '<f4'),
+    ('stage', '<u2'),
+    ('cycle', '<u4'),
+    ('step', '<u2'),
+])
+
+
+class RunLogWriter:
+    """
+    Streams telemetry samples to an append-only run log from a background thread,
+    so append() never blocks the poll loop on disk. Buffered records are written
+    every `flush_interval` seconds and fsync'd every `fsync_interval` seconds.
+    Usable as a TelemetryBuffer sink.
+    """
+    def __init__(self, path, header, flush_interval=0.5, fsync_interval=5.0):
+        self.path = pathlib.Path(path)
+        self.header = dict(header, columns=RECORD_DTYPE.names)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self._queue = queue.SimpleQueue()
+        self._file = open(self.path, 'xb')
+        self._file.write(MAGIC + json.dumps(self.header).encode('utf-8') + b'\n')
+        self._file.flush()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def append(self, time, lid, plate, setpoint, stage, cycle, step):
+        self._queue.put((time, lid, plate, np.nan if setpoint is None else setpoint, stage, cycle, step))
+
+    def close(self):
+        """Writes out everything queued, fsyncs and closes the file."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _writer_loop(self):
+        last_fsync = time_module.monotonic()
+        closing = False
+        while not closing:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    self._file.write(np.array(batch, dtype=RECORD_DTYPE).tobytes())
+                    self._file.flush()
+                now = time_module.monotonic()
+                if closing or now - last_fsync >= self.fsync_interval:
+                    os.fsync(self._file.fileno())
+                    last_fsync = now
+            except OSError as e:
+                print(f"Run log write failed ({self.path}): {e}")
+        self._file.close()
+
+
+def read_run_log(path):
+    """
+    Opens a run log without loading it: returns (header, records), where records is
+    a read-only memory-mapped structured array with RECORD_DTYPE fields.
+    """
+    with open(path, 'rb') as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"{path} is not a HelixCycler run log.")
+        header = json.loads(f.readline())
+        offset = f.tell()
+    count = (os.path.getsize(path) - offset) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return header, np.zeros(0, RECORD_DTYPE)
+    return header, np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=offset, shape=(count,))
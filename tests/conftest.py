@@ -0,0 +1,25 @@
+import pathlib
+import sys
+
+import pytest
+
+# The modules live at the repository root, not in a package
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from tc_send_code import HardwareController
+
+
+@pytest.fixture
+def connect():
+    """Returns a function that connects a HardwareController to a URL; all are disconnected afterwards."""
+    controllers = []
+
+    def connect(url='sim://?speed=100'):
+        controller = HardwareController()
+        assert controller.connect(url)
+        controllers.append(controller)
+        return controller
+
+    yield connect
+    for controller in controllers:
+        controller.disconnect()
@@ -0,0 +1,84 @@
+import http.client
+import json
+import pathlib
+import threading
+
+import pytest
+
+from api_server import ApiServer
+
+EXAMPLE = pathlib.Path(__file__).resolve().parent.parent / 'HelixCycler_PCR_example.csv'
+
+
+@pytest.fixture
+def api(tmp_path):
+    server = ApiServer(('127.0.0.1', 0), log_dir=tmp_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(method, path, body=None):
+        connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+        data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode()
+        connection.request(method, path, body=data)
+        response = connection.getresponse()
+        result = response.status, json.loads(response.read())
+        connection.close()
+        return result
+
+    yield server, request
+    server.shutdown()
+    server.close_all()
+    server.server_close()
+
+
+def open_device(request):
+    status, device = request('POST', '/devices', {'port': 'sim://?speed=100'})
+    assert status == 201
+    return f"/devices/{device['id']}"
+
+
+def test_setpoints_outside_the_device_range_are_rejected(api):
+    server, request = api
+    device = open_device(request)
+    simulated = next(iter(server.sessions.values())).controller.port.device
+    assert request('POST', f'{device}/lid', {'temp': 150})[0] == 400
+    assert request('POST', f'{device}/plate', {'temp': -40})[0] == 400
+    assert request('POST', f'{device}/plate', {'temp': 60, 'hold': -5})[0] == 400
+    assert request('POST', f'{device}/lid', {'temp': 'hot'})[0] == 400
+    assert request('POST', f'{device}/plate', {'temp': 60, 'hold': 30})[0] == 200
+    assert request('POST', f'{device}/lid', {'temp': 105})[0] == 200
+    assert request('GET', device)[0] == 200
+    # A poll queues behind the setpoints, so they have been acknowledged once it returns
+    next(iter(server.sessions.values())).controller.get_status()
+    assert simulated.plate.target == 60 and simulated.lid.target == 105
+
+
+def test_only_one_of_several_concurrent_starts_runs(api):
+    server, request = api
+    device = open_device(request)
+    assert request('PUT', f'{device}/protocol?name=pcr.csv', EXAMPLE.read_bytes())[0] == 200
+    statuses = []
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        statuses.append(request('POST', f'{device}/start', {'title': 'race'})[0])
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [200] + [409] * 7
+    assert request('PUT', f'{device}/protocol?name=pcr.csv', EXAMPLE.read_bytes())[0] == 409
+    assert request('POST', f'{device}/stop')[0] == 200
+    session = next(iter(server.sessions.values()))
+    session.run_thread.join(5)
+    assert not session.running
+    session.controller.get_status()
+    assert session.controller.port.device.plate.target is None
+
+
+def test_unknown_device_and_endpoint(api):
+    server, request = api
+    assert request('GET', '/devices/42')[0] == 404
+    assert request('GET', '/nothing')[0] == 404
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import serial
+
+from tc_async import AsyncHardwareController
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_status_replies_are_matched_to_queries(connect):
+    controller = connect()
+    device = controller.port.device
+    controller.set_plate_temperature(60, 30)
+    lid, plate, seconds_left = controller.get_status()
+    assert device.plate.target == 60
+    assert isinstance(lid, float) and isinstance(plate, float)
+    assert float(seconds_left) <= 30
+    assert controller.get_device_info()['SerialNo'] == device.serial_number
+
+
+def test_cached_values_are_reused_within_max_age(connect):
+    controller = connect()
+    device = controller.port.device
+    controller.get_status()
+    controller.get_status(max_age=60)
+    controller.get_plate_info(max_age=60)
+    assert device.command_counts['M105'] == 1
+    controller.get_status()
+    assert device.command_counts['M105'] == 2
+
+
+def test_deactivate_cancels_setpoints_queued_behind_a_poll(connect):
+    # Slow replies keep the poll in flight while the setpoints queue up behind it
+    controller = connect('sim://?speed=100&latency=0.3')
+    device = controller.port.device
+    poll = threading.Thread(target=controller.get_status)
+    poll.start()
+    wait_until(lambda: controller._channel.in_flight)
+    controller.set_lid_temperature(105)
+    controller.set_plate_temperature(95, 30)
+    controller.deactivate_all()
+    poll.join()
+    controller.disconnect()
+    assert device.command_counts['M18'] == 1
+    assert device.command_counts['M140'] == 0 and device.command_counts['M104'] == 0
+    assert device.lid.target is None and device.plate.target is None
+
+
+def test_deactivate_lid_keeps_queued_plate_setpoint(connect):
+    controller = connect('sim://?speed=100&latency=0.3')
+    device = controller.port.device
+    poll = threading.Thread(target=controller.get_status)
+    poll.start()
+    wait_until(lambda: controller._channel.in_flight)
+    controller.set_lid_temperature(105)
+    controller.set_plate_temperature(95, 30)
+    controller.deactivate_lid()
+    poll.join()
+    controller.disconnect()
+    assert device.lid.target is None
+    assert device.plate.target == 95
+
+
+def test_setpoints_after_deactivate_are_sent(connect):
+    controller = connect()
+    device = controller.port.device
+    controller.deactivate_all()
+    controller.set_plate_temperature(50)
+    controller.get_status()
+    assert device.plate.target == 50
+
+
+def test_unacknowledged_query_times_out():
+    # loop:// echoes the command back, which is never an 'ok'
+    from tc_send_code import HardwareController
+    controller = HardwareController()
+    controller.REPLY_TIMEOUT = 0.2
+    assert controller.connect('loop://')
+    try:
+        with pytest.raises(serial.SerialException):
+            controller.get_lid_temperature()
+    finally:
+        controller.disconnect()
+
+
+def test_async_deactivate_cancels_queued_setpoints():
+    async def run():
+        controller = AsyncHardwareController()
+        assert await controller.connect('sim://?speed=100&latency=0.3')
+        device = controller.port.device
+        poll = asyncio.ensure_future(controller.get_status())
+        while not controller._channel.in_flight:
+            await asyncio.sleep(0.005)
+        lid = await controller.set_lid_temperature(105)
+        plate = await controller.set_plate_temperature(95, 30)
+        await (await controller.deactivate_all()).wait(2.0)
+        await poll
+        for command in (lid, plate):
+            with pytest.raises(serial.SerialException):
+                await command.wait(0)
+        await controller.disconnect()
+        return device
+
+    device = asyncio.run(run())
+    assert device.lid.target is None and device.plate.target is None
+    assert device.command_counts['M140'] == 0 and device.command_counts['M104'] == 0
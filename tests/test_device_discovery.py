@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+import pytest
+
+import device_discovery
+from device_discovery import DeviceCache, RETRY_SEC, discover
+
+PortInfo = namedtuple('PortInfo', 'device vid pid serial_number hwid description')
+THERMOCYCLER = (0x239A, 0x800C)
+SILENT = 'sim://?latency=2'  # answers long after the probe timeout
+
+
+def port(device, usb_serial, ids=THERMOCYCLER, description='Thermocycler'):
+    return PortInfo(device, *ids, usb_serial, f'USB VID:PID={ids[0]:04X}:{ids[1]:04X} SER={usb_serial}', description)
+
+
+@pytest.fixture
+def ports(monkeypatch):
+    """The faked serial port list, and the ports probed so far."""
+    listed, probed = [], []
+    real_probe = device_discovery.probe
+
+    def probe(port_name, timeout):
+        probed.append(port_name)
+        return real_probe(port_name, timeout)
+
+    monkeypatch.setattr(device_discovery.serial.tools.list_ports, 'comports', lambda: list(listed))
+    monkeypatch.setattr(device_discovery, 'probe', probe)
+    monkeypatch.delenv('HELIXCYCLER_USB_IDS', raising=False)
+    return listed, probed
+
+
+def test_only_ports_with_thermocycler_usb_ids_are_probed(ports):
+    listed, probed = ports
+    listed[:] = [port('sim://?seed=2', 'A1'), port('sim://?seed=1', 'B2', ids=(0x2341, 0x0043), description='Arduino')]
+    cache = DeviceCache(path=None)
+    devices = discover(cache=cache, timeout=0.3)
+    assert probed == ['sim://?seed=2']
+    assert [(device.port, device.serial_number) for device in devices] == [('sim://?seed=2', 'SIM00000001')]
+
+    devices = discover(all_ports=True, cache=DeviceCache(path=None), timeout=0.3)
+    assert [(device.port, device.serial_number, device.description) for device in devices] == [
+        ('sim://?seed=1', None, 'Arduino'), ('sim://?seed=2', 'SIM00000001', 'Thermocycler')]
+    assert probed == ['sim://?seed=2', 'sim://?seed=2']
+
+
+def test_busy_ports_are_listed_but_never_probed(ports):
+    listed, probed = ports
+    listed[:] = [port('sim://?seed=1', 'A1')]
+    devices = discover(busy={'sim://?seed=1'}, cache=DeviceCache(path=None), timeout=0.3)
+    assert probed == []
+    assert [(device.port, device.model) for device in devices] == [('sim://?seed=1', None)]
+
+
+def test_cache_recognises_a_device_on_another_port_by_usb_serial(ports, tmp_path):
+    listed, probed = ports
+    path = tmp_path / 'device_cache.json'
+    listed[:] = [port('sim://?seed=1', 'A1')]
+    discover(cache=DeviceCache(path), timeout=0.3)
+    assert probed == ['sim://?seed=1']
+
+    # Replugged on another port; a fresh cache reads the identity back from disk
+    listed[:] = [port('sim://?seed=2', 'A1')]
+    devices = discover(cache=DeviceCache(path), timeout=0.3)
+    assert probed == ['sim://?seed=1']
+    assert devices[0].port == 'sim://?seed=2' and devices[0].model == 'Thermocycler_v02'
+
+    devices = discover(cache=DeviceCache(path), refresh=True, timeout=0.3)
+    assert probed == ['sim://?seed=1', 'sim://?seed=2']
+
+
+def test_devices_that_did_not_answer_are_retried_after_the_backoff(ports):
+    listed, probed = ports
+    listed[:] = [port(SILENT, 'S1')]
+    cache = DeviceCache(path=None)
+    assert discover(cache=cache, timeout=0.3)[0].model is None
+    discover(cache=cache, timeout=0.3)
+    assert probed == [SILENT]
+    discover(cache=cache, retry_failed=True, timeout=0.3)
+    assert probed == [SILENT, SILENT]
+
+    # RETRY_SEC later
+    cache._unanswered['S1'] -= RETRY_SEC
+    assert not cache.recently_failed('S1')
+    discover(cache=cache, timeout=0.3)
+    assert probed == [SILENT, SILENT, SILENT]
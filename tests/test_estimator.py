@@ -0,0 +1,63 @@
+import pytest
+
+from estimator import RampModel, RunEstimate, estimate_run
+from telemetry import TelemetryBuffer
+
+
+def synthetic_run(targets, heat_rate, heat_lag, cool_rate, cool_lag, hold_sec=5.0, sample_sec=0.05):
+    """A run whose plate waits `lag` seconds after each setpoint change, then ramps at `rate` (°C/s)."""
+    telemetry = TelemetryBuffer()
+    plate, now = 25.0, 0.0
+    for step, target in enumerate(targets, start=1):
+        telemetry.set_position(1, 1, step)
+        start = plate
+        rate, lag = (heat_rate, heat_lag) if target > start else (cool_rate, cool_lag)
+        ramp_sec = lag + abs(target - start) / rate
+        elapsed = 0.0
+        while elapsed < ramp_sec + hold_sec:
+            moved = max(0.0, elapsed - lag) * rate
+            plate = start + min(moved, abs(target - start)) * (1 if target > start else -1)
+            telemetry.append(now / 60, 105.0, plate, target)
+            elapsed += sample_sec
+            now += sample_sec
+        plate = target
+    return telemetry
+
+
+def test_fit_recovers_the_rates_and_lags_of_a_synthetic_run():
+    telemetry = synthetic_run([95, 55, 72, 30, 60, 50, 90, 40],
+                              heat_rate=3.0, heat_lag=1.5, cool_rate=1.5, cool_lag=4.0)
+    model = RampModel.fit([telemetry.columns()], tolerance=0.01)
+    assert model.samples == 8
+    assert model.heat_rate == pytest.approx(3.0, rel=0.02)
+    assert model.cool_rate == pytest.approx(1.5, rel=0.02)
+    assert model.heat_lag == pytest.approx(1.5, abs=0.1)
+    assert model.cool_lag == pytest.approx(4.0, abs=0.1)
+
+
+def test_fit_keeps_the_defaults_without_ramps():
+    model = RampModel.fit([synthetic_run([25.5], 3.0, 1.5, 1.5, 4.0).columns()])
+    assert model.samples == 0
+    assert model.to_dict() == RampModel().to_dict()
+
+
+def test_remaining_sec_at_step_boundaries_and_mid_step():
+    estimate = RunEstimate([10.0, 20.0, 30.0])
+    assert estimate.total_sec == 60
+    assert estimate.remaining_sec(0) == 60
+    assert estimate.remaining_sec(1) == 50
+    # The end of one step is the start of the next
+    assert estimate.remaining_sec(0, elapsed_in_step=10.0) == estimate.remaining_sec(1)
+    assert estimate.remaining_sec(1, elapsed_in_step=5.0) == 45
+    # A step running long doesn't count into the next one
+    assert estimate.remaining_sec(1, elapsed_in_step=25.0) == 30
+    assert estimate.remaining_sec(3) == 0
+
+
+def test_estimate_run_adds_ramps_to_holds():
+    from protocol_manager import compile_protocol
+    program = compile_protocol({1: [2, [95, 10, None], [55, 20, None]]})
+    model = RampModel(heat_rate=4.0, cool_rate=2.0, heat_lag=1.0, cool_lag=2.0)
+    estimate = estimate_run(program, model, start_plate=25)
+    assert list(estimate.step_sec) == [1 + 70 / 4 + 10, 2 + 40 / 2 + 20, 1 + 40 / 4 + 10, 2 + 40 / 2 + 20]
+    assert not estimate.open_ended
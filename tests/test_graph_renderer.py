@@ -0,0 +1,17 @@
+import pathlib
+import tempfile
+
+from graph_renderer import render_graph_async
+from telemetry import TelemetryBuffer
+
+
+def test_graph_is_rendered_in_another_process(tmp_path):
+    graph = TelemetryBuffer()
+    for i in range(200):
+        graph.append(i / 60, 105.0, 25 + i * 0.3, setpoint=85)
+    out_path = tmp_path / 'run.png'
+    render = render_graph_async(graph, 'test run', out_path, show=False)
+    snapshot = pathlib.Path(render.args[render.args.index('--snapshot') + 1])
+    assert render.wait(60) == 0
+    assert out_path.read_bytes().startswith(b'\x89PNG')
+    assert snapshot.parent == pathlib.Path(tempfile.gettempdir()) and not snapshot.exists()
@@ -0,0 +1,49 @@
+import json
+import pathlib
+import subprocess
+import sys
+
+REPO = pathlib.Path(__file__).resolve().parent.parent
+PROTOCOL = """,Number of cycles,Plate Temp (°C),Time (seconds),Set Lid Temp (optional)
+CYCLES,2,,,
+STEP,,30,2,
+STEP,,28,1,
+CYCLES,1,,,
+END&GRAPH,,,,
+"""
+
+
+def run_headless(tmp_path, *python_args):
+    protocol = tmp_path / 'short.csv'
+    protocol.write_text(PROTOCOL, encoding='utf-8')
+    args = ['run', '--port', 'sim://?speed=100', '--json', '--log-dir', str(tmp_path / 'logs'),
+            '--update-sec', '0.02', '--max-update-sec', '0.1', str(protocol)]
+    return subprocess.run([sys.executable, *python_args, *args], cwd=REPO, capture_output=True,
+                          text=True, encoding='utf-8', timeout=60)
+
+
+def test_run_prints_json_lines_and_exits_ok(tmp_path):
+    result = run_headless(tmp_path, '-m', 'helixcycler')
+    assert result.returncode == 0, result.stderr
+    events = [json.loads(line) for line in result.stdout.splitlines()]
+    assert events[0]['event'] == 'start' and events[0]['port'] == 'sim://?speed=100'
+    steps = [event for event in events if event['event'] == 'step']
+    assert [(step['stage'], step['cycle'], step['step'], step['action']) for step in steps] == [
+        (1, 1, 1, 'Incubate'), (1, 1, 2, 'Incubate'), (1, 2, 1, 'Incubate'), (1, 2, 2, 'Incubate'),
+        (2, 1, 1, 'EndGraph')]
+    assert steps[0]['plate_temp'] == 30 and steps[0]['hold_sec'] == 2
+    assert any(event['event'] == 'sample' for event in events)
+    assert events[-1]['event'] == 'end' and events[-1]['outcome'] == 'done'
+    assert len(list((tmp_path / 'logs').glob('*.hxlog'))) == 1
+
+
+def test_run_never_loads_the_gui_toolkits(tmp_path):
+    # What `python -m helixcycler` does, with a report of the loaded modules at exit
+    script = ("import atexit, runpy, sys\n"
+              "atexit.register(lambda: print('LOADED', [name for name in ('tkinter', 'customtkinter', 'matplotlib')"
+              " if name in sys.modules], file=sys.stderr))\n"
+              "sys.argv = ['helixcycler', *sys.argv[1:]]\n"
+              "runpy.run_module('helixcycler', run_name='__main__', alter_sys=True)\n")
+    result = run_headless(tmp_path, '-c', script)
+    assert result.returncode == 0, result.stderr
+    assert 'LOADED []' in result.stderr.splitlines()
@@ -0,0 +1,46 @@
+import pytest
+
+from metrics import Registry
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = Registry()
+    written = registry.counter('test_bytes_total', "Bytes written.", ('port',))
+    depth = registry.gauge('test_depth', "Queue depth.", ('port',))
+    latency = registry.histogram('test_latency_seconds', "Latency.", ('port', 'command'), buckets=(0.1, 1.0))
+    plain = registry.counter('test_plain_total', "No labels.")
+
+    port = 'C:\\ports\\"a"\nb'
+    written.inc(3, port=port)
+    written.inc(port=port)
+    depth.set(2, port='sim')
+    latency.observe(0.05, port='sim', command='M105')
+    latency.observe(0.5, port='sim', command='M105')
+    latency.observe(5.0, port='sim', command='M105')
+    plain.inc()
+
+    lines = registry.render().splitlines()
+    assert '# HELP test_bytes_total Bytes written.' in lines
+    assert '# TYPE test_bytes_total counter' in lines
+    assert '# TYPE test_depth gauge' in lines
+    assert '# TYPE test_latency_seconds histogram' in lines
+    assert 'test_bytes_total{port="C:\\\\ports\\\\\\"a\\"\\nb"} 4' in lines
+    assert 'test_depth{port="sim"} 2' in lines
+    assert 'test_plain_total 1' in lines
+    series = 'port="sim",command="M105"'
+    assert f'test_latency_seconds_bucket{{{series},le="0.1"}} 1' in lines
+    assert f'test_latency_seconds_bucket{{{series},le="1.0"}} 2' in lines
+    assert f'test_latency_seconds_bucket{{{series},le="+Inf"}} 3' in lines
+    assert f'test_latency_seconds_sum{{{series}}} 5.55' in lines
+    assert f'test_latency_seconds_count{{{series}}} 3' in lines
+
+
+def test_labels_are_checked_by_name():
+    registry = Registry()
+    latency = registry.histogram('test_latency_seconds', "Latency.", ('port', 'command'))
+    latency.observe(0.1, command='M105', port='sim')
+    assert 'test_latency_seconds_count{port="sim",command="M105"} 1' in registry.render().splitlines()
+    with pytest.raises(ValueError):
+        latency.observe(0.1, port='sim')
+    with pytest.raises(ValueError):
+        registry.counter('test_plain_total', "No labels.").inc(port='sim')
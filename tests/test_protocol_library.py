@@ -0,0 +1,50 @@
+import json
+import pathlib
+import shutil
+import threading
+
+from protocol_library import ProtocolLibrary
+
+EXAMPLE = pathlib.Path(__file__).resolve().parent.parent / 'HelixCycler_PCR_example.csv'
+
+
+def test_concurrent_scans_keep_the_index_intact(tmp_path):
+    folder = tmp_path / 'protocols'
+    folder.mkdir()
+    for i in range(20):
+        shutil.copy(EXAMPLE, folder / f'pcr_{i}.csv')
+    index_path = tmp_path / 'index.json'
+    library = ProtocolLibrary(index_path)
+    library.add_root(folder)
+    errors = []
+
+    def scan():
+        try:
+            for _ in range(5):
+                library.scan()
+                library.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=scan) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert list(tmp_path.glob('*.tmp')) == []
+    assert len(json.loads(index_path.read_text(encoding='utf-8'))['entries']) == 20
+    assert len(ProtocolLibrary(index_path).search('pcr', include_invalid=False)) == 20
+
+
+def test_scan_picks_up_changes(tmp_path):
+    folder = tmp_path / 'protocols'
+    folder.mkdir()
+    shutil.copy(EXAMPLE, folder / 'a.csv')
+    library = ProtocolLibrary(tmp_path / 'index.json')
+    assert library.scan(folder) == (1, 0, 0)
+    assert library.scan() == (0, 0, 0)
+    (folder / 'b.csv').write_text('not a protocol\n', encoding='utf-8')
+    (folder / 'a.csv').unlink()
+    assert library.scan() == (1, 0, 1)
+    assert library.search('b')[0]['error']
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+
+import pytest
+
+from protocol_loader import ProtocolError, load_protocol, parse_protocol
+from protocol_manager import Deactivate, EndGraph, Incubate, run_protocol
+
+HEADER = ',Number of cycles,Plate Temp (°C),Time (seconds),Set Lid Temp (optional)\n'
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+def errors_of(name, text):
+    with pytest.raises(ProtocolError) as raised:
+        parse_protocol(name, text.encode('utf-8'))
+    return raised.value.errors
+
+
+def test_csv_is_parsed_into_stages(tmp_path):
+    loaded = load_protocol(write(tmp_path / 'pcr.csv', HEADER + 'CYCLES,1,,,\nSTEP,,95,30,105\n'
+                                 'CYCLES,30,,,\nSTEP,,95,10,\nSTEP,,60,,\nDEACTIVATE_ALL,,,,\nEND&GRAPH,,,,\n'))
+    assert loaded.prot_dict == {1: [1, [95.0, 30.0, 105.0]],
+                                2: [30, [95.0, 10.0, None], [60.0, None, None], ['DEACTIVATE_ALL'], ['END&GRAPH']]}
+    assert [stage.cycles for stage in loaded.program.stages] == [1, 30]
+    assert loaded.program.stages[1].steps == (Incubate(95.0, 10.0, None), Incubate(60.0, None, None),
+                                              Deactivate(), EndGraph())
+    assert loaded.program.total_steps == 1 + 30 * 4
+
+
+def test_csv_errors_name_row_and_column():
+    errors = errors_of('bad.csv', HEADER + 'STEP,,95,10,\nCYCLES,x,,,\nSTEP,,120,10,\nSTEP,,95,-1,200\nPAUSE,,,,\n')
+    assert errors == [
+        "Row 2, column A: STEP before the first CYCLES.",
+        "Row 3, column B: Number of cycles 'x' is not a whole number.",
+        "Row 4, column C: Plate temperature 120 is outside 4-99.",
+        "Row 5, column D: Hold time -1 is outside 0-inf.",
+        "Row 5, column E: Lid temperature 200 is outside 37-105.",
+        "Row 6, column A: unknown command 'PAUSE' (expected CYCLES, STEP, DEACTIVATE_ALL, END&GRAPH).",
+    ]
+
+
+def test_range_limits_are_inclusive():
+    parse_protocol('ok.csv', (HEADER + 'CYCLES,1,,,\nSTEP,,4,1,37\nSTEP,,99,1,105\n').encode('utf-8'))
+    errors = errors_of('low.csv', HEADER + 'CYCLES,0,,,\nSTEP,,3.9,1,36.9\nSTEP,,,1,\n')
+    assert errors == [
+        "Row 2, column B: Number of cycles must be at least 1.",
+        "Row 3, column C: Plate temperature 3.9 is outside 4-99.",
+        "Row 3, column E: Lid temperature 36.9 is outside 37-105.",
+        "Row 4, column C: Plate temperature is required.",
+    ]
+
+
+def test_json_errors_name_the_field():
+    data = {'stages': [{'cycles': 2, 'steps': [{'plate': 95, 'time': 10}, {'plate': 95, 'lid': 120},
+                                              'PAUSE', {'plate': 60, 'temp': 1}]},
+                       {'steps': []}]}
+    assert errors_of('bad.json', json.dumps(data)) == [
+        "stages[0].steps[1].lid: lid 120 is outside 37-105.",
+        "stages[0].steps[2]: unknown step 'PAUSE' (expected DEACTIVATE_ALL or END&GRAPH).",
+        "stages[0].steps[3]: unknown field(s) temp.",
+        "stages[1].cycles: cycles is required.",
+    ]
+
+
+def test_empty_file_is_an_error():
+    assert errors_of('empty.csv', HEADER) == ["empty.csv: no CYCLES found."]
+
+
+def test_unchanged_file_is_not_reloaded(tmp_path):
+    path = write(tmp_path / 'a.csv', HEADER + 'CYCLES,1,,,\nSTEP,,95,10,\n')
+    first = load_protocol(path)
+    assert load_protocol(path) is first
+    # Touched but identical: re-read, but the parsed protocol is reused via the content hash
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert load_protocol(path).program is first.program
+    write(path, HEADER + 'CYCLES,2,,,\nSTEP,,95,10,\n')
+    changed = load_protocol(path)
+    assert changed.program.stages[0].cycles == 2
+    assert changed.digest != first.digest
+
+
+def test_identical_copy_shares_the_parsed_protocol(tmp_path):
+    text = HEADER + 'CYCLES,3,,,\nSTEP,,72,20,\n'
+    first = load_protocol(write(tmp_path / 'one.csv', text))
+    copy = load_protocol(write(tmp_path / 'two.csv', text))
+    assert copy.path.name == 'two.csv'
+    assert copy.program is first.program and copy.digest == first.digest
+    # Same bytes under another format are parsed as that format
+    with pytest.raises(ProtocolError):
+        load_protocol(write(tmp_path / 'three.json', text))
+
+
+def test_loaded_protocol_runs_on_the_simulator(connect, tmp_path):
+    loaded = load_protocol(write(tmp_path / 'run.csv', HEADER + 'CYCLES,2,,,\nSTEP,,70,1,100\nSTEP,,50,1,\n'
+                                 'DEACTIVATE_ALL,,,,\n'))
+    controller = connect('sim://?speed=200')
+    ignore = lambda text: None
+    graph = run_protocol(controller, loaded.program, ignore, ignore, ignore, ignore, threading.Event(), 'loader',
+                         update_sec=0.01, max_update_sec=0.05, render_graph=False)
+    device = controller.port.device
+    controller.disconnect()  # flushes the final deactivate_all
+    assert device.command_counts['M104'] == 4 and device.command_counts['M140'] == 2
+    assert device.plate.target is None
+    assert len(graph) > 0
@@ -0,0 +1,132 @@
+import threading
+import time
+
+from protocol_manager import run_protocol
+
+
+def ignore(text):
+    pass
+
+
+def test_emergency_stop_leaves_heaters_off(connect):
+    controller = connect()
+    device = controller.port.device
+    stop = threading.Event()
+    hold = {1: [1, [95, None, 105]]}  # hold at 95 °C until stopped
+    run = threading.Thread(target=run_protocol,
+                           args=(controller, hold, ignore, ignore, ignore, ignore, stop, 'estop'),
+                           kwargs={'render_graph': False})
+    run.start()
+    deadline = time.monotonic() + 5
+    while device.plate.target != 95 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert device.lid.target == 105
+    stop.set()
+    controller.deactivate_all()
+    run.join(5)
+    assert not run.is_alive()
+    controller.disconnect()
+    assert device.lid.target is None and device.plate.target is None
+
+
+def test_digest_distinguishes_step_types():
+    from protocol_manager import compile_protocol
+    deactivate = compile_protocol({1: [1, [95, 10, None], ['DEACTIVATE_ALL']]})
+    end_graph = compile_protocol({1: [1, [95, 10, None], ['END&GRAPH']]})
+    assert deactivate.digest() != end_graph.digest()
+    assert deactivate.digest() == compile_protocol({1: [1, [95, 10, None], ['DEACTIVATE_ALL']]}).digest()
+
+
+def test_step_text_eta_counts_down_during_a_step():
+    from estimator import estimate_run
+    from protocol_manager import compile_protocol, step_text
+    program = compile_protocol({1: [1, [25, 3600, None]]})
+    step = next(iter(program))
+    estimate = estimate_run(program, start_plate=25)
+    assert step_text(step, program, estimate).endswith('(1h 00m left)')
+    assert step_text(step, program, estimate, elapsed_in_step=1800).endswith('(30m 00s left)')
+
+
+def test_run_logs_started_together_get_separate_files(connect, tmp_path):
+    from protocol_manager import compile_protocol, open_run_log
+    controller = connect()
+    program = compile_protocol({1: [1, [95, 10, None]]})
+    logs = [open_run_log(tmp_path, controller, program, 'same title') for _ in range(3)]
+    try:
+        assert all(logs)
+        assert len({log.path for log in logs}) == 3
+        assert all('_same_title_sim' in log.path.name for log in logs)
+    finally:
+        for log in logs:
+            if log:
+                log.close()
+
+
+def _async_stop_during_hold(make_event, set_event):
+    """Runs a hold with run_protocol_async, stops it and returns (seconds to stop, device)."""
+    import asyncio
+    from protocol_manager import run_protocol_async
+    from tc_async import AsyncHardwareController
+
+    async def main():
+        controller = AsyncHardwareController()
+        assert await controller.connect('sim://?speed=100')
+        device = controller.port.device
+        stop = make_event()
+        hold = {1: [1, [95, None, 105]]}
+        # Polls at most every 2 s, so a run that only checks the stop between polls is easy to spot
+        run = asyncio.ensure_future(run_protocol_async(controller, hold, ignore, ignore, ignore, ignore, stop, 'estop',
+                                                       update_sec=2.0, max_update_sec=5.0, render_graph=False))
+        deadline = time.monotonic() + 5
+        while device.plate.target != 95 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert device.lid.target == 105
+        await asyncio.sleep(0.2)
+        stopped_at = time.monotonic()
+        set_event(stop)
+        await asyncio.wait_for(run, 5)
+        elapsed = time.monotonic() - stopped_at
+        await controller.disconnect()
+        return elapsed, device
+
+    return asyncio.run(main())
+
+
+def test_async_emergency_stop_with_threading_event():
+    elapsed, device = _async_stop_during_hold(threading.Event, lambda stop: stop.set())
+    assert elapsed < 0.5
+    assert device.lid.target is None and device.plate.target is None
+
+
+def test_async_emergency_stop_with_asyncio_event():
+    import asyncio
+    elapsed, device = _async_stop_during_hold(asyncio.Event, lambda stop: stop.set())
+    assert elapsed < 0.5
+    assert device.lid.target is None and device.plate.target is None
+
+
+def test_controller_errors_end_the_run_as_errors(connect):
+    import pytest
+    controller = connect()
+    device = controller.port.device
+    stop = threading.Event()
+
+    def fail(*args):
+        raise RuntimeError("port went away")
+
+    # Let the setpoints through, then fail the first status poll
+    controller.get_status = fail
+    with pytest.raises(RuntimeError, match="port went away"):
+        run_protocol(controller, {1: [1, [95, 10, 105]]}, ignore, ignore, ignore, ignore, stop, 'error',
+                     render_graph=False)
+    controller.disconnect()
+    assert device.lid.target is None and device.plate.target is None
+
+
+def test_compile_protocol_rejects_zero_cycles():
+    import pytest
+    from protocol_manager import compile_protocol
+    for cycles in (0, -1, 1.5, True):
+        with pytest.raises(ValueError, match="CYCLES must be a whole number >= 1"):
+            compile_protocol({1: [cycles, [95, 10, None]]})
+    assert compile_protocol({1: [1, [95, 10, None]]}).total_steps == 1
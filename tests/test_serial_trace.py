@@ -0,0 +1,44 @@
+import pathlib
+import threading
+
+from protocol_manager import protocol_dict, run_protocol
+from telemetry import TelemetryBuffer
+from tc_send_code import HardwareController
+
+EXAMPLE = pathlib.Path(__file__).resolve().parent.parent / 'HelixCycler_PCR_example.csv'
+
+
+def ignore(text):
+    pass
+
+
+def run_example(url, trace_dir=None):
+    """Runs the example protocol (without END&GRAPH) on `url`; returns its telemetry and the port used."""
+    prot_dict = protocol_dict(EXAMPLE)
+    for stage in prot_dict:
+        prot_dict[stage] = [step for step in prot_dict[stage] if step != ['END&GRAPH']]
+    controller = HardwareController()
+    controller.trace_dir = trace_dir
+    assert controller.connect(url)
+    port = controller.port
+    telemetry = TelemetryBuffer()
+    try:
+        run_protocol(controller, prot_dict, ignore, ignore, ignore, ignore, threading.Event(), 'trace',
+                     update_sec=0.01, max_update_sec=0.05, telemetry=telemetry, render_graph=False)
+    finally:
+        controller.disconnect()
+    return telemetry.columns(), port
+
+
+def test_recorded_run_replays_exactly(tmp_path):
+    recorded, _ = run_example('sim://?speed=3000', trace_dir=tmp_path)
+    traces = list(tmp_path.glob('*.hxtrace'))
+    assert len(traces) == 1
+
+    replayed, replay = run_example(f'replay://{traces[0]}?speed=0')
+    assert replay.stats['matched'] > 0
+    assert replay.stats['unmatched'] == 0 and replay.stats['reused'] == 0
+    assert replay.remaining == 0
+    assert len(recorded['time']) > 0
+    assert list(replayed['lid']) == list(recorded['lid'])
+    assert list(replayed['plate']) == list(recorded['plate'])
@@ -0,0 +1,82 @@
+import pytest
+
+import tc_simulator
+from tc_simulator import AMBIENT_TEMP, SimClock, SimulatedThermocycler, ThermalZone
+
+
+class ManualClock:
+    """A device clock the test moves by hand."""
+    def __init__(self):
+        self.seconds = 0.0
+
+    def now(self):
+        return self.seconds
+
+
+def run_for(device, clock, seconds, step=0.25):
+    """Advances the device `seconds` of simulated time, polling the plate like the host does."""
+    end = clock.seconds + seconds
+    while clock.seconds < end - 1e-9:
+        clock.seconds = min(end, clock.seconds + step)
+        device.handle('M105')
+
+
+def test_zone_ramp_is_limited_by_the_heating_and_cooling_rates():
+    zone = ThermalZone(heat_rate=4.0, cool_rate=2.0, tau=2.0, passive_tau=60.0)
+    zone.target = 95
+    for _ in range(40):
+        zone.advance(0.25)
+    assert zone.temp == pytest.approx(AMBIENT_TEMP + 4.0 * 10)
+    zone.temp, zone.target = 95.0, 4
+    for _ in range(40):
+        zone.advance(0.25)
+    assert zone.temp == pytest.approx(95 - 2.0 * 10)
+
+
+def test_zone_drifts_back_to_ambient_without_a_target():
+    zone = ThermalZone(heat_rate=4.0, cool_rate=2.0, tau=2.0, passive_tau=60.0)
+    zone.temp = 95.0
+    zone.advance(1.0)
+    assert zone.temp == pytest.approx(95 - (95 - AMBIENT_TEMP) / 60)
+
+
+def test_plate_ramps_then_settles_on_the_setpoint_without_overshoot():
+    clock = ManualClock()
+    device = SimulatedThermocycler(clock=clock)
+    device.handle('M104 S95')
+    readings = []
+    for _ in range(120):
+        run_for(device, clock, 0.25)
+        readings.append(device.plate.temp)
+    # 72 °C at 4 °C/s is 18 s flat out; the last few degrees settle with tau = 2 s
+    assert abs(readings[int(16 / 0.25) - 1] - 95) > 0.5
+    assert abs(readings[int(23 / 0.25) - 1] - 95) <= 0.5
+    assert max(readings) <= 95
+    assert readings[-1] == pytest.approx(95, abs=0.01)
+
+
+def test_hold_counts_down_once_the_plate_is_at_temperature():
+    clock = ManualClock()
+    device = SimulatedThermocycler(clock=clock)
+    device.handle('M104 S95 H30')
+    run_for(device, clock, 20)
+    assert device.hold_remaining == 30  # still ramping
+    run_for(device, clock, 30)
+    assert 0 < device.hold_remaining < 30
+    run_for(device, clock, 2)
+    assert device.hold_remaining == 0
+    assert device.handle('M105') == ['T:95 C:95.0 H:0', 'ok']
+
+
+def test_sim_clock_runs_speed_times_wall_time(monkeypatch):
+    wall = [100.0]
+    monkeypatch.setattr(tc_simulator.time, 'monotonic', lambda: wall[0])
+    clock = SimClock(speed=50)
+    assert clock.now() == 0
+    wall[0] += 2.0
+    assert clock.now() == pytest.approx(100)
+
+
+def test_sim_url_speed_sets_the_device_clock(connect):
+    controller = connect('sim://?speed=250')
+    assert controller.port.device.clock.speed == 250
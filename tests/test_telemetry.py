@@ -0,0 +1,56 @@
+import numpy as np
+
+from telemetry import TelemetryBuffer, minmax_indices
+
+
+def test_short_series_are_kept_whole():
+    x = np.arange(10.0)
+    assert minmax_indices(x, x, 4).tolist() == list(range(10))
+
+
+def test_at_most_two_points_per_bucket_plus_the_ends():
+    x = np.linspace(0, 100, 100_000)
+    y = np.sin(x)
+    keep = minmax_indices(x, y, 50)
+    assert len(keep) <= 2 * 50 + 2
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_peaks_and_step_edges_survive():
+    x = np.arange(10_000.0)
+    y = np.zeros_like(x)
+    y[1234] = 95.0           # one-sample spike
+    y[5000:] = 60.0          # step
+    y[7777] = -5.0           # one-sample dip
+    keep = minmax_indices(x, y, 20)
+    assert 1234 in keep and 7777 in keep
+    assert y[keep].max() == 95.0 and y[keep].min() == -5.0
+    assert {0.0, 60.0} <= set(y[keep])
+
+
+def test_each_bucket_keeps_its_own_extremes():
+    x = np.arange(1000.0)
+    y = np.tile([0.0, 1.0, 2.0, 1.0], 250) + np.repeat(np.arange(10.0), 100) * 10
+    keep = minmax_indices(x, y, 10)
+    for bucket in range(10):
+        in_bucket = keep[(keep >= bucket * 100) & (keep < (bucket + 1) * 100)]
+        assert y[in_bucket].min() == bucket * 10 and y[in_bucket].max() == bucket * 10 + 2
+
+
+def test_nan_gaps_do_not_break_downsampling():
+    x = np.arange(1000.0)
+    y = np.full_like(x, np.nan)
+    y[:300] = np.arange(300.0)
+    keep = minmax_indices(x, y, 10)
+    assert 0 in keep and 299 in keep and 999 in keep
+
+
+def test_downsampling_a_ring_buffer_column():
+    graph = TelemetryBuffer(capacity=500, ring=True)
+    for i in range(2000):
+        graph.append(i / 60, 105.0, float(i % 100), setpoint=50)
+    x, y = graph.column('time'), graph.column('plate')
+    keep = minmax_indices(x, y, 25)
+    assert x[keep[0]] == x[0] and x[keep[-1]] == x[-1]
+    assert y[keep].max() == 99.0 and y[keep].min() == 0.0
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import metrics
+
+UPDATE_LAG = metrics.histogram('helixcycler_gui_update_lag_seconds',
+                               "Time from a worker publishing a value to the refresher applying it.")
+PENDING_FIELDS = metrics.histogram('helixcycler_gui_pending_fields',
+                                   "Fields published since the previous refresh, per refresh (the GUI's queue depth).",
+                                   buckets=(1, 2, 4, 8, 16, 32))
+REFRESH_TIME = metrics.histogram('helixcycler_gui_refresh_seconds',
+                                 "Time each refresh spends configuring widgets on the Tk main thread.")
+
+
+class ViewModel:
+    """
+    Latest display values published by worker threads, applied to Tk widgets by a
+    refresher on the main thread.
+
+    Workers call publish(), which only stores the values, so they never queue Tk
+    events. Up to `max_fps` times per second the refresher configures the widgets
+    whose bound field changed since it was last applied; anything published in
+    between is coalesced into that one update. The backlog each refresh clears is
+    recorded in the gui_* metrics.
+    """
+    def __init__(self, root, max_fps=10):
+        self.root = root
+        self.interval_ms = max(1, int(1000 / max_fps))
+        self._lock = threading.Lock()
+        self._values = {}
+        self._dirty = False
+        self._pending = set()
+        self._dirty_since = None
+        self._applied = {}
+        self._bindings = {}
+        self._job = None
+
+    def bind(self, field, get_widget, **options):
+        """
+        Shows `field` as the text of the widget returned by `get_widget()`
+        (looked up on each update, so the widget may be re-created), configured
+        with `options` as well.
+        """
+        self._bindings[field] = (get_widget, options)
+
+    def publish(self, **fields):
+        """Sets field values; safe to call from any thread."""
+        with self._lock:
+            self._values.update(fields)
+            self._pending.update(fields)
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self._dirty = True
+
+    def forget(self, *fields):
+        """Marks fields as not yet shown, e.g. after their widgets were re-created."""
+        with self._lock:
+            for field in fields:
+                self._applied.pop(field, None)
+            self._dirty = True
+
+    def start(self):
+        if self._job is None:
+            self._job = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            try:
+                self.root.after_cancel(self._job)
+            except Exception:
+                pass  # Root already destroyed
+            self._job = None
+
+    def _tick(self):
+        self._job = None
+        if not self.root.winfo_exists():
+            return
+        self.refresh()
+        self._job = self.root.after(self.interval_ms, self._tick)
+
+    def refresh(self):
+        """Applies changed fields now (main thread only)."""
+        started = time.monotonic()
+        with self._lock:
+            if not self._dirty:
+                return
+            values = dict(self._values)
+            self._dirty = False
+            if self._dirty_since is not None:
+                UPDATE_LAG.observe(started - self._dirty_since)
+                PENDING_FIELDS.observe(len(self._pending))
+            self._pending.clear()
+            self._dirty_since = None
+        for field, value in values.items():
+            if field not in self._bindings or self._applied.get(field) == value:
+                continue
+            get_widget, options = self._bindings[field]
+            widget = get_widget()
+            try:
+                if widget is None or not widget.winfo_exists():
+                    continue
+                widget.configure(text=value, **options)
+            except Exception as e:
+                print(f"View update error ({field}): {e}")
+                continue
+            self._applied[field] = value
+        REFRESH_TIME.observe(time.monotonic() - started)